@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from telemetry import get_logger, record_cache_lookup
+
+logger = get_logger(__name__)
+
+class SemanticAnswerCache:
+    """
+    Caches generated FAQ answers by query embedding.
+
+    A lookup hits when the most similar cached query is at least
+    `similarity_threshold` (cosine) similar to the new one *and* both retrieved
+    the same top FAQ id, so a cached answer is only reused for the same
+    context. Entries are evicted least-recently-used once `max_entries` is
+    reached, and everything is dropped when the index version changes.
+    """
+    def __init__(self, max_entries: int, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.index_version = None
+        self._vectors = None # (max_entries, d) float32, allocated on first put
+        self._faq_ids = np.full(max_entries, -1, dtype=np.int64)
+        self._answers = [None] * max_entries
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._lru = OrderedDict() # slot -> None, least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, index_version):
+        if index_version != self.index_version:
+            if self._lru:
+                logger.info(f"Index version changed ({self.index_version} -> {index_version}), clearing {len(self._lru)} cached answers.")
+            self._clear()
+            self.index_version = index_version
+
+    def _clear(self):
+        self._valid[:] = False
+        self._faq_ids[:] = -1
+        self._answers = [None] * self.max_entries
+        self._lru.clear()
+
+    def lookup(self, embedding, top_faq_id: int, index_version=None) -> str | None:
+        with self._lock:
+            self._check_version(index_version)
+            if self._vectors is None or not self._lru:
+                self.misses += 1
+                record_cache_lookup("answer", False)
+                return None
+            query = self._normalize(embedding)
+            slots = np.flatnonzero(self._valid)
+            scores = self._vectors[slots] @ query
+            best = int(np.argmax(scores))
+            slot = int(slots[best])
+            if scores[best] < self.similarity_threshold or self._faq_ids[slot] != top_faq_id:
+                self.misses += 1
+                record_cache_lookup("answer", False)
+                return None
+            self._lru.move_to_end(slot)
+            self.hits += 1
+            record_cache_lookup("answer", True)
+            return self._answers[slot]
+
+    def put(self, embedding, top_faq_id: int, answer: str, index_version=None):
+        with self._lock:
+            self._check_version(index_version)
+            query = self._normalize(embedding)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, query.shape[0]), dtype=np.float32)
+            if len(self._lru) >= self.max_entries:
+                slot, _ = self._lru.popitem(last=False)
+            else:
+                slot = int(np.flatnonzero(~self._valid)[0])
+            self._vectors[slot] = query
+            self._faq_ids[slot] = top_faq_id
+            self._answers[slot] = answer
+            self._valid[slot] = True
+            self._lru[slot] = None
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._lru),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
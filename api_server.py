@@ -0,0 +1,175 @@
+"""
+Headless HTTP API for image analysis and FAQ answers.
+
+    uvicorn api_server:app --host 0.0.0.0 --port 8000
+    python api_server.py --port 8000
+
+The FAISS index and caches are loaded once per process. FAQ requests that name
+a `tenant` are answered from that tenant's shard (see tenant_store.py), which
+is loaded on its first request. The OpenAI,
+Rekognition and FAISS calls are blocking, so each request runs them on a
+bounded thread pool while the event loop stays free; a semaphore caps the
+requests in flight and sheds load with HTTP 503 once the queue wait runs out.
+"""
+import argparse
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, File, HTTPException, Request, Response, UploadFile
+from pydantic import BaseModel, Field
+
+from faiss_service import FAISSVectorStore
+from tenant_store import TenantStoreManager
+from answer_cache import SemanticAnswerCache
+from image_cache import ImageResultCache
+from assistant_pipeline import analyze_image, get_faq_answer, retrieve_faq_contexts_batch
+from openai_service import get_openai_client
+from rekognition_service import get_rekognition_client
+from telemetry import get_logger, Counter, render_prometheus
+
+import config
+
+logger = get_logger(__name__)
+
+API_REJECTED = Counter("api_rejected_requests_total", "Requests shed with 503 because no slot freed up in time.")
+
+API_MAX_CONCURRENT_REQUESTS = int(os.getenv("API_MAX_CONCURRENT_REQUESTS", config.API_MAX_CONCURRENT_REQUESTS))
+API_QUEUE_TIMEOUT_SECONDS = float(os.getenv("API_QUEUE_TIMEOUT_SECONDS", config.API_QUEUE_TIMEOUT_SECONDS))
+API_MAX_WORKERS = int(os.getenv("API_MAX_WORKERS", config.API_MAX_WORKERS))
+INDEX_WATCH_INTERVAL_SECONDS = float(os.getenv("INDEX_WATCH_INTERVAL_SECONDS", config.INDEX_WATCH_INTERVAL_SECONDS))
+
+class FAQRequest(BaseModel):
+    query: str = Field(min_length=1)
+    tenant: str | None = None
+
+class FAQBatchRequest(BaseModel):
+    queries: list[str] = Field(min_length=1, max_length=config.API_MAX_BATCH_QUERIES)
+    tenant: str | None = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Loading FAISS index and FAQ data...")
+    app.state.vector_store = FAISSVectorStore()
+    if not app.state.vector_store.is_ready():
+        logger.error("FAQ Search Initialization Failed: Could not load FAISS index or data.")
+    # Also picks up the first build if the server started before there was one
+    app.state.vector_store.start_watching(INDEX_WATCH_INTERVAL_SECONDS)
+    app.state.answer_cache = SemanticAnswerCache(max_entries=config.ANSWER_CACHE_MAX_ENTRIES, similarity_threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD)
+    # FAQ ids and index versions are per shard, so each tenant shard gets its own answer cache
+    app.state.tenant_stores = TenantStoreManager(answer_cache_factory=lambda: SemanticAnswerCache(
+        max_entries=config.ANSWER_CACHE_MAX_ENTRIES, similarity_threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD))
+    app.state.image_cache = ImageResultCache(config.IMAGE_CACHE_PATH, max_bytes=config.IMAGE_CACHE_MAX_BYTES, perceptual_max_distance=config.IMAGE_CACHE_PERCEPTUAL_MAX_DISTANCE)
+    app.state.executor = ThreadPoolExecutor(max_workers=API_MAX_WORKERS, thread_name_prefix="api-worker")
+    # The clients are created lazily; creating them here keeps the SDK imports off the first request
+    get_openai_client()
+    try:
+        get_rekognition_client()
+    except Exception as e:
+        logger.warning(f"Could not create the Rekognition client at startup: {e}")
+    app.state.slots = asyncio.Semaphore(API_MAX_CONCURRENT_REQUESTS)
+    app.state.rejected = 0
+    yield
+    app.state.vector_store.stop_watching()
+    app.state.tenant_stores.close()
+    app.state.executor.shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(title="ApertureAI API", lifespan=lifespan)
+
+@asynccontextmanager
+async def request_slot(request: Request):
+    """Admits the request if a slot frees up within the queue timeout, else sheds it with 503."""
+    state = request.app.state
+    try:
+        await asyncio.wait_for(state.slots.acquire(), timeout=API_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        state.rejected += 1
+        API_REJECTED.inc(path=request.url.path)
+        raise HTTPException(status_code=503, detail="Server is at capacity, retry shortly.", headers={"Retry-After": "1"})
+    try:
+        yield
+    finally:
+        state.slots.release()
+
+async def run_blocking(request: Request, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(request.app.state.executor, fn, *args)
+
+async def resolve_vector_store(request: Request, tenant: str | None):
+    """
+    (store, answer cache) for a FAQ request: the shared ones, or the tenant's
+    shard (loaded off the event loop on first use) and its cache; 404 for
+    unknown tenants.
+    """
+    state = request.app.state
+    if tenant is None:
+        return state.vector_store, state.answer_cache
+    store = await run_blocking(request, state.tenant_stores.get_store, tenant)
+    if store is None:
+        raise HTTPException(status_code=404, detail=f"No FAQ index for tenant '{tenant}'.")
+    return store, state.tenant_stores.answer_cache(tenant)
+
+@app.get("/healthz")
+async def healthz(request: Request):
+    state = request.app.state
+    store = state.vector_store
+    return {
+        'faq_ready': store.is_ready(),
+        'vectors': store.index.ntotal if store.index is not None else 0,
+        'index_version': store.version,
+        'index_generation': store.generation,
+        'tenant_shards': state.tenant_stores.stats(),
+        'answer_cache': state.answer_cache.stats(),
+        'rejected_requests': state.rejected
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint; 404 unless TELEMETRY_BACKEND=prometheus."""
+    body = render_prometheus()
+    if body is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (set TELEMETRY_BACKEND=prometheus).")
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/faq")
+async def faq(body: FAQRequest, request: Request):
+    async with request_slot(request):
+        vector_store, answer_cache = await resolve_vector_store(request, body.tenant)
+        answer = await run_blocking(request, get_faq_answer, vector_store, body.query, answer_cache)
+    return {'query': body.query, 'answer': answer}
+
+@app.post("/faq/batch")
+async def faq_batch(body: FAQBatchRequest, request: Request):
+    """
+    Retrieves contexts for the whole batch at once (one embedding request, one
+    FAISS search), then runs each query's answer stages concurrently. The batch
+    takes one admission slot; the worker pool bounds its fan-out.
+    """
+    async with request_slot(request):
+        vector_store, answer_cache = await resolve_vector_store(request, body.tenant)
+        retrievals = await run_blocking(request, retrieve_faq_contexts_batch, vector_store, body.queries)
+        answers = await asyncio.gather(*(
+            run_blocking(request, get_faq_answer, vector_store, query, answer_cache, False, retrieval)
+            for query, retrieval in zip(body.queries, retrievals)
+        ))
+    return {'results': [{'query': query, 'answer': answer} for query, answer in zip(body.queries, answers)]}
+
+@app.post("/analyze-image")
+async def analyze_image_endpoint(request: Request, image: UploadFile = File(...)):
+    image_bytes = await image.read(config.API_MAX_IMAGE_BYTES + 1)
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty image upload.")
+    if len(image_bytes) > config.API_MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {config.API_MAX_IMAGE_BYTES} bytes.")
+    async with request_slot(request):
+        results, bytes_saved = await run_blocking(request, analyze_image, image_bytes, request.app.state.image_cache)
+    return {'results': results, 'bytes_saved': bytes_saved}
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the ApertureAI API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -1,108 +1,95 @@
 import streamlit as st
-from PIL import Image
-import io
-from dotenv import load_dotenv
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # Service Imports
-from rekognition_service import get_image_labels # For Rekognition tags
-from faiss_service import FAISSVectorStore     # For FAQ search
-from openai_service import get_openai_vision_description, get_openai_chat_completion # For AI image description and chat completion
+# faiss_service is imported by create_vector_store, so faiss loads off the first render's path;
+# image_preprocessing and image_cache (Pillow) are imported when an image is first analyzed
+from openai_service import stream_openai_vision_description # Token streaming for the image description
+from answer_cache import SemanticAnswerCache # For reusing answers to near-identical questions
+from image_analysis import start_image_analysis, iter_with_deadline # Runs Vision and Rekognition in parallel
+from assistant_pipeline import get_faq_answer, get_image_cache_params, IMAGE_BACKENDS # Pipelines shared with the API server
+from telemetry import get_logger, start_metrics_server # Structured logs and the optional /metrics endpoint
 
 # Import constants from config.py
 import config
 
 # --- Initial Setup --- 
-load_dotenv()
+logger = get_logger(__name__)
 st.set_page_config(page_title="Simple AI Assistant", layout="wide")
 
 # --- Helper Functions --- 
 
-@st.cache_resource
-def load_vector_store():
-    """Loads the FAISS index and data, cached for efficiency."""
-    print("Attempting to load FAISS index and FAQ data...")
-    store = FAISSVectorStore()
-    if not store.is_ready():
-        # Log error to console, UI warning will be shown later if needed
-        print("ERROR: FAQ Search Initialization Failed: Could not load FAISS index or data.") 
-        return None
-    print("FAISS index and FAQ data loaded successfully.")
-    return store
+def create_vector_store():
+    """Loads the FAISS index and data; returns None if they cannot be loaded."""
+    from faiss_service import FAISSVectorStore
 
-def get_ai_vision_analysis(image_bytes):
-    """Gets image description from OpenAI Vision."""
+    logger.info("Attempting to load FAISS index and FAQ data...")
     try:
-        # Use prompt from config
-        description = get_openai_vision_description(image_bytes, prompt=config.APP_VISION_PROMPT, detail=config.DEFAULT_VISION_DETAIL)
-        return description if description else "OpenAI Vision could not generate a description."
+        store = FAISSVectorStore()
+        if not store.is_ready():
+            # Log error to console, UI warning will be shown later if needed
+            logger.error("FAQ Search Initialization Failed: Could not load FAISS index or data.")
+            return None
+        logger.info("FAISS index and FAQ data loaded successfully.")
+        # Rebuilds by index_faq.py are swapped in without a restart
+        store.start_watching(float(os.getenv("INDEX_WATCH_INTERVAL_SECONDS", config.INDEX_WATCH_INTERVAL_SECONDS)))
+        return store
     except Exception as e:
-        print(f"OpenAI Vision Error: {e}") 
-        return f"Vision analysis failed: {e}"
+        # The cached Future would otherwise re-raise this on every rerun
+        logger.error(f"FAQ Search Initialization Failed: {e}", exc_info=True)
+        return None
 
-def get_rekognition_analysis(image_bytes):
-    """Gets image tags from AWS Rekognition."""
-    try:
-        rekognition_response = get_image_labels(image_bytes)
-        if rekognition_response and 'Labels' in rekognition_response and rekognition_response['Labels']:
-            tags = [label['Name'] for label in rekognition_response['Labels']]
-            return ", ".join(tags)
-        else:
-            return "No tags detected by Rekognition."
-    except Exception as e:
-        print(f"Rekognition Error: {e}")
-        return f"Rekognition analysis failed: {e}"
+def warm_up_clients():
+    """Creates the OpenAI and Rekognition clients (importing their SDKs) ahead of the first request."""
+    from openai_service import get_openai_client
+    from rekognition_service import get_rekognition_client
 
-def get_faq_answer(vector_store_instance, query):
-    """Classifies query topic, then searches FAISS & uses RAG for retail-related questions."""
-    # 1. Classify Query Topic
+    get_openai_client()
     try:
-        # Use prompt templates and system prompt from config
-        classification_prompt = config.APP_CLASSIFY_USER_PROMPT_TEMPLATE.format(query=query)
-        system_prompt_classify = config.APP_CLASSIFY_SYSTEM_PROMPT
-        topic_classification = get_openai_chat_completion(prompt=classification_prompt, system_prompt=system_prompt_classify, model=config.OPENAI_CHAT_MODEL)
-
-        print(f"Query Classification: {topic_classification}")
-
-        if topic_classification != "RETAIL_RELATED":
-            return "I specialize in questions about online retail stores. Please ask a question related to products, orders, shipping, returns, or your account."
-
+        get_rekognition_client()
     except Exception as e:
-        print(f"Query Classification Error: {e}")
-        # If classification fails, proceed cautiously.
-
-    # 2. Proceed with RAG if Retail-Related
-    if not vector_store_instance or not vector_store_instance.is_ready():
-        return "FAQ search is not available (index not loaded)."
+        logger.warning(f"Could not create the Rekognition client ahead of time: {e}")
 
-    try:
-        search_results = vector_store_instance.search_faq_by_text(query, k=1)
-
-        if not search_results:
-            print("No relevant context found in FAISS for the query.")
-            return "Sorry, I could not find any relevant information in the knowledge base to answer your question."
-
-        top_result = search_results[0]
-        context_question = top_result['question']
-        context_answer = top_result['answer']
+@st.cache_resource
+def load_vector_store():
+    """
+    Starts loading the vector store, once per process, and returns its Future.
+    With APP_PREWARM_IN_BACKGROUND the index loads (and the service clients
+    warm up) on a background thread while the page renders; otherwise the
+    index is loaded before returning.
+    """
+    if os.getenv("APP_PREWARM_IN_BACKGROUND", str(config.APP_PREWARM_IN_BACKGROUND)).lower() not in ("1", "true"):
+        future = Future()
+        future.set_result(create_vector_store())
+        return future
+    # One thread, so the warm-up competes as little as possible with the page rendering
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prewarm")
+    future = executor.submit(create_vector_store)
+    executor.submit(warm_up_clients)
+    executor.shutdown(wait=False)
+    return future
 
-        # Use prompt template and system prompt from config
-        rag_prompt = config.APP_RAG_USER_PROMPT_TEMPLATE.format(context_question=context_question, context_answer=context_answer, query=query)
-        system_prompt_rag = config.APP_RAG_SYSTEM_PROMPT
+@st.cache_resource
+def load_answer_cache():
+    """Creates the semantic answer cache, shared across sessions."""
+    return SemanticAnswerCache(max_entries=config.ANSWER_CACHE_MAX_ENTRIES, similarity_threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD)
 
-        generated_answer = get_openai_chat_completion(prompt=rag_prompt, system_prompt=system_prompt_rag)
+@st.cache_resource
+def load_image_result_cache():
+    """Opens the disk-backed image analysis result cache, shared across sessions."""
+    from image_cache import ImageResultCache
 
-        if generated_answer:
-            return generated_answer
-        else:
-            print("OpenAI generation failed after retrieving context. Returning raw answer.")
-            return context_answer
+    return ImageResultCache(config.IMAGE_CACHE_PATH, max_bytes=config.IMAGE_CACHE_MAX_BYTES, perceptual_max_distance=config.IMAGE_CACHE_PERCEPTUAL_MAX_DISTANCE)
 
-    except Exception as e:
-        print(f"FAQ RAG Error: {e}")
-        return f"An error occurred during the FAQ process: {e}"
+@st.cache_resource
+def start_metrics_endpoint():
+    """Serves Prometheus metrics on TELEMETRY_PROMETHEUS_PORT, once per process, when configured."""
+    return start_metrics_server()
 
 # --- Load Resources --- 
-vector_store = load_vector_store()
+answer_cache = load_answer_cache()
+start_metrics_endpoint()
 
 # --- Streamlit App UI --- 
 st.title("🤖 Simple AI Assistant")
@@ -121,21 +108,80 @@ if uploaded_file is not None:
         # Process Image Analysis
         try:
             image_bytes = uploaded_file.getvalue()
+            image_cache = load_image_result_cache()
+            cache_params = get_image_cache_params()
+            cached_results = {name: image_cache.get(image_bytes, name, params) for name, params in cache_params.items()}
             
             # Use columns to display results side-by-side
             col1, col2 = st.columns(2)
             
+            # Both backends run concurrently; each column is filled in as soon as its result arrives
             with col1:
-                with st.spinner("Getting AI Vision description... 👁️"):
-                    ai_description = get_ai_vision_analysis(image_bytes)
                 st.subheader("👁️ AI Vision Description:")
-                st.markdown(ai_description)
+                vision_placeholder = st.empty()
+                vision_placeholder.info("Getting AI Vision description... 👁️")
                 
             with col2:
-                with st.spinner("Getting Rekognition tags... 🧠"):
-                    rek_tags = get_rekognition_analysis(image_bytes)
                 st.subheader("🧠 Rekognition Tags:")
-                st.markdown(f"`{rek_tags}`")
+                rekognition_placeholder = st.empty()
+                rekognition_placeholder.info("Getting Rekognition tags... 🧠")
+
+            def render_result(name, result, error):
+                if name == "vision":
+                    vision_placeholder.markdown(result if error is None else f"Vision analysis failed: {error}")
+                else:
+                    rekognition_placeholder.markdown(f"`{result}`" if error is None else f"Rekognition analysis failed: {error}")
+
+            for name, result in cached_results.items():
+                if result is not None:
+                    render_result(name, result, None)
+
+            pending_backends = {name: backend for name, backend in IMAGE_BACKENDS.items() if cached_results[name] is None}
+            if pending_backends:
+                from image_preprocessing import prepare_image
+
+                # Decode once, fix orientation and produce smaller per-backend encodings
+                prepared_image = prepare_image(image_bytes, detail=config.DEFAULT_VISION_DETAIL)
+                stream_vision = config.APP_STREAM_RESPONSES and "vision" in pending_backends
+                if stream_vision:
+                    # The description streams in on this thread, so the other backends run in the background
+                    del pending_backends["vision"]
+                analysis_run = start_image_analysis(prepared_image, pending_backends)
+
+                def render_finished(results):
+                    for name, result, error in results:
+                        render_result(name, result, error)
+                        if error is None:
+                            image_cache.put(image_bytes, name, cache_params[name], result)
+
+                if stream_vision:
+                    vision_stream = stream_openai_vision_description(prepared_image.vision_bytes, prompt=config.APP_VISION_PROMPT, detail=config.DEFAULT_VISION_DETAIL, mime_type=prepared_image.vision_mime_type)
+
+                    vision_stream_errors = []
+
+                    def vision_deltas():
+                        try:
+                            # The stream is read on its own thread with the same timeout as the other backends;
+                            # Rekognition tags are rendered as they land, even while the stream stalls
+                            yield from iter_with_deadline(vision_stream or [], config.IMAGE_ANALYSIS_TIMEOUT_SECONDS,
+                                                          on_wait=lambda: render_finished(analysis_run.poll()))
+                        except Exception as e:
+                            vision_stream_errors.append(e)
+
+                    description = vision_placeholder.write_stream(vision_deltas())
+                    if vision_stream_errors and description:
+                        # Keep the partial description on screen, but never cache it
+                        st.warning(f"The image description was cut off: {vision_stream_errors[0]}")
+                    elif description:
+                        image_cache.put(image_bytes, "vision", cache_params["vision"], description)
+                    else:
+                        render_result("vision", None, vision_stream_errors[0] if vision_stream_errors else "OpenAI Vision could not generate a description.")
+                render_finished(analysis_run.results())
+
+                if prepared_image.bytes_saved > 0:
+                    st.caption(f"Preprocessing saved {prepared_image.bytes_saved / 1024:.0f} KB of upload.")
+            else:
+                st.caption("Results served from cache.")
                 
         except Exception as e:
             st.error(f"Failed to process image: {e}")
@@ -149,14 +195,27 @@ st.divider()
 # --- FAQ Section --- 
 st.header("❓ Ask the Assistant (FAQ)")
 
-if vector_store:
+# Started here, after the image section has rendered; while the index is still loading in the
+# background the question box is shown anyway, and asking waits for it
+vector_store_future = load_vector_store()
+if not vector_store_future.done() or vector_store_future.result():
     user_question_faq = st.text_input("2. Enter your FAQ question:", label_visibility="collapsed")
     if user_question_faq:
         if st.button("Ask FAQ"):
+            if not vector_store_future.done():
+                with st.spinner("Loading the FAQ index..."):
+                    vector_store_future.result()
+            vector_store = vector_store_future.result()
+            if vector_store is None:
+                st.warning("FAQ search is unavailable. Failed to load the local index. Please check console logs and ensure `index_faq.py` was run successfully.")
+                st.stop()
             with st.spinner("Thinking... 🤔"): 
-                answer = get_faq_answer(vector_store, user_question_faq) 
-                st.subheader("💬 Assistant's Response:")
-                st.markdown(answer) 
+                answer = get_faq_answer(vector_store, user_question_faq, answer_cache, stream=config.APP_STREAM_RESPONSES)
+            st.subheader("💬 Assistant's Response:")
+            if isinstance(answer, str):
+                st.markdown(answer)
+            else:
+                st.write_stream(answer)
     else:
          st.info("Enter a question above and click 'Ask FAQ'.")
 else:
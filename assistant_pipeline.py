@@ -0,0 +1,308 @@
+"""
+The image analysis and FAQ pipelines, shared by the Streamlit app and the API server.
+"""
+from rekognition_service import get_image_labels # For Rekognition tags
+from openai_service import get_openai_vision_description, get_openai_chat_completion, get_openai_embedding, get_openai_embeddings, stream_openai_chat_completion, OPENAI_VISION_MODEL
+from image_analysis import start_image_analysis # Runs Vision and Rekognition in parallel
+from retrieval import select_contexts, build_context_block, RETRIEVAL_TOP_K, RETRIEVAL_HYBRID, RETRIEVAL_HYBRID_CANDIDATES, LEXICAL_FAST_PATH # Filters, dedupes and packs FAQ contexts
+from topic_classifier import RETAIL_LABEL, NON_RETAIL_LABEL # Topic labels shared with the local classifier
+from telemetry import get_logger, span, Counter # Structured logs, stage timings and metrics
+
+import config
+
+logger = get_logger(__name__)
+
+FAQ_ANSWERS = Counter("faq_answers_total", "FAQ answers by outcome.")
+TOPIC_DECISIONS = Counter("topic_decisions_total", "Query topic classifications by source (local/llm) and label.")
+LEXICAL_FAST_PATH_HITS = Counter("faq_lexical_fast_path_total", "FAQ queries answered from an exact or unambiguous lexical match, without an embedding call.")
+
+def get_image_cache_params():
+    """Everything that changes each backend's output, so a settings change never serves a stale result."""
+    return {
+        "vision": {
+            "prompt": config.APP_VISION_PROMPT,
+            "model": OPENAI_VISION_MODEL,
+            "detail": config.DEFAULT_VISION_DETAIL,
+            "max_tokens": config.DEFAULT_VISION_MAX_TOKENS,
+            "format": config.IMAGE_VISION_FORMAT,
+            "quality": config.IMAGE_VISION_QUALITY
+        },
+        "rekognition": {
+            "max_labels": config.REKOGNITION_MAX_LABELS,
+            "min_confidence": config.REKOGNITION_MIN_CONFIDENCE,
+            "max_side": config.IMAGE_REKOGNITION_MAX_SIDE,
+            "quality": config.IMAGE_REKOGNITION_QUALITY
+        }
+    }
+
+def get_ai_vision_analysis(image_bytes, mime_type=None):
+    """Gets image description from OpenAI Vision. Raises on failure so errors are never cached."""
+    # Use prompt from config
+    description = get_openai_vision_description(image_bytes, prompt=config.APP_VISION_PROMPT, detail=config.DEFAULT_VISION_DETAIL, mime_type=mime_type)
+    if not description:
+        raise RuntimeError("OpenAI Vision could not generate a description.")
+    return description
+
+def get_rekognition_analysis(image_bytes):
+    """Gets image tags from AWS Rekognition. Raises on failure so errors are never cached."""
+    rekognition_response = get_image_labels(image_bytes)
+    if rekognition_response and 'Labels' in rekognition_response and rekognition_response['Labels']:
+        tags = [label['Name'] for label in rekognition_response['Labels']]
+        return ", ".join(tags)
+    else:
+        return "No tags detected by Rekognition."
+
+# Image analysis backends, each taking a PreparedImage
+IMAGE_BACKENDS = {
+    "vision": lambda image: get_ai_vision_analysis(image.vision_bytes, mime_type=image.vision_mime_type),
+    "rekognition": lambda image: get_rekognition_analysis(image.rekognition_bytes)
+}
+
+def analyze_image(image_bytes: bytes, image_cache=None, timeout: float | dict = config.IMAGE_ANALYSIS_TIMEOUT_SECONDS) -> tuple[dict, int]:
+    """
+    Runs every image analysis backend that has no cached result, concurrently.
+
+    Returns ({name: {'result', 'error', 'cached'}}, bytes saved by preprocessing),
+    with 'error' as a message string (None on success). Successful results are cached.
+    """
+    cache_params = get_image_cache_params()
+    results = {}
+    with span("image.total", image_bytes=len(image_bytes)) as fields:
+        if image_cache is not None:
+            for name, params in cache_params.items():
+                cached = image_cache.get(image_bytes, name, params)
+                if cached is not None:
+                    results[name] = {'result': cached, 'error': None, 'cached': True}
+        pending_backends = {name: backend for name, backend in IMAGE_BACKENDS.items() if name not in results}
+        bytes_saved = 0
+        if pending_backends:
+            # Imported on first use, so Pillow stays off the app's startup path
+            from image_preprocessing import prepare_image
+
+            with span("image.preprocess"):
+                prepared_image = prepare_image(image_bytes, detail=config.DEFAULT_VISION_DETAIL)
+            bytes_saved = prepared_image.bytes_saved
+            for name, result, error in start_image_analysis(prepared_image, pending_backends, timeout).results():
+                results[name] = {'result': result, 'error': str(error) if error is not None else None, 'cached': False}
+                if error is None and image_cache is not None:
+                    image_cache.put(image_bytes, name, cache_params[name], result)
+        fields['cached'] = len(results) - len(pending_backends)
+    return results, bytes_saved
+
+ANSWER_CUT_OFF_NOTICE = "\n\n*The answer was cut off by an error. Please ask again.*"
+
+def stream_and_cache_answer(answer_stream, fallback_answer, on_complete):
+    """
+    Passes streamed answer tokens through, then hands the full answer to
+    `on_complete`. A stream that fails partway ends with ANSWER_CUT_OFF_NOTICE
+    after the tokens already sent and is not handed on, so a truncated answer
+    is never cached.
+    """
+    parts = []
+    try:
+        for delta in answer_stream:
+            parts.append(delta)
+            yield delta
+    except Exception:
+        if parts:
+            logger.warning("OpenAI answer stream failed partway. The partial answer is not cached.")
+            yield ANSWER_CUT_OFF_NOTICE
+            return
+    answer = "".join(parts).strip()
+    if not answer:
+        logger.warning("OpenAI generation failed after retrieving context. Returning raw answer.")
+        yield fallback_answer
+        return
+    on_complete(answer)
+
+def normalize_topic_label(completion: str | None) -> str:
+    """Maps the classification completion to RETAIL_RELATED, NOT_RETAIL_RELATED or 'other', so free-form LLM text never becomes a metric label."""
+    label = (completion or "").strip().strip(".'\"").upper()
+    return label if label in (RETAIL_LABEL, NON_RETAIL_LABEL) else "other"
+
+NOT_RETAIL_ANSWER = "I specialize in questions about online retail stores. Please ask a question related to products, orders, shipping, returns, or your account."
+
+def get_faq_answer(vector_store_instance, query, answer_cache=None, stream=False, retrieval=None):
+    """
+    Retrieves top-k FAQ candidates, classifies the query topic, then uses RAG over the
+    contexts that clear the similarity floor for retail-related questions.
+    With stream=True a generated answer is returned as a generator of text deltas;
+    canned, cached and fallback answers are still returned as plain strings.
+    A `retrieval` from retrieve_faq_contexts_batch skips the retrieval stage.
+    Each stage is timed as a `faq.*` span and the outcome counted in `faq_answers_total`.
+    """
+    with span("faq.total", stream=stream) as fields:
+        answer, fields['outcome'] = _answer_faq(vector_store_instance, query, answer_cache, stream, retrieval)
+    FAQ_ANSWERS.inc(outcome=fields['outcome'])
+    return answer
+
+def _empty_retrieval() -> dict:
+    return {'lexical_match': None, 'query_embedding': None, 'search_results': None}
+
+def _match_lexical(vector_store_instance, query):
+    """The lexical fast path's match for `query`, or None (also when the fast path is off)."""
+    if not LEXICAL_FAST_PATH:
+        return None
+    with span("faq.lexical") as fields:
+        lexical_match = vector_store_instance.match_lexical(query)
+        fields['hit'] = lexical_match is not None
+    if lexical_match is not None:
+        LEXICAL_FAST_PATH_HITS.inc()
+    return lexical_match
+
+def _retrieve_faq_contexts(vector_store_instance, query) -> dict:
+    """The retrieval stage for one query: {'lexical_match', 'query_embedding', 'search_results'}."""
+    retrieval = _empty_retrieval()
+    if vector_store_instance is None or not vector_store_instance.is_ready():
+        return retrieval
+
+    # Lexical fast path: a query that is an FAQ question, or that unambiguously names one
+    # FAQ (e.g. by SKU or error code), needs no embedding, search or topic classification
+    lexical_match = retrieval['lexical_match'] = _match_lexical(vector_store_instance, query)
+    if lexical_match is not None:
+        retrieval['search_results'] = [lexical_match]
+        return retrieval
+
+    # Top-k FAQ candidates: one query embedding serves the answer cache,
+    # the local topic classifier and the FAISS search
+    with span("faq.embed"):
+        query_embedding = retrieval['query_embedding'] = get_openai_embedding(query)
+    with span("faq.search", k=RETRIEVAL_TOP_K, hybrid=RETRIEVAL_HYBRID) as fields:
+        if RETRIEVAL_HYBRID:
+            search_results = vector_store_instance.search_hybrid(query, query_embedding, k=RETRIEVAL_TOP_K)
+        else:
+            search_results = vector_store_instance.search_faq_by_embedding(query_embedding, k=RETRIEVAL_TOP_K) if query_embedding is not None else []
+        fields['results'] = len(search_results or [])
+    retrieval['search_results'] = search_results
+    return retrieval
+
+def retrieve_faq_contexts_batch(vector_store_instance, queries: list[str]) -> list[dict]:
+    """
+    The retrieval stage for many queries at once, to pass to get_faq_answer as
+    `retrieval`: lexical fast-path matches first, then one batched embedding
+    request and one FAISS search (search_many) for every other query, fused
+    with its lexical results in hybrid mode.
+    """
+    retrievals = [_empty_retrieval() for _ in queries]
+    if vector_store_instance is None or not vector_store_instance.is_ready():
+        return retrievals
+    pending = []
+    for query, retrieval in zip(queries, retrievals):
+        retrieval['lexical_match'] = _match_lexical(vector_store_instance, query)
+        if retrieval['lexical_match'] is not None:
+            retrieval['search_results'] = [retrieval['lexical_match']]
+        else:
+            pending.append((query, retrieval))
+    if not pending:
+        return retrievals
+
+    texts = [query for query, _ in pending]
+    with span("faq.embed", queries=len(texts)):
+        embeddings = get_openai_embeddings(texts)
+    candidates = max(RETRIEVAL_TOP_K, RETRIEVAL_HYBRID_CANDIDATES) if RETRIEVAL_HYBRID else RETRIEVAL_TOP_K
+    with span("faq.search", k=RETRIEVAL_TOP_K, hybrid=RETRIEVAL_HYBRID, queries=len(texts)):
+        dense = vector_store_instance.search_many(texts, k=candidates, as_dicts=True, embeddings=embeddings) or [[] for _ in texts]
+        for (query, retrieval), embedding, dense_results in zip(pending, embeddings, dense):
+            retrieval['query_embedding'] = embedding
+            if RETRIEVAL_HYBRID:
+                retrieval['search_results'] = vector_store_instance.search_hybrid(query, embedding, k=RETRIEVAL_TOP_K, dense=dense_results)
+            else:
+                retrieval['search_results'] = dense_results[:RETRIEVAL_TOP_K]
+    return retrievals
+
+def _answer_faq(vector_store_instance, query, answer_cache, stream, retrieval=None) -> tuple:
+    """The FAQ pipeline behind get_faq_answer; returns (answer, outcome)."""
+    store_ready = vector_store_instance is not None and vector_store_instance.is_ready()
+    topic_classifier = vector_store_instance.topic_classifier if store_ready else None
+
+    # 0. Retrieve Top-k FAQ Candidates, unless a batch already did
+    if retrieval is None:
+        retrieval = _retrieve_faq_contexts(vector_store_instance, query)
+    lexical_match, query_embedding, search_results = retrieval['lexical_match'], retrieval['query_embedding'], retrieval['search_results']
+
+    # Semantic Answer Cache: a near-identical earlier question that retrieved the
+    # same top FAQ is answered without any chat completion call
+    if answer_cache is not None and query_embedding is not None and search_results:
+        cached_answer = answer_cache.lookup(query_embedding, search_results[0]['id'], vector_store_instance.version)
+        if cached_answer is not None:
+            logger.debug("Answer served from semantic cache.")
+            return cached_answer, "answer_cache"
+
+    # 1. Classify Query Topic: locally from the query embedding when the classifier is
+    # confident, with the LLM only consulted for queries inside its uncertainty band
+    # A lexical match is an FAQ question, so it is retail-related by construction
+    topic_classification = "RETAIL_RELATED" if lexical_match is not None else None
+    if topic_classifier is not None and query_embedding is not None:
+        with span("faq.classify", source="local") as fields:
+            topic_classification, margin = topic_classifier.classify(query_embedding)
+            fields.update(label=topic_classification or "uncertain", margin=margin)
+        if topic_classification is not None:
+            TOPIC_DECISIONS.inc(source="local", label=topic_classification)
+    if topic_classification is not None and topic_classification != "RETAIL_RELATED":
+        return NOT_RETAIL_ANSWER, "not_retail"
+
+    # Nothing clears the similarity floor: answer without any chat completion call
+    if lexical_match is not None:
+        contexts = [lexical_match]
+    else:
+        contexts = select_contexts(search_results) if search_results else []
+    if store_ready and not contexts:
+        best_score = max((result['similarity_score'] for result in search_results or [] if result['similarity_score'] is not None), default=None)
+        logger.info("No FAQ context above the similarity floor.", extra={'best_score': best_score})
+        return "Sorry, I could not find any relevant information in the knowledge base to answer your question.", "no_context"
+
+    try:
+        if topic_classification is None:
+            # Use prompt templates and system prompt from config
+            classification_prompt = config.APP_CLASSIFY_USER_PROMPT_TEMPLATE.format(query=query)
+            system_prompt_classify = config.APP_CLASSIFY_SYSTEM_PROMPT
+            with span("faq.classify", source="llm") as fields:
+                completion = get_openai_chat_completion(prompt=classification_prompt, system_prompt=system_prompt_classify, model=config.OPENAI_CHAT_MODEL)
+                topic_classification = normalize_topic_label(completion)
+                fields['label'] = topic_classification
+            TOPIC_DECISIONS.inc(source="llm", label=topic_classification)
+
+        if topic_classification != "RETAIL_RELATED":
+            return NOT_RETAIL_ANSWER, "not_retail"
+
+    except Exception as e:
+        logger.error(f"Query Classification Error: {e}")
+        # If classification fails, proceed cautiously.
+
+    # 2. Proceed with RAG if Retail-Related
+    if not store_ready:
+        return "FAQ search is not available (index not loaded).", "unavailable"
+
+    try:
+        top_result = contexts[0]
+        logger.debug(f"Answering from {len(contexts)} of {len(search_results)} retrieved FAQ contexts.")
+
+        # Use prompt template and system prompt from config
+        rag_prompt = config.APP_RAG_USER_PROMPT_TEMPLATE.format(context=build_context_block(contexts), query=query)
+        system_prompt_rag = config.APP_RAG_SYSTEM_PROMPT
+
+        def cache_answer(answer):
+            if answer_cache is not None and query_embedding is not None:
+                answer_cache.put(query_embedding, top_result['id'], answer, vector_store_instance.version)
+
+        if stream:
+            # The stream is consumed by the caller, so generation is timed by the OpenAI stream metrics instead of a span
+            answer_stream = stream_openai_chat_completion(prompt=rag_prompt, system_prompt=system_prompt_rag)
+            if answer_stream is not None:
+                return stream_and_cache_answer(answer_stream, top_result['answer'], cache_answer), "generated"
+            logger.warning("OpenAI generation failed after retrieving context. Returning raw answer.")
+            return top_result['answer'], "raw_answer"
+
+        with span("faq.generate", contexts=len(contexts)):
+            generated_answer = get_openai_chat_completion(prompt=rag_prompt, system_prompt=system_prompt_rag)
+
+        if generated_answer:
+            cache_answer(generated_answer)
+            return generated_answer, "generated"
+        else:
+            logger.warning("OpenAI generation failed after retrieving context. Returning raw answer.")
+            return top_result['answer'], "raw_answer"
+
+    except Exception as e:
+        logger.exception(f"FAQ RAG Error: {e}")
+        return f"An error occurred during the FAQ process: {e}", "error"
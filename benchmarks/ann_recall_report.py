@@ -0,0 +1,108 @@
+"""
+Recall-vs-latency report for the FAISS index backends.
+
+Each backend is built over the same corpus and queried with a held-out set
+of vectors that were not indexed. Recall@k is measured against the exact
+flat index, for every nprobe / efSearch value given on the command line.
+
+    python -m benchmarks.ann_recall_report                     # vectors from the embedding cache
+    python -m benchmarks.ann_recall_report --synthetic 200000  # clustered random vectors
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+from faiss_service import INDEX_TYPES, create_faiss_index, set_faiss_search_params, train_faiss_index
+from index_faq import EMBEDDING_CACHE_PATH
+from openai_service import OPENAI_EMBEDDING_MODEL
+
+def synthetic_vectors(n: int, dimension: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """Gaussian blobs around random centers; closer to real embedding structure than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype("float32")
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dimension)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def search_timed(index, queries: np.ndarray, k: int) -> tuple[np.ndarray, float]:
+    """Returns (ids, mean per-query latency in ms), querying one row at a time like the app does."""
+    ids = np.empty((len(queries), k), dtype="int64")
+    started = time.perf_counter()
+    for i in range(len(queries)):
+        _, ids[i:i + 1] = index.search(queries[i:i + 1], k)
+    return ids, (time.perf_counter() - started) * 1000 / len(queries)
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t[t >= 0])) for f, t in zip(found, truth))
+    return hits / max(1, int((truth >= 0).sum()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare FAISS backends against the exact flat index.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N synthetic vectors instead of the embedding cache.")
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=500, help="Held-out query vectors (not indexed).")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=[t for t in INDEX_TYPES if t != "flat"], choices=INDEX_TYPES)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--json", help="Also write the report rows to this file.")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic + args.queries, args.dimension)
+    else:
+        cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+        vectors = cache.all_vectors(OPENAI_EMBEDDING_MODEL)
+        cache.close()
+        if len(vectors) <= args.queries:
+            print(f"Only {len(vectors)} cached embeddings in {EMBEDDING_CACHE_PATH}; run index_faq.py or use --synthetic.")
+            return
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        faiss.normalize_L2(vectors)
+
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(vectors))
+    queries = np.ascontiguousarray(vectors[order[:args.queries]])
+    corpus = np.ascontiguousarray(vectors[order[args.queries:]])
+    ids = np.arange(len(corpus), dtype="int64")
+    dimension = corpus.shape[1]
+    print(f"Corpus: {len(corpus)} vectors (d={dimension}), {len(queries)} held-out queries, k={args.k}\n")
+
+    exact = create_faiss_index("flat", dimension, len(corpus))
+    exact.add_with_ids(corpus, ids)
+    truth, flat_ms = search_timed(exact, queries, args.k)
+    rows = [{"type": "flat", "param": None, "build_s": 0.0, "recall": 1.0, "latency_ms": flat_ms}]
+
+    for index_type in args.types:
+        started = time.perf_counter()
+        index = create_faiss_index(index_type, dimension, len(corpus))
+        train_faiss_index(index, corpus)
+        index.add_with_ids(corpus, ids)
+        build_s = time.perf_counter() - started
+
+        if index_type == "hnsw":
+            params = [("efSearch", value, {"ef_search": value}) for value in args.ef_search]
+        else:
+            params = [("nprobe", value, {"nprobe": value}) for value in args.nprobe]
+        for name, value, kwargs in params:
+            set_faiss_search_params(index, **kwargs)
+            found, latency_ms = search_timed(index, queries, args.k)
+            rows.append({"type": index_type, "param": f"{name}={value}", "build_s": build_s,
+                         "recall": recall_at_k(found, truth), "latency_ms": latency_ms})
+
+    print(f"\n{'backend':<10} {'param':<14} {'build s':>9} {'recall@' + str(args.k):>10} {'ms/query':>9} {'speedup':>8}")
+    for row in rows:
+        print(f"{row['type']:<10} {row['param'] or '-':<14} {row['build_s']:>9.1f} {row['recall']:>10.3f} "
+              f"{row['latency_ms']:>9.3f} {flat_ms / row['latency_ms']:>7.1f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"corpus_size": len(corpus), "queries": len(queries), "k": args.k, "results": rows}, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Cold start of a new app process: an import-time profile of the service
+modules, and the time until app.py has rendered its first page.
+
+The profile imports each module in a fresh interpreter with `-X importtime`
+and attributes the time to top-level packages, so a regression like an SDK
+imported at module load shows up by name. Time-to-first-render runs app.py
+headless through Streamlit's AppTest in a fresh process, then asks one FAQ
+question, once with the background pre-warm (APP_PREWARM_IN_BACKGROUND)
+and once without, against a synthetic index and the local fake OpenAI and
+Rekognition servers.
+
+    python -m benchmarks.bench_cold_start
+    python -m benchmarks.bench_cold_start --size 100000 --repeats 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_openai_server import create_server as create_openai_server
+from benchmarks.fake_rekognition_server import create_server as create_rekognition_server
+from benchmarks.run_suite import REPO_DIR, build_directly, synthetic_faq
+
+PROFILED_MODULES = ("config", "telemetry", "openai_service", "rekognition_service", "faiss_service", "assistant_pipeline", "api_server")
+DIMENSION = 256
+
+def import_profile(module: str) -> dict:
+    """Import time of `module` in a fresh interpreter, in total and by top-level package (self time)."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True).stderr
+    by_package = {}
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+    return {'total_ms': total_us / 1000, 'packages_ms': {package: us / 1000 for package, us in by_package.items()}}
+
+def child(build_dir: str, think_time: float):
+    """
+    Renders app.py in this fresh process, then asks one FAQ question after
+    `think_time` seconds (a user reading the page and typing), and reports
+    the timings as one JSON line.
+    """
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    imported_at = time.perf_counter()
+    app = AppTest.from_file(os.path.join(REPO_DIR, "app.py"), default_timeout=300).run()
+    rendered_at = time.perf_counter()
+    # The pre-warm threads are the only ones with this prefix; the page is usable before they finish
+    for thread in threading.enumerate():
+        if thread.name.startswith("prewarm"):
+            thread.join()
+    warmed_at = time.perf_counter()
+    faq_input_rendered = len(app.text_input) > 0
+    first_answer_seconds = None
+    if faq_input_rendered:
+        time.sleep(max(0.0, think_time - (warmed_at - rendered_at)))
+        app.text_input[0].input("How do I return my order?").run()
+        asked_at = time.perf_counter()
+        app.button[-1].click().run()
+        first_answer_seconds = time.perf_counter() - asked_at
+    print(json.dumps({
+        'streamlit_import_seconds': imported_at - started,
+        'first_render_seconds': rendered_at - imported_at,
+        'ready_seconds': warmed_at - imported_at,
+        'first_answer_seconds': first_answer_seconds,
+        'exceptions': [str(exception.value) for exception in app.exception],
+        'faq_input_rendered': faq_input_rendered
+    }))
+
+def run_child(build_dir: str, prewarm: bool, think_time: float) -> dict:
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-m", "benchmarks.bench_cold_start", "--child", build_dir, "--think-time", str(think_time)], cwd=REPO_DIR,
+                               env={**os.environ, 'APP_PREWARM_IN_BACKGROUND': "1" if prewarm else "0"},
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"app.py render failed:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_seconds'] = time.perf_counter() - started
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time and measure app.py time-to-first-render.")
+    parser.add_argument("--size", type=int, default=10000, help="FAQ entries in the synthetic index.")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh processes per variant.")
+    parser.add_argument("--top", type=int, default=8, help="Slowest packages listed per module.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Per-request latency of the fake servers, in seconds.")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Seconds between the first render and asking the first question.")
+    parser.add_argument("--skip-profile", action="store_true")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.think_time)
+        return
+
+    results = {'import_profile': {}, 'first_render': {}}
+    if not args.skip_profile:
+        print("Import time in a fresh interpreter (ms):")
+        for module in PROFILED_MODULES:
+            profile = import_profile(module)
+            results['import_profile'][module] = profile
+            slowest = sorted(profile['packages_ms'].items(), key=lambda item: item[1], reverse=True)[:args.top]
+            print(f"  {module:<20} {profile['total_ms']:8.1f}   " + ", ".join(f"{package} {ms:.0f}" for package, ms in slowest))
+
+    servers = [create_openai_server(port=0, latency=args.latency, dimension=DIMENSION), create_rekognition_server(port=0, latency=args.latency)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory(prefix="bench-cold-start-") as build_dir:
+        os.environ.update({
+            'OPENAI_BASE_URL': f"http://127.0.0.1:{servers[0].server_port}/v1",
+            'OPENAI_API_KEY': "fake",
+            'OPENAI_EMBEDDING_MODEL_DIMENSION': str(DIMENSION),
+            'REKOGNITION_ENDPOINT_URL': f"http://127.0.0.1:{servers[1].server_port}",
+            'AWS_ACCESS_KEY_ID': "fake",
+            'AWS_SECRET_ACCESS_KEY': "fake",
+            'FAISS_OUTPUT_DIR_NAME': build_dir,
+            'QUERY_EMBEDDING_CACHE_PATH': "",
+            'LOG_LEVEL': os.getenv("LOG_LEVEL", "ERROR")
+        })
+        build_directly(synthetic_faq(args.size), build_dir, DIMENSION)
+
+        print(f"\napp.py time-to-first-render, {args.size} FAQs, {args.repeats} fresh processes each (median seconds):")
+        for prewarm in (True, False):
+            runs = [run_child(build_dir, prewarm, args.think_time) for _ in range(args.repeats)]
+            variant = "prewarm" if prewarm else "blocking"
+            summary = {key: statistics.median(run[key] for run in runs)
+                       for key in ("process_seconds", "streamlit_import_seconds", "first_render_seconds", "ready_seconds", "first_answer_seconds")
+                       if all(run[key] is not None for run in runs)}
+            summary['exceptions'] = sorted({error for run in runs for error in run['exceptions']})
+            summary['faq_input_rendered'] = all(run['faq_input_rendered'] for run in runs)
+            results['first_render'][variant] = summary
+            first_answer = summary.get('first_answer_seconds')
+            print(f"  {variant:<9} first render {summary['first_render_seconds']:.3f}  index and clients ready {summary['ready_seconds']:.3f}"
+                  f"  first answer {'n/a' if first_answer is None else f'{first_answer:.3f}'}"
+                  f"  (streamlit import {summary['streamlit_import_seconds']:.3f})")
+            for error in summary['exceptions']:
+                print(f"    app raised: {error}")
+    for server in servers:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Query embedding latency and API calls under concurrent load, with and without
+the EmbeddingDispatcher in openai_service.
+
+`--users` threads each embed `--requests` questions back to back, after a
+random think time of up to `--think-time` seconds. A `--duplicate-rate` share
+of the questions is one of a few popular ones, so concurrent users sometimes
+ask the same thing. The query embedding cache is bypassed, so every call
+needs the API. The local fake OpenAI server serves at most
+`--server-concurrency` requests at once, like a provider-side limit, and
+further requests queue. Each variant reports the embedding requests and
+inputs the server saw (from its /stats) and the per-call latency.
+
+    python -m benchmarks.bench_embedding_coalescing
+    python -m benchmarks.bench_embedding_coalescing --users 128 --windows-ms 1 2 5 10 --latency 0.1
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+from benchmarks.fake_openai_server import create_server
+
+HOT_QUESTIONS = [f"What is your {topic} policy?" for topic in ("return", "shipping", "warranty", "refund", "exchange")]
+
+def fetch_stats(port: int) -> dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/v1/stats") as response:
+        return json.load(response)
+
+def user_queries(users: int, requests: int, duplicate_rate: float, seed: int) -> list[list[str]]:
+    rng = random.Random(seed)
+    return [
+        [rng.choice(HOT_QUESTIONS) if rng.random() < duplicate_rate else f"Where is order {rng.randrange(10 ** 8)} for user {user}?"
+         for _ in range(requests)]
+        for user in range(users)
+    ]
+
+def run_variant(embed, queries: list[list[str]], think_time: float, port: int, seed: int) -> dict:
+    """Runs every user's queries through `embed` on its own thread, all starting together."""
+    latencies, failures = [], 0
+    lock = threading.Lock()
+    start = threading.Barrier(len(queries))
+
+    def user(index: int, texts: list[str]):
+        nonlocal failures
+        rng = random.Random(seed + index)
+        start.wait()
+        for text in texts:
+            time.sleep(rng.uniform(0, think_time))
+            started = time.perf_counter()
+            embedding = embed(text)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                failures += embedding is None
+
+    before = fetch_stats(port)
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i, texts)) for i, texts in enumerate(queries)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+    after = fetch_stats(port)
+    api_requests = after['requests'] - before['requests']
+    return {
+        'calls': len(latencies),
+        'failures': failures,
+        'api_requests': api_requests,
+        'api_inputs': after['inputs'] - before['inputs'],
+        'mean_batch': (after['inputs'] - before['inputs']) / max(1, api_requests),
+        'calls_per_second': len(latencies) / wall_seconds,
+        'p50_ms': float(np.percentile(latencies, 50)) * 1000,
+        'p95_ms': float(np.percentile(latencies, 95)) * 1000,
+        'p99_ms': float(np.percentile(latencies, 99)) * 1000
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure query embedding coalescing under concurrent load.")
+    parser.add_argument("--users", type=int, default=64, help="Concurrent users (threads).")
+    parser.add_argument("--requests", type=int, default=20, help="Questions per user.")
+    parser.add_argument("--think-time", type=float, default=0.02, help="Maximum random pause before each question, in seconds.")
+    parser.add_argument("--duplicate-rate", type=float, default=0.3, help="Share of questions that are one of a few popular ones.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Per-request latency of the fake server, in seconds.")
+    parser.add_argument("--server-concurrency", type=int, default=16, help="Requests the fake server serves at once (0: unlimited).")
+    parser.add_argument("--windows-ms", type=float, nargs="+", default=[2.0, 5.0, 10.0], help="Coalescing windows to compare.")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    server = create_server(port=0, latency=args.latency, dimension=256, max_concurrency=args.server_concurrency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update({'OPENAI_BASE_URL': f"http://127.0.0.1:{server.server_port}/v1", 'OPENAI_API_KEY': "fake",
+                       'LOG_LEVEL': os.getenv("LOG_LEVEL", "ERROR")})
+    # Imported after the environment points the client at the fake server
+    from openai_service import EmbeddingDispatcher, get_openai_embedding
+
+    queries = user_queries(args.users, args.requests, args.duplicate_rate, args.seed)
+    variants = {'direct': lambda text: get_openai_embedding(text, use_cache=False, coalesce=False)}
+    for window_ms in args.windows_ms:
+        dispatcher = EmbeddingDispatcher(window_seconds=window_ms / 1000, max_batch_size=args.max_batch, max_in_flight=args.max_in_flight)
+        variants[f"coalesced {window_ms:g}ms"] = dispatcher.embed
+
+    # Warms up the client and its connection pool, so no variant pays for them
+    run_variant(variants['direct'], user_queries(min(args.users, 8), 2, 0.0, args.seed + 1), 0.0, server.server_port, args.seed)
+
+    print(f"{args.users} users x {args.requests} questions, {args.duplicate_rate:.0%} popular, "
+          f"fake server {args.latency * 1000:.0f} ms per request, {args.server_concurrency or 'unlimited'} at once")
+    print(f"{'variant':<18} {'API calls':>9} {'inputs':>7} {'texts/call':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'calls/s':>8} {'failed':>6}")
+    results = {}
+    for name, embed in variants.items():
+        result = results[name] = run_variant(embed, queries, args.think_time, server.server_port, args.seed)
+        print(f"{name:<18} {result['api_requests']:>9} {result['api_inputs']:>7} {result['mean_batch']:>10.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['calls_per_second']:>8.0f} {result['failures']:>6}")
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Sequential vs concurrent image analysis latency with stub backends.
+
+The stubs sleep for a configurable time instead of calling OpenAI Vision and
+Rekognition, so the result isolates the orchestration: sequential latency
+should approach the sum of both delays, concurrent latency the larger one.
+
+    python -m benchmarks.bench_image_analysis --vision-delay 1.2 --rekognition-delay 0.6
+"""
+import argparse
+import statistics
+import time
+
+from image_analysis import analyze_image_concurrently
+
+def make_stub(delay: float, result: str):
+    def backend(image_bytes):
+        time.sleep(delay)
+        return result
+    return backend
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent image analysis against sequential calls.")
+    parser.add_argument("--vision-delay", type=float, default=1.0)
+    parser.add_argument("--rekognition-delay", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = {
+        "vision": make_stub(args.vision_delay, "a stub description"),
+        "rekognition": make_stub(args.rekognition_delay, "Stub, Tags"),
+    }
+    image_bytes = b"\xff\xd8stub"
+
+    sequential, concurrent, first_result = [], [], []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        for backend in backends.values():
+            backend(image_bytes)
+        sequential.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for i, _ in enumerate(analyze_image_concurrently(image_bytes, backends)):
+            if i == 0:
+                first_result.append(time.perf_counter() - started)
+        concurrent.append(time.perf_counter() - started)
+
+    expected_sum = args.vision_delay + args.rekognition_delay
+    expected_max = max(args.vision_delay, args.rekognition_delay)
+    print(f"Backends: vision={args.vision_delay:.2f}s rekognition={args.rekognition_delay:.2f}s, {args.runs} runs")
+    print(f"Sequential:   median {statistics.median(sequential):.3f}s (sum of delays {expected_sum:.3f}s)")
+    print(f"Concurrent:   median {statistics.median(concurrent):.3f}s (slowest backend {expected_max:.3f}s)")
+    print(f"First column: median {statistics.median(first_result):.3f}s")
+    print(f"Speedup:      {statistics.median(sequential) / statistics.median(concurrent):.2f}x")
+
+    # A backend that overruns its timeout is reported without delaying the other one
+    started = time.perf_counter()
+    outcomes = {name: error for name, _, error in analyze_image_concurrently(image_bytes, backends, timeout={"vision": expected_max / 4})}
+    print(f"With vision timeout {expected_max / 4:.2f}s: finished in {time.perf_counter() - started:.3f}s, "
+          f"vision error={type(outcomes['vision']).__name__}, rekognition error={outcomes['rekognition']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Startup time and resident memory of the JSON vs memory-mapped metadata paths.
+
+A synthetic corpus (or an existing build, with --index-dir) is loaded in a
+fresh subprocess per variant so each measurement starts from a clean heap:
+
+    json  json.load of the data file + faiss.read_index
+    mmap  the columnar metadata file via mmap + read_faiss_index (memory-mapped)
+
+RSS after lookups grows with the pages those lookups touch; in the mmap case
+those are file-backed page cache pages, shared by every worker process and
+reclaimable under memory pressure, unlike the JSON path's heap objects.
+
+    python -m benchmarks.bench_metadata_load --entries 1000000 --vectors 0
+    python -m benchmarks.bench_metadata_load --index-dir faiss_index
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def write_synthetic_build(directory: str, entries: int, dimension: int) -> tuple[str, str, str]:
+    import faiss
+    from faq_metadata import write_faq_metadata
+
+    rng = np.random.default_rng(0)
+    records = [
+        {'id': i, 'question': f"How do I handle case {i} for my order?",
+         'answer': f"Answer {i}: " + "Please contact support with your order number. " * int(rng.integers(2, 10)),
+         'source_key': str(i), 'question_hash': f"{i:064x}"}
+        for i in range(entries)
+    ]
+    data_path = os.path.join(directory, "faq-index_data.json")
+    metadata_path = os.path.join(directory, "faq-index_data.bin")
+    index_path = os.path.join(directory, "faq-index.faiss")
+    with open(data_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    write_faq_metadata(metadata_path, records)
+    if dimension:
+        index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+        for start in range(0, entries, 100_000):
+            count = min(100_000, entries - start)
+            vectors = rng.standard_normal((count, dimension)).astype("float32")
+            index.add_with_ids(vectors, np.arange(start, start + count, dtype="int64"))
+        faiss.write_index(index, index_path)
+    return data_path, metadata_path, index_path if dimension else ""
+
+def child(mode: str, data_path: str, metadata_path: str, index_path: str, lookups: int):
+    import faiss
+    from faq_metadata import InMemoryFAQMetadata, MmapFAQMetadata
+    from faiss_service import read_faiss_index
+
+    baseline = rss_bytes()
+    started = time.perf_counter()
+    if mode == "json":
+        with open(data_path, 'r', encoding='utf-8') as f:
+            metadata = InMemoryFAQMetadata(json.load(f))
+        index = faiss.read_index(index_path) if index_path else None
+    else:
+        metadata = MmapFAQMetadata(metadata_path)
+        index = read_faiss_index(index_path) if index_path else None
+    load_seconds = time.perf_counter() - started
+    loaded_rss = rss_bytes()
+
+    ids = np.random.default_rng(1).choice(metadata.ids, size=lookups)
+    started = time.perf_counter()
+    for vector_id in ids:
+        row = int(metadata.lookup_rows(np.array([vector_id]))[0])
+        metadata.question(row), metadata.answer(row)
+    lookup_us = (time.perf_counter() - started) * 1e6 / lookups
+    print(json.dumps({
+        'mode': mode,
+        'entries': len(metadata),
+        'vectors': index.ntotal if index is not None else 0,
+        'load_seconds': load_seconds,
+        'rss_delta_mb': (loaded_rss - baseline) / 2**20,
+        'rss_after_lookups_mb': (rss_bytes() - baseline) / 2**20,
+        'lookup_us': lookup_us
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and memory-mapped metadata loading.")
+    parser.add_argument("--entries", type=int, default=200_000, help="Synthetic FAQ entries.")
+    parser.add_argument("--vectors", type=int, default=256, help="Synthetic vector dimension; 0 skips the FAISS index.")
+    parser.add_argument("--index-dir", help="Use an existing build (faq-index*.json/.bin/.faiss) instead.")
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--json", help="Also write the report rows to this file.")
+    parser.add_argument("--child", nargs=4, metavar=("MODE", "DATA", "METADATA", "INDEX"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child, args.lookups)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.index_dir:
+            from index_manifest import resolve_build_paths
+
+            build, _ = resolve_build_paths(args.index_dir, os.getenv("FAISS_INDEX_BASE_NAME", "faq-index"))
+            paths = (build['data'], build['metadata'], build['index'])
+        else:
+            print(f"Writing a synthetic build with {args.entries} entries...")
+            paths = write_synthetic_build(tmp, args.entries, args.vectors)
+
+        rows = []
+        for mode in ("json", "mmap"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_metadata_load", "--lookups", str(args.lookups), "--child", mode, *paths],
+                capture_output=True, text=True, check=True
+            ).stdout
+            rows.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"\n{'mode':>5} {'entries':>9} {'vectors':>9} {'load s':>8} {'RSS MB':>8} {'RSS MB (after lookups)':>23} {'lookup us':>10}")
+    for row in rows:
+        print(f"{row['mode']:>5} {row['entries']:>9} {row['vectors']:>9} {row['load_seconds']:>8.3f} {row['rss_delta_mb']:>8.1f} "
+              f"{row['rss_after_lookups_mb']:>23.1f} {row['lookup_us']:>10.1f}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Retrieval quality and latency of the FAQ retrieval stage on a fixed evaluation set.
+
+The evaluation set is a JSON list of {"query": ..., "expected_question": ...}
+entries; an entry with "expected_question": null is a query that should not
+match anything and is expected to short-circuit. Without --eval-set, one is
+derived deterministically from the built index by perturbing each FAQ
+question (lowercased, punctuation stripped, one word dropped).
+
+For every similarity floor in the sweep the report shows recall@1, recall@k
+and MRR of the raw search results, how often the expected FAQ survives into
+the packed contexts, how often queries short-circuit, and per-query search
+and selection latency. --mode picks the search: FAISS only (dense), FAISS
+and BM25 fused by reciprocal rank (hybrid), or BM25 only (lexical). The
+report also shows how many queries the lexical fast path would answer
+without an embedding call, and how often its match is the expected FAQ.
+
+    python -m benchmarks.eval_retrieval --limit 500 --write-eval eval.json
+    python -m benchmarks.eval_retrieval --eval-set eval.json --floors 0.7 0.75 0.78 0.8 0.85
+    python -m benchmarks.eval_retrieval --eval-set eval.json --mode dense
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+import numpy as np
+
+from faiss_service import FAISSVectorStore
+from openai_service import estimate_token_count, get_openai_embeddings
+from retrieval import (RETRIEVAL_CONTEXT_TOKEN_BUDGET, RETRIEVAL_DEDUPE_JACCARD, RETRIEVAL_MIN_SIMILARITY,
+                       RETRIEVAL_TOP_K, build_context_block, select_contexts)
+
+def search(store: FAISSVectorStore, mode: str, query: str, embedding: list[float] | None, k: int) -> list[dict]:
+    if mode == "lexical":
+        return store.search_lexical(query, k=k)
+    if mode == "hybrid":
+        return store.search_hybrid(query, embedding, k=k)
+    return store.search_faq_by_embedding(embedding, k=k)
+
+def derive_eval_set(store: FAISSVectorStore, limit: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    rows = list(range(len(store.metadata)))
+    rng.shuffle(rows)
+    eval_set = []
+    for row in rows[:limit]:
+        question = store.metadata.question(row)
+        words = question.lower().translate(str.maketrans("", "", string.punctuation)).split()
+        if len(words) > 3:
+            del words[rng.randrange(len(words))]
+        eval_set.append({'query': " ".join(words), 'expected_question': question})
+    return eval_set
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    return float(np.percentile(samples, q)) * 1000 if samples else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate FAQ retrieval quality and latency.")
+    parser.add_argument("--eval-set", help="JSON evaluation set; derived from the index when omitted.")
+    parser.add_argument("--write-eval", help="Save the (derived) evaluation set here, to keep it fixed across runs.")
+    parser.add_argument("--limit", type=int, default=300, help="Queries to derive from the index.")
+    parser.add_argument("--k", type=int, default=RETRIEVAL_TOP_K)
+    parser.add_argument("--mode", choices=["dense", "hybrid", "lexical"], default="hybrid")
+    parser.add_argument("--floors", type=float, nargs="+", default=[RETRIEVAL_MIN_SIMILARITY])
+    parser.add_argument("--dedupe-jaccard", type=float, default=RETRIEVAL_DEDUPE_JACCARD)
+    parser.add_argument("--token-budget", type=int, default=RETRIEVAL_CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--json", help="Also write the report rows to this file.")
+    args = parser.parse_args()
+
+    store = FAISSVectorStore()
+    if not store.is_ready():
+        print("FAISS index not loaded; run index_faq.py first.")
+        return
+    if args.mode != "dense" and store.lexical_index is None:
+        print("No lexical index in this build; rerun index_faq.py, or use --mode dense.")
+        return
+
+    if args.eval_set:
+        with open(args.eval_set, 'r', encoding='utf-8') as f:
+            eval_set = json.load(f)
+    else:
+        eval_set = derive_eval_set(store, args.limit)
+    if args.write_eval:
+        with open(args.write_eval, 'w', encoding='utf-8') as f:
+            json.dump(eval_set, f, ensure_ascii=False, indent=2)
+
+    if args.mode == "lexical":
+        embeddings = [None] * len(eval_set)
+    else:
+        embeddings = get_openai_embeddings([item['query'] for item in eval_set])
+    searched, search_seconds = [], []
+    for item, embedding in zip(eval_set, embeddings):
+        if embedding is None and args.mode != "lexical":
+            continue
+        started = time.perf_counter()
+        results = search(store, args.mode, item['query'], embedding, args.k)
+        search_seconds.append(time.perf_counter() - started)
+        searched.append((item, results))
+    print(f"Evaluating {len(searched)} of {len(eval_set)} queries (k={args.k}, {args.mode} search).")
+
+    if store.lexical_index is not None:
+        fast_path, fast_path_correct, match_seconds = 0, 0, []
+        for item in eval_set:
+            started = time.perf_counter()
+            match = store.match_lexical(item['query'])
+            match_seconds.append(time.perf_counter() - started)
+            if match is not None:
+                fast_path += 1
+                fast_path_correct += match['question'] == item.get('expected_question')
+        print(f"Lexical fast path: {fast_path / max(1, len(eval_set)):.1%} of queries skip the embedding call, "
+              f"{fast_path_correct / max(1, fast_path):.1%} of them matched to the expected FAQ "
+              f"(p50 {percentile_ms(match_seconds, 50):.3f} ms, p95 {percentile_ms(match_seconds, 95):.3f} ms).")
+
+    rows = []
+    for floor in args.floors:
+        hits_at_1 = hits_at_k = context_hits = reciprocal_rank = 0.0
+        positives = negatives = short_circuited_positives = short_circuited_negatives = 0
+        context_counts, context_tokens, select_seconds = [], [], []
+        for item, results in searched:
+            started = time.perf_counter()
+            contexts = select_contexts(results, min_similarity=floor, dedupe_jaccard=args.dedupe_jaccard,
+                                       token_budget=args.token_budget)
+            select_seconds.append(time.perf_counter() - started)
+            expected = item.get('expected_question')
+            if expected is None:
+                negatives += 1
+                short_circuited_negatives += not contexts
+                continue
+            positives += 1
+            short_circuited_positives += not contexts
+            ranks = [rank for rank, result in enumerate(results, 1) if result['question'] == expected]
+            hits_at_1 += bool(ranks) and ranks[0] == 1
+            hits_at_k += bool(ranks)
+            reciprocal_rank += 1 / ranks[0] if ranks else 0.0
+            context_hits += any(result['question'] == expected for result in contexts)
+            if contexts:
+                context_counts.append(len(contexts))
+                context_tokens.append(estimate_token_count(build_context_block(contexts)))
+        rows.append({
+            'mode': args.mode,
+            'floor': floor,
+            'positives': positives,
+            'negatives': negatives,
+            'recall_at_1': hits_at_1 / max(1, positives),
+            f'recall_at_{args.k}': hits_at_k / max(1, positives),
+            'mrr': reciprocal_rank / max(1, positives),
+            'context_recall': context_hits / max(1, positives),
+            'short_circuit_rate_positives': short_circuited_positives / max(1, positives),
+            'short_circuit_rate_negatives': short_circuited_negatives / max(1, negatives) if negatives else None,
+            'mean_contexts': float(np.mean(context_counts)) if context_counts else 0.0,
+            'mean_context_tokens': float(np.mean(context_tokens)) if context_tokens else 0.0,
+            'search_p50_ms': percentile_ms(search_seconds, 50),
+            'search_p95_ms': percentile_ms(search_seconds, 95),
+            'select_p50_ms': percentile_ms(select_seconds, 50),
+            'select_p95_ms': percentile_ms(select_seconds, 95)
+        })
+
+    print(f"\n{'floor':>6} {'R@1':>6} {f'R@{args.k}':>6} {'MRR':>6} {'ctx R':>6} {'SC pos':>7} {'SC neg':>7} "
+          f"{'ctx':>5} {'tokens':>7} {'search p50/p95 ms':>18} {'select p50/p95 ms':>18}")
+    for row in rows:
+        negative_rate = "-" if row['short_circuit_rate_negatives'] is None else f"{row['short_circuit_rate_negatives']:.1%}"
+        print(f"{row['floor']:>6.3f} {row['recall_at_1']:>6.1%} {row[f'recall_at_{args.k}']:>6.1%} {row['mrr']:>6.3f} "
+              f"{row['context_recall']:>6.1%} {row['short_circuit_rate_positives']:>7.1%} {negative_rate:>7} "
+              f"{row['mean_contexts']:>5.2f} {row['mean_context_tokens']:>7.0f} "
+              f"{row['search_p50_ms']:>8.2f}/{row['search_p95_ms']:<9.2f} {row['select_p50_ms']:>8.3f}/{row['select_p95_ms']:<9.3f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Offline evaluation of the local topic classifier against the LLM classifier.
+
+Every query is embedded and classified locally, and also sent through the
+app's LLM classification prompt. The report shows how often the local
+classifier decides on its own (each such query saves one chat completion
+round trip), how often those decisions agree with the LLM label, and how
+the uncertainty band changes that trade-off.
+
+    python -m benchmarks.eval_topic_classifier queries.json          # ["Where is my order?", ...]
+    python -m benchmarks.eval_topic_classifier data/topic_examples.json --json report.json
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import config
+from faiss_service import TOPIC_CLASSIFIER_PATH_FULL
+from openai_service import get_openai_chat_completion, get_openai_embeddings
+from topic_classifier import CentroidTopicClassifier, RETAIL_LABEL, NON_RETAIL_LABEL
+
+def load_queries(path: str) -> list[str]:
+    """Accepts a JSON list of strings or of {"text"/"question": ...} objects, or JSONL of either."""
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = f.read()
+    try:
+        items = json.loads(raw)
+    except json.JSONDecodeError:
+        items = [json.loads(line) for line in raw.splitlines() if line.strip()]
+    queries = []
+    for item in items:
+        text = item if isinstance(item, str) else item.get('text') or item.get('question')
+        if text:
+            queries.append(text)
+    return queries
+
+def llm_label(query: str) -> str | None:
+    prompt = config.APP_CLASSIFY_USER_PROMPT_TEMPLATE.format(query=query)
+    return get_openai_chat_completion(prompt=prompt, system_prompt=config.APP_CLASSIFY_SYSTEM_PROMPT, model=config.OPENAI_CHAT_MODEL)
+
+def evaluate(margins: np.ndarray, llm_labels: list[str | None], low: float, high: float) -> dict:
+    local = np.where(margins > high, RETAIL_LABEL, np.where(margins < low, NON_RETAIL_LABEL, ""))
+    labelled = np.array([label in (RETAIL_LABEL, NON_RETAIL_LABEL) for label in llm_labels])
+    decided = (local != "") & labelled
+    agree = decided & (local == np.array([label or "" for label in llm_labels]))
+    return {
+        'uncertainty_low': low,
+        'uncertainty_high': high,
+        'queries': int(labelled.sum()),
+        'decided_locally': int(decided.sum()),
+        'round_trips_saved_rate': float(decided.sum() / max(1, labelled.sum())),
+        'local_agreement': float(agree.sum() / max(1, decided.sum())),
+        # Uncertain queries go to the LLM, so they always "agree" in the combined pipeline
+        'pipeline_agreement': float((agree.sum() + (labelled & (local == "")).sum()) / max(1, labelled.sum()))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the local topic classifier with LLM classification.")
+    parser.add_argument("queries", help="JSON or JSONL file of queries.")
+    parser.add_argument("--classifier", default=TOPIC_CLASSIFIER_PATH_FULL)
+    parser.add_argument("--limit", type=int, default=0, help="Only evaluate the first N queries.")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent LLM classification calls.")
+    parser.add_argument("--bands", type=float, nargs="+", default=[0.0, 0.02, 0.05, 0.1],
+                        help="Extra symmetric band half-widths to report alongside the configured band.")
+    parser.add_argument("--json", help="Also write the report rows to this file.")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    if args.limit:
+        queries = queries[:args.limit]
+    classifier = CentroidTopicClassifier.load(args.classifier, config.TOPIC_CLASSIFIER_UNCERTAINTY_LOW,
+                                              config.TOPIC_CLASSIFIER_UNCERTAINTY_HIGH)
+
+    embeddings = get_openai_embeddings(queries)
+    kept = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+    if len(kept) < len(queries):
+        print(f"Skipping {len(queries) - len(kept)} queries that could not be embedded.")
+    margins = np.array([classifier.margin(embeddings[i]) for i in kept])
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        llm_labels = list(pool.map(llm_label, [queries[i] for i in kept]))
+
+    bands = [(config.TOPIC_CLASSIFIER_UNCERTAINTY_LOW, config.TOPIC_CLASSIFIER_UNCERTAINTY_HIGH)]
+    bands += [(-width, width) for width in args.bands]
+    rows = [evaluate(margins, llm_labels, low, high) for low, high in bands]
+
+    print(f"\n{'band':>17} {'queries':>8} {'local':>6} {'saved':>7} {'local agree':>12} {'pipeline agree':>15}")
+    for row in rows:
+        band = f"[{row['uncertainty_low']:+.3f}, {row['uncertainty_high']:+.3f}]"
+        print(f"{band:>17} {row['queries']:>8} {row['decided_locally']:>6} {row['round_trips_saved_rate']:>7.1%} "
+              f"{row['local_agreement']:>12.1%} {row['pipeline_agreement']:>15.1%}")
+    print("(first row is the configured band)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
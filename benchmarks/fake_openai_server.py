@@ -0,0 +1,202 @@
+"""
+Local stand-in for the OpenAI embeddings and chat completions endpoints.
+
+Embeddings are deterministic, L2-normalized pseudo-vectors derived from a
+hash of each input text, so indexing can be exercised end to end without
+network access or API costs. Chat completions return a canned answer (RETAIL_RELATED for the app's
+classification prompt), and
+with "stream": true send it as server-sent events with a configurable delay
+per token. A fraction of requests can be answered with HTTP 429 (rate limit)
+or HTTP 500 (server error), and the number of requests served at once can be
+capped, to model a provider-side concurrency limit (further requests queue).
+Point the OpenAI client at it with:
+
+    python -m benchmarks.fake_openai_server --port 8089 --latency 0.05 --rate-limit-rate 0.1 --error-rate 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake python index_faq.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+FAKE_ANSWER = "This is a canned answer from the local fake OpenAI server, returned for every chat completion request."
+
+def fake_embedding(text: str, dimension: int) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype("float32")
+    vector /= np.linalg.norm(vector)
+    return vector.tolist()
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    server_version = "FakeOpenAI/0.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_error(self) -> bool:
+        """Answers with an injected 429 or 500 (and returns True) at the configured rates."""
+        options = self.server.options
+        if random.random() < options.rate_limit_rate:
+            with self.server.stats_lock:
+                self.server.stats["rate_limited"] += 1
+            self._send_json(429, {"error": {"message": "Rate limit reached (fake)", "type": "rate_limit_error"}},
+                            headers={"retry-after": "0.1"})
+            return True
+        if random.random() < options.error_rate:
+            with self.server.stats_lock:
+                self.server.stats["errors"] += 1
+            self._send_json(500, {"error": {"message": "Internal server error (fake)", "type": "server_error"}})
+            return True
+        return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.server.slots is None:
+            self._handle(request)
+            return
+        with self.server.slots:
+            self._handle(request)
+
+    def _handle(self, request: dict):
+        options = self.server.options
+
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            self._chat_completion(request)
+            return
+        if not self.path.rstrip("/").endswith("/embeddings"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+
+        if options.latency > 0:
+            time.sleep(options.latency)
+        if self._inject_error():
+            return
+
+        inputs = request.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(text, options.dimension)}
+            for i, text in enumerate(inputs)
+        ]
+        tokens = sum(max(1, len(text) // 4) for text in inputs)
+        with self.server.stats_lock:
+            self.server.stats["inputs"] += len(inputs)
+        self._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _chat_completion(self, request: dict):
+        options = self.server.options
+        with self.server.stats_lock:
+            self.server.stats["chat_requests"] += 1
+        if options.latency > 0:
+            time.sleep(options.latency)
+        if self._inject_error():
+            return
+        # Answer the app's topic classification prompt so the full FAQ path can be exercised
+        prompt_text = json.dumps(request.get("messages", []))
+        answer = "RETAIL_RELATED" if "NOT_RETAIL_RELATED" in prompt_text else FAKE_ANSWER
+        tokens = [word + " " for word in answer.split()]
+        tokens[-1] = tokens[-1].rstrip()
+        model = request.get("model", "fake-chat")
+
+        if not request.get("stream"):
+            time.sleep(options.token_delay * len(tokens))
+            self._send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": len(tokens), "total_tokens": 10 + len(tokens)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def send_chunk(choices, usage=None):
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices, "usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for token in tokens:
+            time.sleep(options.token_delay)
+            send_chunk([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+        send_chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (request.get("stream_options") or {}).get("include_usage"):
+            send_chunk([], {"prompt_tokens": 10, "completion_tokens": len(tokens), "total_tokens": 10 + len(tokens)})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    # socketserver's default backlog of 5 drops connections under concurrent load, adding 1-3 s SYN retries
+    request_queue_size = 256
+
+def create_server(host: str = "127.0.0.1", port: int = 8089, latency: float = 0.0,
+                  rate_limit_rate: float = 0.0, dimension: int = 1536, token_delay: float = 0.0,
+                  error_rate: float = 0.0, max_concurrency: int = 0) -> FakeOpenAIServer:
+    """Builds (but does not start) a fake server; use port 0 to pick a free port."""
+    server = FakeOpenAIServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.options = argparse.Namespace(latency=latency, rate_limit_rate=rate_limit_rate, dimension=dimension,
+                                        token_delay=token_delay, error_rate=error_rate)
+    server.stats = {"requests": 0, "inputs": 0, "rate_limited": 0, "errors": 0, "chat_requests": 0}
+    server.stats_lock = threading.Lock()
+    # Requests beyond max_concurrency wait for a slot (0: unlimited)
+    server.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI embeddings/chat endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep per request.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500.")
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds per generated chat token.")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Requests served at once; others queue (0: unlimited).")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency, args.rate_limit_rate, args.dimension, args.token_delay,
+                           args.error_rate, args.max_concurrency)
+    print(f"Fake OpenAI server listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
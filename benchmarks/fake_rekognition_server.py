@@ -0,0 +1,117 @@
+"""
+Local stand-in for the Amazon Rekognition DetectLabels API.
+
+Speaks the AWS JSON 1.1 protocol boto3 uses (POST / with an X-Amz-Target
+header), returns deterministic labels derived from a hash of the image
+bytes, and can inject latency, throttling (ThrottlingException) and server
+errors. Point the app's shared client at it with:
+
+    python -m benchmarks.fake_rekognition_server --port 8090 --latency 0.3 --error-rate 0.02
+    REKOGNITION_ENDPOINT_URL=http://127.0.0.1:8090 AWS_ACCESS_KEY_ID=fake AWS_SECRET_ACCESS_KEY=fake streamlit run app.py
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_LABELS = ["Clothing", "Apparel", "Shoe", "Footwear", "Bag", "Accessories", "Furniture", "Electronics",
+               "Phone", "Computer", "Toy", "Book", "Bottle", "Kitchen", "Person", "Outdoors", "Indoors", "Text"]
+
+def fake_labels(image_bytes: bytes, max_labels: int, min_confidence: float) -> list[dict]:
+    rng = random.Random(hashlib.sha256(image_bytes).digest())
+    labels = [{"Name": name, "Confidence": round(rng.uniform(50.0, 99.9), 4), "Instances": [], "Parents": []}
+              for name in rng.sample(FAKE_LABELS, k=rng.randint(3, len(FAKE_LABELS)))]
+    labels = sorted((label for label in labels if label["Confidence"] >= min_confidence),
+                    key=lambda label: label["Confidence"], reverse=True)
+    return labels[:max_labels]
+
+class FakeRekognitionHandler(BaseHTTPRequestHandler):
+    server_version = "FakeRekognition/0.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-amz-json-1.1")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("x-amzn-RequestId", hashlib.md5(body).hexdigest())
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        options = self.server.options
+        target = self.headers.get("X-Amz-Target", "")
+        if target != "RekognitionService.DetectLabels":
+            self._send_json(400, {"__type": "UnknownOperationException", "message": f"Unsupported operation {target}"})
+            return
+
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+        if options.latency > 0:
+            time.sleep(options.latency)
+        if random.random() < options.throttle_rate:
+            with self.server.stats_lock:
+                self.server.stats["throttled"] += 1
+            self._send_json(400, {"__type": "ThrottlingException", "message": "Rate exceeded (fake)"})
+            return
+        if random.random() < options.error_rate:
+            with self.server.stats_lock:
+                self.server.stats["errors"] += 1
+            self._send_json(500, {"__type": "InternalServerError", "message": "Internal server error (fake)"})
+            return
+
+        request = json.loads(body or b"{}")
+        image_bytes = base64.b64decode(request.get("Image", {}).get("Bytes", ""))
+        if not image_bytes:
+            self._send_json(400, {"__type": "InvalidParameterException", "message": "Image.Bytes is required"})
+            return
+        self._send_json(200, {
+            "Labels": fake_labels(image_bytes, int(request.get("MaxLabels", 1000)), float(request.get("MinConfidence", 55.0))),
+            "LabelModelVersion": "3.0"
+        })
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"__type": "NotFound", "message": f"Unknown path {self.path}"})
+
+def create_server(host: str = "127.0.0.1", port: int = 8090, latency: float = 0.0,
+                  error_rate: float = 0.0, throttle_rate: float = 0.0) -> ThreadingHTTPServer:
+    """Builds (but does not start) a fake server; use port 0 to pick a free port."""
+    server = ThreadingHTTPServer((host, port), FakeRekognitionHandler)
+    server.daemon_threads = True
+    server.options = argparse.Namespace(latency=latency, error_rate=error_rate, throttle_rate=throttle_rate)
+    server.stats = {"requests": 0, "throttled": 0, "errors": 0}
+    server.stats_lock = threading.Lock()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Rekognition DetectLabels endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep per request.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with ThrottlingException.")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency, args.error_rate, args.throttle_rate)
+    print(f"Fake Rekognition server listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+Benchmark suite for indexing, cold start, FAQ query latency, memory and image analysis.
+
+Everything runs against the local fake OpenAI and Rekognition servers (started
+in-process on free ports), so no network access or API keys are needed and
+backend latency / error rates are under control. For each corpus size a
+synthetic FAQ is generated and built into an index, then every selected
+scenario is measured on it:
+
+    indexing          index_faq.py end to end (subprocess), vectors/sec
+    cold_start        import + FAISSVectorStore load in a fresh process
+    single_query      sequential search_faq_by_text and get_faq_answer, p50/p95/p99
+    concurrent_query  get_faq_answer from N threads, p50/p95/p99 and throughput
+    memory            RSS after loading and after a query workload (fresh process)
+    image             analyze_image (Vision + Rekognition), sequential and concurrent
+
+Sizes above --embed-max-size skip the indexing scenario and are built directly
+from the same deterministic vectors the fake server returns. Results are
+written as JSON; pass an earlier file to --compare to print relative changes.
+
+    python -m benchmarks.run_suite --sizes 1000 10000 100000 --json before.json
+    python -m benchmarks.run_suite --sizes 1000 10000 100000 --json after.json --compare before.json
+    python -m benchmarks.run_suite --sizes 1000000 --scenarios cold_start memory single_query
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.bench_metadata_load import rss_bytes
+from benchmarks.fake_openai_server import create_server as create_openai_server, fake_embedding
+from benchmarks.fake_rekognition_server import create_server as create_rekognition_server
+
+SCENARIOS = ("indexing", "cold_start", "single_query", "concurrent_query", "memory", "image")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_NAME = "faq-index"
+
+PRODUCTS = ["order", "parcel", "jacket", "phone case", "gift card", "subscription", "laptop bag", "sneakers",
+            "coffee maker", "account", "invoice", "voucher", "return label", "backpack", "headphones"]
+TEMPLATES = ["How do I return my {product}?", "Where is my {product}?", "Can I change the address for my {product}?",
+             "How long does shipping take for a {product}?", "Why was my {product} payment declined?",
+             "Is the {product} covered by warranty?", "How do I cancel my {product}?", "Can I exchange my {product}?"]
+
+def synthetic_faq(size: int, seed: int = 0) -> list[dict]:
+    """Unique, retail-flavoured FAQ entries; the suffix keeps every question (and its embedding) distinct."""
+    rng = random.Random(seed)
+    return [
+        {'id': i,
+         'question': f"{rng.choice(TEMPLATES).format(product=rng.choice(PRODUCTS))} (ref {i})",
+         'answer': f"Answer {i}: " + "Please contact support with your order number and we will help. " * rng.randint(1, 6)}
+        for i in range(size)
+    ]
+
+def latency_stats(samples: list[float]) -> dict:
+    """Millisecond percentiles of a list of durations in seconds."""
+    if not samples:
+        return {'count': 0}
+    ms = np.array(samples) * 1000
+    return {'count': len(samples), 'mean_ms': float(ms.mean()), 'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)), 'p99_ms': float(np.percentile(ms, 99)), 'max_ms': float(ms.max())}
+
+def build_paths(build_dir: str) -> dict:
+    """FAISSVectorStore path arguments for the build in `build_dir` (the manifest's generation if it has one)."""
+    from index_manifest import resolve_build_paths
+
+    paths, _ = resolve_build_paths(build_dir, BASE_NAME)
+    return {'index_path': paths['index'], 'data_path': paths['data'], 'metadata_path': paths['metadata'],
+            'classifier_path': paths['topic_classifier'], 'lexical_path': paths['lexical']}
+
+def build_directly(faq: list[dict], build_dir: str, dimension: int):
+    """Writes the files index_faq.py would, from the fake server's vectors, without the HTTP round trips."""
+    import faiss
+    from faq_metadata import write_faq_metadata
+    from faiss_service import create_faiss_index, train_faiss_index
+    from lexical_index import write_lexical_index
+
+    vectors = np.array([fake_embedding(entry['question'], dimension) for entry in faq], dtype="float32")
+    index = create_faiss_index(os.getenv("FAISS_INDEX_TYPE", "auto"), dimension, len(faq))
+    if not index.is_trained:
+        train_faiss_index(index, vectors)
+    index.add_with_ids(vectors, np.arange(len(faq), dtype="int64"))
+    paths = build_paths(build_dir)
+    with open(paths['data_path'], 'w', encoding='utf-8') as f:
+        json.dump(faq, f, ensure_ascii=False)
+    write_faq_metadata(paths['metadata_path'], faq)
+    write_lexical_index(paths['lexical_path'], faq)
+    faiss.write_index(index, paths['index_path'])
+
+def run_indexing(faq_path: str, build_dir: str, size: int) -> dict:
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.join(REPO_DIR, "index_faq.py")], cwd=REPO_DIR,
+                               env={**os.environ, 'FAQ_SOURCE_JSON_FILE': faq_path, 'FAISS_OUTPUT_DIR_NAME': build_dir,
+                                    'EMBEDDING_CACHE_PATH': os.path.join(build_dir, "embedding_cache.sqlite3")},
+                               capture_output=True, text=True)
+    seconds = time.perf_counter() - started
+    if completed.returncode != 0 or not os.path.exists(build_paths(build_dir)['index_path']):
+        raise RuntimeError(f"index_faq.py failed:\n{completed.stdout[-2000:]}\n{completed.stderr[-2000:]}")
+    return {'seconds': seconds, 'vectors_per_second': size / seconds}
+
+def run_child(kind: str, build_dir: str, queries_path: str = "") -> dict:
+    output = subprocess.run([sys.executable, "-m", "benchmarks.run_suite", "--child", kind, build_dir, queries_path],
+                            cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def child(kind: str, build_dir: str, queries_path: str):
+    """Runs in a fresh interpreter so import time and RSS are measured from a clean process."""
+    baseline_rss = rss_bytes()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        from faiss_service import FAISSVectorStore
+        imported_at = time.perf_counter()
+        store = FAISSVectorStore(**build_paths(build_dir))
+    loaded_at = time.perf_counter()
+    result = {
+        'import_seconds': imported_at - started,
+        'load_seconds': loaded_at - imported_at,
+        'total_seconds': loaded_at - started,
+        'rss_after_load_mb': rss_bytes() / 2**20,
+        'rss_load_delta_mb': (rss_bytes() - baseline_rss) / 2**20
+    }
+    if kind == "memory":
+        from assistant_pipeline import get_faq_answer
+        with open(queries_path, 'r', encoding='utf-8') as f:
+            queries = json.load(f)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for query in queries:
+                get_faq_answer(store, query)
+        result['queries'] = len(queries)
+        result['rss_after_queries_mb'] = rss_bytes() / 2**20
+        import resource
+        result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(result))
+
+def run_single_query(store, queries: list[str]) -> dict:
+    from assistant_pipeline import get_faq_answer
+    half = len(queries) // 2
+    search_seconds, faq_seconds = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query in queries[:half]:
+            started = time.perf_counter()
+            store.search_faq_by_text(query, k=5)
+            search_seconds.append(time.perf_counter() - started)
+        # Different queries, so the query embedding cache does not flatter the end-to-end numbers
+        for query in queries[half:]:
+            started = time.perf_counter()
+            get_faq_answer(store, query)
+            faq_seconds.append(time.perf_counter() - started)
+    return {'search': latency_stats(search_seconds), 'faq': latency_stats(faq_seconds)}
+
+def run_concurrent_query(store, queries: list[str], concurrency: int) -> dict:
+    from assistant_pipeline import get_faq_answer
+
+    def timed(query):
+        started = time.perf_counter()
+        get_faq_answer(store, query)
+        return time.perf_counter() - started
+
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        samples = list(pool.map(timed, queries))
+        wall = time.perf_counter() - started
+    return {'concurrency': concurrency, 'throughput_qps': len(queries) / wall, **latency_stats(samples)}
+
+def synthetic_images(count: int, seed: int = 0) -> list[bytes]:
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        width, height = rng.integers(640, 2400, size=2)
+        pixels = rng.integers(0, 255, size=(int(height) // 8, int(width) // 8, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).resize((int(width), int(height))).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+def run_image(images: list[bytes], concurrency: int) -> dict:
+    from assistant_pipeline import analyze_image
+    errors = {'vision': 0, 'rekognition': 0}
+    errors_lock = threading.Lock()
+
+    def timed(image_bytes):
+        started = time.perf_counter()
+        results, _ = analyze_image(image_bytes)
+        elapsed = time.perf_counter() - started
+        with errors_lock:
+            for name, outcome in results.items():
+                errors[name] += outcome['error'] is not None
+        return elapsed
+
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        samples = list(pool.map(timed, images))
+        wall = time.perf_counter() - started
+    return {'concurrency': concurrency, 'throughput_ips': len(images) / wall, 'errors': errors, **latency_stats(samples)}
+
+def start_fake_servers(args) -> list:
+    openai_server = create_openai_server(port=0, latency=args.openai_latency, rate_limit_rate=args.openai_rate_limit_rate,
+                                         dimension=args.dimension, token_delay=args.token_delay, error_rate=args.openai_error_rate)
+    rekognition_server = create_rekognition_server(port=0, latency=args.rekognition_latency,
+                                                   error_rate=args.rekognition_error_rate, throttle_rate=args.rekognition_throttle_rate)
+    for server in (openai_server, rekognition_server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Project modules read these at import time, so they are set before any of them is imported;
+    # subprocesses inherit them
+    os.environ.update({
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{openai_server.server_port}/v1",
+        'OPENAI_API_KEY': "fake",
+        'OPENAI_EMBEDDING_MODEL_DIMENSION': str(args.dimension),
+        'QUERY_EMBEDDING_CACHE_PATH': "",
+        'REKOGNITION_ENDPOINT_URL': f"http://127.0.0.1:{rekognition_server.server_port}",
+        'AWS_ACCESS_KEY_ID': "fake",
+        'AWS_SECRET_ACCESS_KEY': "fake"
+    })
+    # Injected errors and per-request logs would drown the report
+    os.environ.setdefault('LOG_LEVEL', "ERROR")
+    return [openai_server, rekognition_server]
+
+def compare(rows: list[dict], baseline_path: str):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(row['scenario'], row['size'], row.get('variant')): row for row in json.load(f)['results']}
+
+    def flatten(prefix, value, out):
+        if isinstance(value, dict):
+            for key, inner in value.items():
+                flatten(f"{prefix}.{key}" if prefix else key, inner, out)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[prefix] = value
+        return out
+
+    print(f"\nChanges vs {baseline_path}:")
+    for row in rows:
+        previous = baseline.get((row['scenario'], row['size'], row.get('variant')))
+        if previous is None:
+            continue
+        current_metrics, previous_metrics = flatten("", row['metrics'], {}), flatten("", previous['metrics'], {})
+        changes = [f"{key} {100 * (value - previous_metrics[key]) / previous_metrics[key]:+.1f}%"
+                   for key, value in current_metrics.items()
+                   if previous_metrics.get(key) and key.endswith(("_ms", "_seconds", "per_second", "_qps", "_ips", "_mb"))]
+        label = f"{row['scenario']}[{row['size']}{'/' + str(row['variant']) if row.get('variant') is not None else ''}]"
+        print(f"  {label}: {', '.join(changes) if changes else 'no comparable metrics'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite against local fake backends.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--dimension", type=int, default=256, help="Embedding dimension served by the fake OpenAI server.")
+    parser.add_argument("--embed-max-size", type=int, default=100_000,
+                        help="Larger corpora are built directly instead of through index_faq.py (no indexing scenario).")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per latency scenario.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--cold-start-repeats", type=int, default=3)
+    parser.add_argument("--openai-latency", type=float, default=0.02)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--rekognition-latency", type=float, default=0.1)
+    parser.add_argument("--rekognition-error-rate", type=float, default=0.0)
+    parser.add_argument("--rekognition-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="Write results to this file.")
+    parser.add_argument("--compare", help="Earlier results file to compare against.")
+    parser.add_argument("--child", nargs=3, metavar=("KIND", "BUILD_DIR", "QUERIES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    servers = start_fake_servers(args)
+    rows = []
+
+    def record(scenario, size, metrics, variant=None):
+        rows.append({'scenario': scenario, 'size': size, 'variant': variant, 'metrics': metrics})
+        print(f"{scenario:>16} size={size:<8} {'' if variant is None else f'variant={variant} '}{json.dumps(metrics)}")
+
+    try:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory(prefix=f"bench-{size}-") as build_dir:
+                faq = synthetic_faq(size)
+                faq_path = os.path.join(build_dir, "faq.json")
+                with open(faq_path, 'w', encoding='utf-8') as f:
+                    json.dump([{'question': e['question'], 'answer': e['answer']} for e in faq], f, ensure_ascii=False)
+
+                print(f"\n--- Corpus of {size} FAQs ---")
+                if size <= args.embed_max_size:
+                    metrics = run_indexing(faq_path, build_dir, size)
+                    if "indexing" in args.scenarios:
+                        record("indexing", size, metrics)
+                else:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        build_directly(faq, build_dir, args.dimension)
+
+                # Each scenario gets its own slice of distinct questions (reused only when the corpus is too small),
+                # so the query embedding cache does not carry over between scenarios
+                rng = random.Random(size)
+                query_pool = [entry['question'] for entry in rng.sample(faq, min(len(faq), args.queries * (2 + len(args.concurrency))))]
+                query_slices = [query_pool[start:start + args.queries] or query_pool[:args.queries]
+                                for start in range(0, args.queries * (2 + len(args.concurrency)), args.queries)]
+                queries_path = os.path.join(build_dir, "queries.json")
+                with open(queries_path, 'w', encoding='utf-8') as f:
+                    json.dump(query_slices[0], f)
+
+                if "cold_start" in args.scenarios:
+                    runs = [run_child("cold_start", build_dir) for _ in range(args.cold_start_repeats)]
+                    record("cold_start", size, {
+                        key: float(np.median([run[key] for run in runs])) for key in runs[0]
+                    })
+                if "memory" in args.scenarios:
+                    record("memory", size, run_child("memory", build_dir, queries_path))
+
+                if "single_query" in args.scenarios or "concurrent_query" in args.scenarios:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        from faiss_service import FAISSVectorStore
+                        store = FAISSVectorStore(**build_paths(build_dir))
+                    if "single_query" in args.scenarios:
+                        record("single_query", size, run_single_query(store, query_slices[1]))
+                    if "concurrent_query" in args.scenarios:
+                        for concurrency, query_slice in zip(args.concurrency, query_slices[2:]):
+                            record("concurrent_query", size, run_concurrent_query(store, query_slice, concurrency), variant=concurrency)
+
+        if "image" in args.scenarios:
+            images = synthetic_images(args.images * (1 + len(args.concurrency)))
+            for i, concurrency in enumerate([1] + args.concurrency):
+                record("image", 0, run_image(images[i * args.images:(i + 1) * args.images], concurrency), variant=concurrency)
+
+        backend_stats = {'openai': dict(servers[0].stats), 'rekognition': dict(servers[1].stats)}
+    finally:
+        for server in servers:
+            server.shutdown()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            'git_commit': subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items() if key not in ("child", "json", "compare")},
+            'backend_stats': backend_stats
+        },
+        'results': rows
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    if args.compare:
+        compare(rows, args.compare)
+
+if __name__ == "__main__":
+    main()
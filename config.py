@@ -1,3 +1,8 @@
+from dotenv import load_dotenv
+
+# The .env file is loaded once, here: every module imports config before it reads the environment
+load_dotenv()
+
 OPENAI_EMBEDDING_MODEL = "text-embedding-ada-002"
 OPENAI_CHAT_MODEL = "gpt-3.5-turbo"
 OPENAI_VISION_MODEL = "gpt-4o"
@@ -27,24 +32,174 @@ User Query: "{query}"
 APP_RAG_SYSTEM_PROMPT = "You are an AI assistant. Answer the user's question based ONLY on the provided FAQ context. If the context doesn't directly answer the question, say that you cannot answer based on the provided information. Do not mention the FAQ context in your response."
 
 # User prompt template for the RAG task in app.py
-# Use .format(context_question=context_question, context_answer=context_answer, query=user_query)
+# Use .format(context=context_block, query=user_query); the block is one APP_RAG_CONTEXT_TEMPLATE per retrieved FAQ
 APP_RAG_USER_PROMPT_TEMPLATE = """Based on the following information from the FAQ:
 
-Question: {context_question}
-Answer: {context_answer}
+{context}
 
 Please answer the user's question: "{query}" """
 
+# One retrieved FAQ entry inside the RAG prompt's {context} block
+# Use .format(context_question=context_question, context_answer=context_answer)
+APP_RAG_CONTEXT_TEMPLATE = """Question: {context_question}
+Answer: {context_answer}"""
+
+# FAQ retrieval stage: fetch top-k, drop hits under the similarity floor, skip
+# near-duplicate questions (word Jaccard), and pack contexts into a token budget.
+# The floor depends on the embedding model: text-embedding-ada-002 cosine scores
+# for unrelated texts sit around 0.7, so a useful floor is well above that.
+RETRIEVAL_TOP_K = 5
+RETRIEVAL_MIN_SIMILARITY = 0.78
+RETRIEVAL_DEDUPE_JACCARD = 0.8
+RETRIEVAL_CONTEXT_TOKEN_BUDGET = 1500
+
+# Hybrid retrieval: a BM25 index over FAQ questions and answers (built by index_faq.py)
+# is searched next to FAISS, and the two top-RETRIEVAL_HYBRID_CANDIDATES lists are merged
+# by reciprocal rank fusion, so exact terms like order numbers and SKUs are not lost.
+# A lexical hit counts as relevant context (instead of clearing the similarity floor)
+# when it contains at least RETRIEVAL_MIN_LEXICAL_COVERAGE of the query's idf-weighted terms.
+RETRIEVAL_HYBRID = True
+RETRIEVAL_HYBRID_CANDIDATES = 20
+RETRIEVAL_RRF_K = 60
+RETRIEVAL_MIN_LEXICAL_COVERAGE = 0.8
+# Lexical fast path: no embedding call when the query is an FAQ question (ignoring case and
+# punctuation), or when one FAQ contains all of at least LEXICAL_FAST_PATH_MIN_TERMS query
+# terms and outscores the runner-up by LEXICAL_FAST_PATH_MARGIN in BM25
+LEXICAL_FAST_PATH = True
+LEXICAL_FAST_PATH_MIN_TERMS = 2
+LEXICAL_FAST_PATH_MARGIN = 1.5
+
  
 DEFAULT_VISION_DETAIL = "low"
 DEFAULT_VISION_MAX_TOKENS = 100
 DEFAULT_CHAT_TEMPERATURE = 0.7
 DEFAULT_CHAT_MAX_TOKENS = 150
+# Stream FAQ answers and image descriptions token by token in app.py
+APP_STREAM_RESPONSES = True
+# Load the FAQ index and create the API clients on a background thread at app.py startup,
+# so the first page renders without waiting for them (env APP_PREWARM_IN_BACKGROUND=0 to disable)
+APP_PREWARM_IN_BACKGROUND = True
+# Number of recent streaming requests kept in openai_service.stream_metrics
+STREAM_METRICS_HISTORY = 200
+
+# Batched embedding settings (used by index_faq.py)
+# Requests are packed until either limit is hit; the API caps a single request at 2048 inputs.
+EMBEDDING_BATCH_MAX_TEXTS = 512
+EMBEDDING_BATCH_MAX_TOKENS = 100000
+EMBEDDING_MAX_WORKERS = 4
+EMBEDDING_MAX_RETRIES = 5
+EMBEDDING_RETRY_BASE_DELAY = 1.0
+
+# Query embedding cache in front of get_openai_embedding (LRU + TTL)
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = 10000
+QUERY_EMBEDDING_CACHE_MAX_BYTES = 64 * 1024 * 1024
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = 24 * 60 * 60
+# Set to a file path (e.g. "faiss_index/query_embedding_cache.npz") to keep hits across restarts
+QUERY_EMBEDDING_CACHE_PATH = ""
+# Query embedding coalescing: concurrent get_openai_embedding calls that miss the cache are
+# collected for up to EMBEDDING_COALESCE_WINDOW_MS, or until EMBEDDING_COALESCE_MAX_BATCH texts,
+# and sent as one batched request; identical texts in flight share one result.
+# At most EMBEDDING_COALESCE_MAX_IN_FLIGHT batches are sent at once; later calls wait and join the next batch
+EMBEDDING_COALESCE = True
+EMBEDDING_COALESCE_WINDOW_MS = 5
+EMBEDDING_COALESCE_MAX_BATCH = 64
+EMBEDDING_COALESCE_MAX_IN_FLIGHT = 8
+# A caller whose coalesced embedding has not arrived after this long makes its own direct request
+EMBEDDING_COALESCE_TIMEOUT_SECONDS = 10.0
  
 FAQ_SOURCE_JSON_FILE="data/dummy_faq.json"
 FAISS_OUTPUT_DIR_NAME="faiss_index"
 
+# Local topic classifier built by index_faq.py: FAQ questions are retail examples,
+# this file adds labelled examples of both classes ({"text": ..., "label": ...})
+TOPIC_EXAMPLES_JSON_FILE = "data/topic_examples.json"
+# Retail-minus-other centroid similarity margins in this band fall back to the LLM classifier
+TOPIC_CLASSIFIER_UNCERTAINTY_LOW = -0.02
+TOPIC_CLASSIFIER_UNCERTAINTY_HIGH = 0.03
+
+# Semantic answer cache for the FAQ RAG path: a cached answer is reused when a new
+# query is at least this similar to a cached one and retrieves the same top FAQ
+ANSWER_CACHE_MAX_ENTRIES = 2000
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
+
+# FAISS index backend: "auto", "flat", "ivf_flat", "ivf_pq" or "hnsw"
+# "auto" picks by corpus size (see faiss_service.select_index_type)
+FAISS_INDEX_TYPE = "auto"
+FAISS_IVF_NLIST = 0 # 0 derives the number of IVF lists from the corpus size
+FAISS_PQ_M = 64 # PQ sub-quantizers; capped at dimension/4 and lowered until it divides the dimension
+FAISS_HNSW_M = 32
+FAISS_HNSW_EF_CONSTRUCTION = 200
+# Search-time parameters (recall vs latency trade-off)
+FAISS_NPROBE = 16
+FAISS_EF_SEARCH = 64
+# Hot reload: running apps poll the index manifest this often (0 disables), and
+# index_faq.py keeps this many generations on disk (the current one included)
+INDEX_WATCH_INTERVAL_SECONDS = 5.0
+INDEX_KEEP_GENERATIONS = 2
+
+# Multi-tenant shards: `index_faq.py --by-tenant` builds one index per value of each FAQ's
+# TENANT_FIELD (DEFAULT_TENANT when it is missing) under <FAISS_OUTPUT_DIR_NAME>/tenants/<tenant>/.
+# tenant_store.TenantStoreManager loads a shard on its tenant's first query and evicts the
+# least recently used shards once their index files together exceed TENANT_SHARD_MEMORY_BUDGET_MB
+TENANT_FIELD = "tenant"
+DEFAULT_TENANT = "default"
+TENANT_SHARD_MEMORY_BUDGET_MB = 1024
+# Threads for searching several tenant shards at once
+TENANT_SEARCH_MAX_WORKERS = 4
+
+# Image preprocessing before remote analysis (see image_preprocessing.py)
+IMAGE_VISION_FORMAT = "JPEG" # or "WEBP"
+IMAGE_VISION_QUALITY = 85
+IMAGE_REKOGNITION_MAX_SIDE = 1920
+IMAGE_REKOGNITION_QUALITY = 90
+
+# Image analysis result cache (see image_cache.py)
+IMAGE_CACHE_PATH = "cache/image_results.sqlite3"
+IMAGE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+# Re-encoded copies within this many dHash bits also hit; -1 disables perceptual matching.
+# Off by default: dHash only sees grayscale structure, so colour variants of the same
+# product photo (a red and a blue shirt) match and would get each other's results.
+IMAGE_CACHE_PERCEPTUAL_MAX_DISTANCE = -1
+
+# Image analysis: Vision and Rekognition run concurrently, each with its own timeout
+IMAGE_ANALYSIS_MAX_WORKERS = 8
+IMAGE_ANALYSIS_TIMEOUT_SECONDS = 30.0
+
 AWS_DEFAULT_REGION = "eu-central-1" 
 # Rekognition settings
 REKOGNITION_MAX_LABELS = 20
-REKOGNITION_MIN_CONFIDENCE = 75.0 
\ No newline at end of file
+REKOGNITION_MIN_CONFIDENCE = 75.0 
+# Shared Rekognition client: HTTP pool size, retries (adaptive mode) and timeouts
+REKOGNITION_MAX_POOL_CONNECTIONS = 20
+REKOGNITION_MAX_ATTEMPTS = 3
+REKOGNITION_CONNECT_TIMEOUT_SECONDS = 5
+REKOGNITION_READ_TIMEOUT_SECONDS = 20
+
+# Headless API server (api_server.py): requests beyond API_MAX_CONCURRENT_REQUESTS
+# wait up to API_QUEUE_TIMEOUT_SECONDS for a slot, then get HTTP 503
+API_MAX_CONCURRENT_REQUESTS = 32
+API_QUEUE_TIMEOUT_SECONDS = 0.5
+# Worker threads for the blocking OpenAI / Rekognition / FAISS calls
+API_MAX_WORKERS = 32
+API_MAX_BATCH_QUERIES = 64
+API_MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+# Logging: level and format ("text" key=value lines or "json")
+LOG_LEVEL = "INFO"
+LOG_FORMAT = "text"
+# Metrics / spans backend: "none", "prometheus" (API server /metrics, or a standalone
+# endpoint on TELEMETRY_PROMETHEUS_PORT when non-zero) or "otel" (OpenTelemetry API)
+TELEMETRY_BACKEND = "none"
+TELEMETRY_PROMETHEUS_PORT = 0
+
+# Bulk image labeling (label_images.py): images in flight, and per-service request
+# rates in requests/second (0 = unlimited); Rekognition's DetectLabels quota is 5-50 TPS by region
+BULK_LABEL_WORKERS = 8
+BULK_VISION_REQUESTS_PER_SECOND = 5.0
+BULK_REKOGNITION_REQUESTS_PER_SECOND = 5.0
+# Results are made durable (fsync / one Parquet part file) every this many images
+BULK_CHECKPOINT_EVERY = 100
+# Cost estimate in USD; check current pricing for your models and region
+VISION_INPUT_COST_PER_1M_TOKENS = 2.50
+VISION_OUTPUT_COST_PER_1M_TOKENS = 10.00
+REKOGNITION_COST_PER_1K_IMAGES = 1.00
\ No newline at end of file
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import sqlite3
+import string
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from telemetry import get_logger
+
+logger = get_logger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC unicode, collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def normalize_query(text: str) -> str:
+    """
+    Looser normalization for user queries: case, surrounding punctuation and
+    whitespace are ignored, so "Where is my order?" and "where is my order"
+    share a cache entry.
+    """
+    return normalize_text(text).lower().strip(string.punctuation + " ")
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache backed by SQLite.
+
+    Entries are keyed on (model, sha256 of the normalized text) and stored as
+    raw float32 blobs, so re-running the indexer only pays for texts that
+    were never embedded with the current model.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                   model TEXT NOT NULL,
+                   text_hash TEXT NOT NULL,
+                   dimension INTEGER NOT NULL,
+                   vector BLOB NOT NULL,
+                   PRIMARY KEY (model, text_hash)
+               )"""
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, np.ndarray]:
+        """Returns the cached vectors for whichever of `hashes` are present."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *chunk]
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, items: list[tuple[str, list[float] | np.ndarray]]):
+        rows = []
+        for key, vector in items:
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((model, key, int(vector.shape[0]), vector.tobytes()))
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, dimension, vector) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        self._conn.commit()
+
+    def all_vectors(self, model: str) -> np.ndarray:
+        """Every cached vector for `model` as one (n, d) float32 matrix."""
+        rows = self._conn.execute("SELECT vector FROM embeddings WHERE model = ?", (model,)).fetchall()
+        if not rows:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack([np.frombuffer(blob, dtype=np.float32) for (blob,) in rows])
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+class QueryEmbeddingCache:
+    """
+    In-memory LRU + TTL cache for query embeddings.
+
+    Vectors are kept as float32 arrays and the cache is bounded both by entry
+    count and by total vector bytes. Optionally persisted to an .npz file so
+    hits survive a process restart. Thread-safe.
+    """
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float, persist_path: str | None = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self._entries = OrderedDict() # key -> (vector, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if persist_path and os.path.exists(persist_path):
+            self.load(persist_path)
+
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, vector: list[float] | np.ndarray, stored_at: float | None = None):
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, stored_at if stored_at is not None else time.time())
+            self._bytes += vector.nbytes
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        vector, _ = self._entries.pop(key)
+        self._bytes -= vector.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def save(self, path: str | None = None):
+        """Writes live entries to an .npz file (atomically, via a temp file)."""
+        path = path or self.persist_path
+        if not path:
+            return
+        now = time.time()
+        with self._lock:
+            live = [(key, vector, stored_at) for key, (vector, stored_at) in self._entries.items()
+                    if now - stored_at <= self.ttl_seconds]
+        if not live or len({vector.shape for _, vector, _ in live}) != 1:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(
+            tmp_path,
+            keys=np.array([key for key, _, _ in live]),
+            vectors=np.stack([vector for _, vector, _ in live]),
+            stored_at=np.array([stored_at for _, _, stored_at in live])
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        try:
+            with np.load(path) as data:
+                keys, vectors, stored_at = data['keys'], data['vectors'], data['stored_at']
+        except Exception as e:
+            logger.warning(f"Could not load query embedding cache from {path}: {e}")
+            return
+        # Oldest first, so LRU order roughly survives the round trip
+        for i in np.argsort(stored_at):
+            if time.time() - stored_at[i] <= self.ttl_seconds:
+                self.put(str(keys[i]), vectors[i], stored_at=float(stored_at[i]))
+        logger.info(f"Loaded {len(self._entries)} query embeddings from {path}.")
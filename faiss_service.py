@@ -1,11 +1,24 @@
 import faiss
 import json
+import math
 import numpy as np
 import os
-from openai_service import get_openai_embedding
-from dotenv import load_dotenv
+import threading
+import weakref
+from openai_service import get_openai_embedding, get_openai_embeddings
+from topic_classifier import CentroidTopicClassifier
+from faq_metadata import FAQMetadata, InMemoryFAQMetadata, MmapFAQMetadata
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+from retrieval import RETRIEVAL_HYBRID_CANDIDATES, RETRIEVAL_RRF_K, LEXICAL_FAST_PATH_MIN_TERMS, LEXICAL_FAST_PATH_MARGIN
+from index_manifest import legacy_paths, manifest_version, read_manifest, resolve_manifest_paths
+from telemetry import get_logger, Counter
 
-load_dotenv()
+import config
+
+logger = get_logger(__name__)
+
+INDEX_RELOADS = Counter("index_reloads_total", "Hot reloads of a new index generation by outcome (swapped/failed).")
+INDEX_GENERATIONS_RELEASED = Counter("index_generations_released_total", "Index generations reclaimed after their last reader finished.")
 
 FAISS_DIR_NAME = os.getenv("FAISS_OUTPUT_DIR_NAME", "faiss_index")
 FAISS_BASE_NAME = os.getenv("FAISS_INDEX_BASE_NAME", "faq-index")
@@ -14,83 +27,594 @@ SCRIPT_DIR = os.path.dirname(__file__)
 OUTPUT_DIR_FULL_PATH = os.path.join(SCRIPT_DIR, FAISS_DIR_NAME)
 FAISS_INDEX_PATH_FULL = os.path.join(OUTPUT_DIR_FULL_PATH, f'{FAISS_BASE_NAME}.faiss')
 FAQ_DATA_PATH_FULL = os.path.join(OUTPUT_DIR_FULL_PATH, f'{FAISS_BASE_NAME}_data.json')
+FAQ_METADATA_PATH_FULL = os.path.join(OUTPUT_DIR_FULL_PATH, f'{FAISS_BASE_NAME}_data.bin')
+TOPIC_CLASSIFIER_PATH_FULL = os.path.join(OUTPUT_DIR_FULL_PATH, f'{FAISS_BASE_NAME}_topic_classifier.npz')
+LEXICAL_INDEX_PATH_FULL = os.path.join(OUTPUT_DIR_FULL_PATH, f'{FAISS_BASE_NAME}_lexical.bin')
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+def select_index_type(num_vectors: int) -> str:
+    """
+    Size-based backend policy used when FAISS_INDEX_TYPE is "auto".
+
+    Exact search stays cheap for small corpora; IVF-Flat keeps full vectors
+    but only scans `nprobe` lists; past a million vectors IVF-PQ compresses
+    the vectors so the index fits in memory. HNSW is only used when asked
+    for explicitly, since it cannot remove ids for incremental builds.
+    """
+    if num_vectors < 50_000:
+        return "flat"
+    if num_vectors < 1_000_000:
+        return "ivf_flat"
+    return "ivf_pq"
+
+def default_nlist(num_vectors: int) -> int:
+    # ~4*sqrt(n) lists, keeping at least 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39, 65536))
+
+def create_faiss_index(index_type: str, dimension: int, num_vectors: int):
+    """
+    Creates an empty, ID-mapped inner-product index of the given type.
+    IVF variants must be trained (see train_faiss_index) before vectors are added.
+    """
+    if index_type == "auto":
+        index_type = select_index_type(num_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type '{index_type}'. Expected 'auto' or one of {INDEX_TYPES}.")
+
+    if index_type == "flat":
+        description = "IDMap,Flat"
+    elif index_type == "hnsw":
+        description = f"IDMap,HNSW{config.FAISS_HNSW_M},Flat"
+    else:
+        nlist = config.FAISS_IVF_NLIST or default_nlist(num_vectors)
+        if index_type == "ivf_flat":
+            description = f"IDMap,IVF{nlist},Flat"
+        else:
+            # At least 4 dimensions per sub-vector: finer splits barely improve recall
+            # but multiply the codebooks to train
+            m = max(1, min(config.FAISS_PQ_M, dimension // 4))
+            while dimension % m:
+                m -= 1
+            nbits = 8 if num_vectors >= 256 * 39 else 4
+            description = f"IDMap,IVF{nlist},PQ{m}x{nbits}"
+
+    index = faiss.index_factory(dimension, description, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = config.FAISS_HNSW_EF_CONSTRUCTION
+    logger.info(f"Created FAISS index '{description}' ({index_type}) for ~{num_vectors} vectors.")
+    return index
+
+def train_faiss_index(index, vectors: np.ndarray, max_training_points: int = 256 * 1024):
+    """Trains an untrained (IVF) index on a random sample of the normalized vectors."""
+    if index.is_trained:
+        return
+    if len(vectors) > max_training_points:
+        sample = np.random.default_rng(0).choice(len(vectors), max_training_points, replace=False)
+        vectors = vectors[sample]
+    logger.info(f"Training FAISS index on {len(vectors)} vectors...")
+    index.train(vectors)
+
+def get_index_type(index) -> str:
+    """Returns which of INDEX_TYPES a (possibly ID-mapped) index is."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def set_faiss_search_params(index, nprobe: int | None = None, ef_search: int | None = None):
+    """Applies search-time parameters that are meaningful for the index type; others are ignored."""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if nprobe is not None and isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = min(nprobe, inner.nlist)
+    if ef_search is not None and isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+
+def read_faiss_index(path: str):
+    """
+    Reads an index memory-mapped, so vector data is paged in from the file on
+    demand instead of copied onto the heap. IO_FLAG_MMAP_IFC (FAISS >= 1.8) maps
+    flat, HNSW and IVF codes zero-copy; older releases only map IVF lists with
+    IO_FLAG_MMAP. Index types that cannot be mapped are read normally.
+    """
+    try:
+        return faiss.read_index(path, getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP))
+    except RuntimeError as e:
+        logger.warning(f"Memory-mapped read of {path} not supported ({e}); loading it into memory.")
+        return faiss.read_index(path)
+
+class BatchSearchResults:
+    """
+    Columnar results of FAISSVectorStore.search_many.
+
+    Row i holds the top-k hits for queries[i]. Slots without a hit (failed
+    embedding, fewer than k vectors, or an id without metadata) have id -1,
+    a NaN score and None question/answer.
+    """
+    def __init__(self, queries: list[str], ids: np.ndarray, scores: np.ndarray, questions: np.ndarray, answers: np.ndarray):
+        self.queries = queries
+        self.ids = ids
+        self.scores = scores
+        self.questions = questions
+        self.answers = answers
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    def to_dicts(self) -> list[list[dict]]:
+        """Per-query lists of result dicts, in the same shape search_faq_by_text returns."""
+        results = []
+        for i in range(len(self.queries)):
+            hits = np.flatnonzero(self.ids[i] != -1)
+            results.append([
+                {
+                    'id': int(self.ids[i, j]),
+                    'question': self.questions[i, j],
+                    'answer': self.answers[i, j],
+                    'similarity_score': float(self.scores[i, j])
+                }
+                for j in hits
+            ])
+        return results
+
+class IndexGeneration:
+    """
+    One loaded build: the FAISS index with its metadata, topic classifier and
+    lexical (BM25) index; the last two are None for builds without them.
+
+    FAISSVectorStore swaps whole generations, so a search that picked one up
+    keeps a consistent index and metadata even if a reload happens meanwhile.
+    A generation's memory is reclaimed once the store and every in-flight
+    search have dropped it.
+    """
+    def __init__(self, index, metadata: FAQMetadata, topic_classifier, version: str | None, generation: int | None,
+                 lexical_index: LexicalIndex | None = None):
+        self.index = index
+        self.metadata = metadata
+        self.topic_classifier = topic_classifier
+        self.version = version
+        self.generation = generation
+        self.lexical_index = lexical_index
+
+    def is_ready(self) -> bool:
+        return self.index is not None and len(self.metadata) > 0
+
+def _release_generation(generation: int | None, metadata: FAQMetadata, lexical_index: LexicalIndex | None):
+    # Runs once nothing references the generation any more (see weakref.finalize below)
+    metadata.close()
+    if lexical_index is not None:
+        lexical_index.close()
+    INDEX_GENERATIONS_RELEASED.inc()
+    logger.info(f"Index generation {generation} released.")
+
+EMPTY_GENERATION = IndexGeneration(None, InMemoryFAQMetadata([]), None, None, None)
 
 class FAISSVectorStore:
-    def __init__(self, index_path: str = FAISS_INDEX_PATH_FULL, data_path: str = FAQ_DATA_PATH_FULL):
+    """
+    FAQ search over the current index generation.
+
+    When index_faq.py has published a manifest next to `index_path`, the store
+    loads the generation it names (the explicit file paths are only used for
+    builds without one). `start_watching` polls the manifest and swaps newer
+    generations in without a restart; `reload` does a single check.
+    """
+    def __init__(
+        self,
+        index_path: str = FAISS_INDEX_PATH_FULL,
+        data_path: str = FAQ_DATA_PATH_FULL,
+        metadata_path: str = FAQ_METADATA_PATH_FULL,
+        nprobe: int = config.FAISS_NPROBE,
+        ef_search: int = config.FAISS_EF_SEARCH,
+        classifier_path: str = TOPIC_CLASSIFIER_PATH_FULL,
+        manifest_path: str | None = None,
+        lexical_path: str = LEXICAL_INDEX_PATH_FULL
+    ):
         self.index_path = index_path
         self.data_path = data_path
-        self.index = None
-        self.faq_data = []
-        self._load_resources()
+        self.metadata_path = metadata_path
+        self.classifier_path = classifier_path
+        self.lexical_path = lexical_path
+        self.manifest_path = manifest_path or os.path.join(
+            os.path.dirname(index_path), f"{os.path.splitext(os.path.basename(index_path))[0]}_manifest.json"
+        )
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self._generation = EMPTY_GENERATION
+        self._reload_lock = threading.Lock()
+        self._manifest_stat = False # Never checked; otherwise the manifest's last seen (mtime, size, inode) or None
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.reload()
+
+    @classmethod
+    def from_directory(cls, output_dir: str, base_name: str = FAISS_BASE_NAME, **kwargs) -> "FAISSVectorStore":
+        """The store for the build index_faq.py wrote to `output_dir` (e.g. one tenant's shard)."""
+        paths = legacy_paths(output_dir, base_name)
+        return cls(index_path=paths['index'], data_path=paths['data'], metadata_path=paths['metadata'],
+                   classifier_path=paths['topic_classifier'], lexical_path=paths['lexical'], **kwargs)
 
-    def _load_resources(self):
+    # The current generation's parts; a caller that needs several of them together
+    # should take `current_generation()` once instead.
+    @property
+    def index(self):
+        return self._generation.index
+
+    @property
+    def metadata(self) -> FAQMetadata:
+        return self._generation.metadata
+
+    @property
+    def topic_classifier(self):
+        return self._generation.topic_classifier
+
+    @property
+    def lexical_index(self) -> LexicalIndex | None:
+        return self._generation.lexical_index
+
+    @property
+    def version(self) -> str | None:
+        """Changes whenever a rebuilt index is loaded."""
+        return self._generation.version
+
+    @property
+    def generation(self) -> int | None:
+        return self._generation.generation
+
+    def current_generation(self) -> IndexGeneration:
+        return self._generation
+
+    def _stat_manifest(self):
         try:
-            if not os.path.exists(self.index_path):
-                print(f"Error: FAISS index file not found at {self.index_path}. Run indexing script first.")
-                return
-            self.index = faiss.read_index(self.index_path)
-            print(f"FAISS index loaded from {self.index_path} ({self.index.ntotal} vectors).")
-        except Exception as e:
-            print(f"Error loading FAISS index from {self.index_path}: {e}")
-            self.index = None
+            stat = os.stat(self.manifest_path)
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            return None
+
+    def reload(self) -> bool:
+        """
+        Loads the build the manifest (or, without one, the fixed paths) points at
+        if it is not the one being served, and swaps it in. Returns True if a new
+        generation was swapped in; a build that fails to load leaves the current
+        one in place and is retried on the next call.
+        """
+        with self._reload_lock:
+            manifest_stat = self._stat_manifest()
+            if manifest_stat == self._manifest_stat:
+                return False
+            manifest = read_manifest(self.manifest_path) if manifest_stat is not None else None
+            if manifest is not None:
+                version = manifest_version(manifest)
+                if version == self.version:
+                    self._manifest_stat = manifest_stat
+                    return False
+                paths = resolve_manifest_paths(manifest, self.manifest_path)
+                logger.info(f"Loading index generation {manifest['generation']} from {self.manifest_path}.")
+                loaded = self._load_generation(paths['index'], paths['data'], paths['metadata'], paths['topic_classifier'],
+                                               paths['lexical'], version, manifest['generation'])
+            elif self._generation is EMPTY_GENERATION:
+                loaded = self._load_generation(self.index_path, self.data_path, self.metadata_path, self.classifier_path,
+                                               self.lexical_path)
+            else:
+                return False
+            if not loaded.is_ready():
+                # The manifest stat is left as it was, so the next poll retries (e.g. files still being copied)
+                INDEX_RELOADS.inc(outcome="failed")
+                if self._generation is not EMPTY_GENERATION:
+                    logger.error(f"Index generation {loaded.generation} failed to load; still serving generation {self.generation}.")
+                return False
+            self._manifest_stat = manifest_stat
+            previous = self._generation
+            # A single reference assignment: searches see either generation, never a mix
+            self._generation = loaded
+            weakref.finalize(loaded, _release_generation, loaded.generation, loaded.metadata, loaded.lexical_index)
+            if previous is not EMPTY_GENERATION:
+                INDEX_RELOADS.inc(outcome="swapped")
+                logger.info(f"Swapped index generation {previous.generation} -> {loaded.generation} ({loaded.index.ntotal} vectors).")
+            return True
+
+    def start_watching(self, interval: float = config.INDEX_WATCH_INTERVAL_SECONDS):
+        """Polls the manifest every `interval` seconds on a daemon thread and reloads on change."""
+        if interval <= 0 or self._watcher is not None:
             return
+        # A fresh event, so a watcher stopped without waiting cannot be revived by this one
+        self._stop_watching = threading.Event()
+        # The thread only holds a weak reference, so it does not keep a discarded store alive
+        store_ref = weakref.ref(self)
+        stop = self._stop_watching
+
+        def watch():
+            while not stop.wait(interval):
+                store = store_ref()
+                if store is None:
+                    return
+                try:
+                    store.reload()
+                except Exception as e:
+                    logger.error(f"Error reloading the FAISS index: {e}")
+                del store
+
+        self._watcher = threading.Thread(target=watch, daemon=True, name="faiss-index-watcher")
+        self._watcher.start()
+        logger.info(f"Watching {self.manifest_path} for new index generations every {interval:g}s.")
+
+    def stop_watching(self, wait: bool = True):
+        """Stops the manifest watcher; with `wait=False`, a reload in progress finishes on its own thread."""
+        self._stop_watching.set()
+        if self._watcher is not None:
+            if wait:
+                self._watcher.join()
+            self._watcher = None
 
+    def _load_generation(self, index_path: str, data_path: str, metadata_path: str | None, classifier_path: str | None,
+                         lexical_path: str | None = None, version: str | None = None, generation: int | None = None) -> IndexGeneration:
+        empty = IndexGeneration(None, InMemoryFAQMetadata([]), None, None, generation)
         try:
-            if not os.path.exists(self.data_path):
-                print(f"Error: FAQ metadata file not found at {self.data_path}. Index may be unusable.")
-                return
-            with open(self.data_path, 'r', encoding='utf-8') as f:
-                self.faq_data = json.load(f)
-            print(f"FAQ metadata loaded from {self.data_path} ({len(self.faq_data)} entries).")
+            if not index_path or not os.path.exists(index_path):
+                logger.error(f"FAISS index file not found at {index_path}. Run indexing script first.")
+                return empty
+            index = read_faiss_index(index_path)
+            if version is None:
+                index_stat = os.stat(index_path)
+                version = f"{index_stat.st_mtime_ns}-{index_stat.st_size}"
+            set_faiss_search_params(index, self.nprobe, self.ef_search)
+            logger.info(f"FAISS index loaded from {index_path} ({index.ntotal} vectors, {get_index_type(index)}).")
         except Exception as e:
-            print(f"Error loading FAQ metadata from {self.data_path}: {e}")
-            self.faq_data = []
-            self.index = None
-            print("Index invalidated due to metadata loading failure.")
+            logger.error(f"Error loading FAISS index from {index_path}: {e}")
+            return empty
+
+        try:
+            metadata = self._load_metadata(data_path, metadata_path)
+        except Exception as e:
+            logger.error(f"Error loading FAQ metadata: {e}")
+            logger.error("Index invalidated due to metadata loading failure.")
+            return empty
+
+        if len(metadata) != index.ntotal:
+            logger.warning(f"Mismatch between vector count ({index.ntotal}) and metadata entries ({len(metadata)}). Results may be inconsistent.")
 
-        if self.index is not None and len(self.faq_data) != self.index.ntotal:
-            print(f"Warning: Mismatch between vector count ({self.index.ntotal}) and metadata entries ({len(self.faq_data)}). Results may be inconsistent.")
+        topic_classifier = None
+        if classifier_path and os.path.exists(classifier_path):
+            try:
+                topic_classifier = CentroidTopicClassifier.load(
+                    classifier_path,
+                    float(os.getenv("TOPIC_CLASSIFIER_UNCERTAINTY_LOW", config.TOPIC_CLASSIFIER_UNCERTAINTY_LOW)),
+                    float(os.getenv("TOPIC_CLASSIFIER_UNCERTAINTY_HIGH", config.TOPIC_CLASSIFIER_UNCERTAINTY_HIGH))
+                )
+                logger.info(f"Topic classifier loaded from {classifier_path}.")
+            except Exception as e:
+                logger.warning(f"Error loading topic classifier from {classifier_path}: {e}. Falling back to LLM classification.")
+
+        lexical_index = None
+        if lexical_path and os.path.exists(lexical_path):
+            try:
+                lexical_index = LexicalIndex(lexical_path)
+                logger.info(f"Lexical index memory-mapped from {lexical_path} ({len(lexical_index)} documents).")
+            except Exception as e:
+                logger.warning(f"Error opening lexical index {lexical_path}: {e}. Searching with FAISS only.")
+        return IndexGeneration(index, metadata, topic_classifier, version, generation, lexical_index)
+
+    def _load_metadata(self, data_path: str, metadata_path: str | None) -> FAQMetadata:
+        # Prefer the memory-mapped columnar file; the JSON data file is the fallback
+        # for builds that predate it (or if it cannot be opened)
+        if metadata_path and os.path.exists(metadata_path):
+            try:
+                metadata = MmapFAQMetadata(metadata_path)
+                logger.info(f"FAQ metadata memory-mapped from {metadata_path} ({len(metadata)} entries).")
+                return metadata
+            except Exception as e:
+                logger.warning(f"Error opening FAQ metadata file {metadata_path}: {e}. Falling back to {data_path}.")
+        if not data_path or not os.path.exists(data_path):
+            logger.error(f"FAQ metadata file not found at {data_path}. Index may be unusable.")
+            return InMemoryFAQMetadata([])
+        with open(data_path, 'r', encoding='utf-8') as f:
+            metadata = InMemoryFAQMetadata(json.load(f))
+        logger.info(f"FAQ metadata loaded from {data_path} ({len(metadata)} entries).")
+        return metadata
+
+    def set_search_params(self, nprobe: int | None = None, ef_search: int | None = None):
+        """Tunes the recall/latency trade-off: `nprobe` for IVF indexes, `ef_search` for HNSW."""
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        if self.index is not None:
+            set_faiss_search_params(self.index, self.nprobe, self.ef_search)
 
     def is_ready(self) -> bool:
-        return self.index is not None and bool(self.faq_data)
+        return self._generation.is_ready()
 
     def search_faq_by_text(self, query_text: str, k: int = 3) -> list[dict]:
         if not self.is_ready():
-            print("Error: FAISSVectorStore is not ready (index or data not loaded). Cannot search.")
+            logger.error("FAISSVectorStore is not ready (index or data not loaded). Cannot search.")
             return []
         if not query_text:
-            print("Error: Query text cannot be empty.")
+            logger.error("Query text cannot be empty.")
             return []
 
         query_embedding = get_openai_embedding(query_text)
         if query_embedding is None:
-            print("Error: Failed to generate embedding for the query text.")
+            logger.error("Failed to generate embedding for the query text.")
+            return []
+        return self.search_faq_by_embedding(query_embedding, k)
+
+    def search_faq_by_embedding(self, query_embedding: list[float], k: int = 3) -> list[dict]:
+        """Same as search_faq_by_text, for callers that already hold the query embedding."""
+        generation = self._generation
+        if not generation.is_ready():
+            logger.error("FAISSVectorStore is not ready (index or data not loaded). Cannot search.")
             return []
-        
+        return self._search_dense(generation, query_embedding, k)
+
+    def _search_dense(self, generation: IndexGeneration, query_embedding: list[float], k: int) -> list[dict]:
+        index, metadata = generation.index, generation.metadata
+
         query_np = np.array([query_embedding]).astype('float32')
         faiss.normalize_L2(query_np)
 
         try:
-            print(f"Searching FAISS index for {k} nearest neighbors...")
-            distances, indices = self.index.search(query_np, k)
+            logger.debug(f"Searching FAISS index for {k} nearest neighbors...")
+            distances, indices = index.search(query_np, k)
             
             results = []
-            if indices.size > 0:
-                for i in range(indices.shape[1]):
-                    vector_index = indices[0, i]
-                    if 0 <= vector_index < len(self.faq_data):
-                        matched_metadata = self.faq_data[vector_index]
-                        results.append({
-                            'id': matched_metadata.get('id', vector_index),
-                            'question': matched_metadata.get('question', 'N/A'),
-                            'answer': matched_metadata.get('answer', 'N/A'),
-                            'similarity_score': float(distances[0, i])
-                        })
-                    else:
-                        print(f"Warning: Retrieved index {vector_index} is out of bounds for metadata (size {len(self.faq_data)}).")
+            rows = metadata.lookup_rows(indices[0])
+            for i, row in enumerate(rows):
+                if row != -1:
+                    results.append({
+                        'id': int(indices[0, i]),
+                        'question': metadata.question(int(row)),
+                        'answer': metadata.answer(int(row)),
+                        'similarity_score': float(distances[0, i])
+                    })
+                elif indices[0, i] != -1:
+                    logger.warning(f"Retrieved id {indices[0, i]} has no metadata entry (size {len(metadata)}).")
             
-            print(f"Found {len(results)} results from FAISS search.")
+            logger.debug(f"Found {len(results)} results from FAISS search.")
             return results
         except Exception as e:
-            print(f"Error performing FAISS search: {e}")
-            return []
\ No newline at end of file
+            logger.error(f"Error performing FAISS search: {e}")
+            return []
+
+    def _lexical_results(self, generation: IndexGeneration, hits: list[dict]) -> list[dict]:
+        """Result dicts for lexical hits, with question and answer from the metadata and no dense score."""
+        metadata = generation.metadata
+        rows = metadata.lookup_rows(np.array([hit['id'] for hit in hits], dtype=np.int64))
+        return [
+            {
+                'id': hit['id'],
+                'question': metadata.question(int(row)),
+                'answer': metadata.answer(int(row)),
+                'similarity_score': None,
+                'lexical_score': hit.get('bm25_score'),
+                'lexical_coverage': hit['coverage']
+            }
+            for hit, row in zip(hits, rows)
+            if row != -1
+        ]
+
+    def search_lexical(self, query_text: str, k: int = 3) -> list[dict]:
+        """
+        BM25 search over FAQ questions and answers, without any embedding call.
+        Results have `lexical_score` (BM25) and `lexical_coverage` (see
+        LexicalIndex.search) and no `similarity_score`; empty for builds without
+        a lexical index.
+        """
+        generation = self._generation
+        if not generation.is_ready() or generation.lexical_index is None or not query_text:
+            return []
+        return self._lexical_results(generation, generation.lexical_index.search(query_text, k))
+
+    def match_lexical(self, query_text: str, min_terms: int = LEXICAL_FAST_PATH_MIN_TERMS,
+                      margin: float = LEXICAL_FAST_PATH_MARGIN) -> dict | None:
+        """
+        The FAQ a query matches lexically with high confidence, or None: either the
+        query is an FAQ question (ignoring case and punctuation), or it has at least
+        `min_terms` terms, one FAQ contains all of them, and that FAQ's BM25 score
+        is at least `margin` times the runner-up's. Needs no embedding call.
+        """
+        generation = self._generation
+        lexical_index = generation.lexical_index
+        if not generation.is_ready() or lexical_index is None or not query_text:
+            return None
+        faq_id = lexical_index.exact_question(query_text)
+        if faq_id is not None:
+            matches = self._lexical_results(generation, [{'id': faq_id, 'coverage': 1.0}])
+        else:
+            if len(set(tokenize(query_text))) < min_terms:
+                return None
+            hits = lexical_index.search(query_text, 2)
+            if not hits or hits[0]['coverage'] < 1.0 - 1e-6:
+                return None
+            if len(hits) > 1 and hits[0]['bm25_score'] < margin * hits[1]['bm25_score']:
+                return None
+            matches = self._lexical_results(generation, hits[:1])
+        return matches[0] if matches else None
+
+    def search_hybrid(self, query_text: str, query_embedding: list[float] | None, k: int = 3,
+                      candidates: int = RETRIEVAL_HYBRID_CANDIDATES, rrf_k: int = RETRIEVAL_RRF_K,
+                      dense: list[dict] | None = None) -> list[dict]:
+        """
+        Dense and lexical search fused by reciprocal rank fusion: each side ranks
+        its top `candidates`, and the best k by fused score are returned with a
+        `fusion_score` plus whichever of `similarity_score` and `lexical_score` /
+        `lexical_coverage` their side(s) produced (None otherwise). Without a
+        lexical index this is a plain dense search; without an embedding (e.g.
+        the embedding call failed) a lexical one. Callers that already ran the
+        dense search (e.g. with search_many) pass its candidates as `dense`.
+        """
+        generation = self._generation
+        if not generation.is_ready():
+            logger.error("FAISSVectorStore is not ready (index or data not loaded). Cannot search.")
+            return []
+        candidates = max(k, candidates)
+        if dense is None:
+            dense = self._search_dense(generation, query_embedding, candidates) if query_embedding is not None else []
+        lexical = []
+        if generation.lexical_index is not None and query_text:
+            lexical = self._lexical_results(generation, generation.lexical_index.search(query_text, candidates))
+        if not lexical:
+            return dense[:k]
+
+        merged = {result['id']: {**result, 'lexical_score': None, 'lexical_coverage': None} for result in dense}
+        for result in lexical:
+            if result['id'] in merged:
+                merged[result['id']].update(lexical_score=result['lexical_score'], lexical_coverage=result['lexical_coverage'])
+            else:
+                merged[result['id']] = dict(result)
+        fused = reciprocal_rank_fusion([[result['id'] for result in dense], [result['id'] for result in lexical]], rrf_k)
+        ranked = sorted(fused, key=fused.get, reverse=True)[:k]
+        return [{**merged[faq_id], 'fusion_score': fused[faq_id]} for faq_id in ranked]
+
+    def search_many(self, queries: list[str], k: int = 3, as_dicts: bool = False,
+                    embeddings: list[list[float] | None] | None = None) -> BatchSearchResults | list[list[dict]] | None:
+        """
+        Searches for many queries at once: one batched embedding request and a
+        single FAISS search over the whole query matrix. With `embeddings`
+        (one per query, None for a failed one) no embedding request is made.
+
+        Returns a BatchSearchResults (or, with as_dicts=True, one list of result
+        dicts per query), or None if the store is not ready or the search fails.
+        """
+        generation = self._generation
+        if not generation.is_ready():
+            logger.error("FAISSVectorStore is not ready (index or data not loaded). Cannot search.")
+            return None
+        index, metadata = generation.index, generation.metadata
+        if not queries:
+            return BatchSearchResults([], np.empty((0, k), dtype=np.int64), np.empty((0, k), dtype=np.float32),
+                                      np.empty((0, k), dtype=object), np.empty((0, k), dtype=object))
+
+        if embeddings is None:
+            embeddings = get_openai_embeddings(queries)
+        failed = np.array([embedding is None for embedding in embeddings])
+        if failed.all():
+            logger.error("Failed to generate embeddings for the query texts.")
+            return None
+        if failed.any():
+            logger.warning(f"Failed to generate embeddings for {int(failed.sum())} of {len(queries)} queries.")
+
+        dimension = index.d
+        query_np = np.zeros((len(queries), dimension), dtype='float32')
+        for i, embedding in enumerate(embeddings):
+            if embedding is not None:
+                query_np[i] = embedding
+        faiss.normalize_L2(query_np)
+
+        try:
+            logger.debug(f"Searching FAISS index for {k} nearest neighbors of {len(queries)} queries...")
+            distances, indices = index.search(query_np, k)
+        except Exception as e:
+            logger.error(f"Error performing FAISS search: {e}")
+            return None
+
+        rows = metadata.lookup_rows(indices)
+        rows[failed] = -1
+        missing = rows == -1
+        ids = np.where(missing, -1, indices)
+        scores = np.where(missing, np.nan, distances).astype(np.float32)
+        results = BatchSearchResults(list(queries), ids, scores, metadata.questions(rows), metadata.answers(rows))
+        logger.debug(f"Found {int((~missing).sum())} results from batched FAISS search.")
+        return results.to_dicts() if as_dicts else results
@@ -0,0 +1,180 @@
+import json
+import mmap
+import struct
+import numpy as np
+
+# File layout (little endian), every section aligned to 8 bytes:
+#   header:            MAGIC, count (u64), id_table_size (u64), question_blob_size (u64), answer_blob_size (u64)
+#   ids:               int64[count]          vector id of each row
+#   question_offsets:  uint64[count + 1]     row i is question_blob[off[i]:off[i + 1]]
+#   answer_offsets:    uint64[count + 1]
+#   id_to_row:         int64[id_table_size]  dense vector id -> row table, -1 for unused ids
+#   question_blob, answer_blob: concatenated UTF-8 strings
+MAGIC = b"FAQMETA1"
+HEADER = struct.Struct("<8sQQQQ")
+
+def _pad(size: int) -> int:
+    return (size + 7) & ~7
+
+def _blob_with_offsets(texts: list[str]) -> tuple[bytes, np.ndarray]:
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+def _id_to_row_table(ids: np.ndarray) -> np.ndarray:
+    # Vector ids are stable across incremental builds, so they need not match row
+    # positions; a dense id -> row table keeps the lookup a single array gather.
+    table = np.full(int(ids.max()) + 1 if ids.size else 0, -1, dtype="<i8")
+    table[ids] = np.arange(len(ids))
+    return table
+
+def write_faq_metadata(path: str, records: list[dict]):
+    """Writes FAQ records ({'id', 'question', 'answer', ...}) in the mmap-able columnar format."""
+    ids = np.array([record['id'] for record in records], dtype="<i8")
+    question_blob, question_offsets = _blob_with_offsets([record.get('question', 'N/A') for record in records])
+    answer_blob, answer_offsets = _blob_with_offsets([record.get('answer', 'N/A') for record in records])
+    id_to_row = _id_to_row_table(ids)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(ids), len(id_to_row), len(question_blob), len(answer_blob)))
+        for section in (ids, question_offsets, answer_offsets, id_to_row):
+            f.write(section.tobytes())
+        f.write(question_blob)
+        f.write(b"\0" * (_pad(len(question_blob)) - len(question_blob)))
+        f.write(answer_blob)
+
+class FAQMetadata:
+    """
+    Columnar id -> (question, answer) lookups shared by both metadata backends.
+
+    Subclasses provide `ids` (int64 per row), `id_to_row` (dense table) and
+    `question(row)` / `answer(row)`.
+    """
+    ids = np.empty(0, dtype=np.int64)
+    id_to_row = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def lookup_rows(self, ids: np.ndarray) -> np.ndarray:
+        """Maps FAISS ids to metadata rows; ids without metadata (including -1) map to -1."""
+        if not len(self.id_to_row):
+            return np.full(ids.shape, -1, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < len(self.id_to_row))
+        return np.where(in_range, self.id_to_row[np.where(in_range, ids, 0)], -1)
+
+    def question(self, row: int) -> str:
+        raise NotImplementedError
+
+    def answer(self, row: int) -> str:
+        raise NotImplementedError
+
+    def questions(self, rows: np.ndarray) -> np.ndarray:
+        """Object array shaped like `rows`, with None where the row is -1."""
+        return self._gather(rows, self.question)
+
+    def answers(self, rows: np.ndarray) -> np.ndarray:
+        return self._gather(rows, self.answer)
+
+    @staticmethod
+    def _gather(rows: np.ndarray, getter) -> np.ndarray:
+        # Per-hit fallback for backends that have no column to index (the mmap file decodes each string)
+        out = np.full(rows.shape, None, dtype=object)
+        for position in zip(*np.nonzero(rows != -1)):
+            out[position] = getter(int(rows[position]))
+        return out
+
+    def close(self):
+        pass
+
+class InMemoryFAQMetadata(FAQMetadata):
+    """Metadata parsed from the JSON data file, held as Python objects."""
+    def __init__(self, faq_data: list[dict]):
+        self.ids = np.array([entry['id'] for entry in faq_data], dtype=np.int64)
+        self._questions = self._column([entry.get('question', 'N/A') for entry in faq_data])
+        self._answers = self._column([entry.get('answer', 'N/A') for entry in faq_data])
+        self.id_to_row = _id_to_row_table(self.ids)
+
+    @staticmethod
+    def _column(texts: list[str]) -> np.ndarray:
+        column = np.empty(len(texts), dtype=object)
+        column[:] = texts
+        return column
+
+    def question(self, row: int) -> str:
+        return self._questions[row]
+
+    def answer(self, row: int) -> str:
+        return self._answers[row]
+
+    # Bulk lookups are one fancy-indexing gather over the object columns
+    def questions(self, rows: np.ndarray) -> np.ndarray:
+        return self._take(self._questions, rows)
+
+    def answers(self, rows: np.ndarray) -> np.ndarray:
+        return self._take(self._answers, rows)
+
+    @staticmethod
+    def _take(column: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        missing = rows == -1
+        if not len(column):
+            return np.full(rows.shape, None, dtype=object)
+        out = column[np.where(missing, 0, rows)]
+        out[missing] = None
+        return out
+
+class MmapFAQMetadata(FAQMetadata):
+    """
+    Metadata file opened with mmap: the id arrays are zero-copy views into the
+    mapping and strings are decoded only for the rows a search returns, so
+    opening it costs neither parse time nor resident memory per entry.
+    """
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, count, id_table_size, question_blob_size, answer_blob_size = HEADER.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not an FAQ metadata file")
+            position = HEADER.size
+            self.ids, position = self._view(position, "<i8", count)
+            self._question_offsets, position = self._view(position, "<u8", count + 1)
+            self._answer_offsets, position = self._view(position, "<u8", count + 1)
+            self.id_to_row, position = self._view(position, "<i8", id_table_size)
+            self._question_base = position
+            self._answer_base = position + _pad(question_blob_size)
+            if self._answer_base + answer_blob_size > len(self._mmap):
+                raise ValueError(f"{path} is truncated")
+        except Exception:
+            self.close()
+            raise
+
+    def _view(self, position: int, dtype: str, count: int) -> tuple[np.ndarray, int]:
+        array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=position)
+        return array, position + _pad(array.nbytes)
+
+    def _text(self, base: int, offsets: np.ndarray, row: int) -> str:
+        return self._mmap[base + int(offsets[row]):base + int(offsets[row + 1])].decode("utf-8")
+
+    def question(self, row: int) -> str:
+        return self._text(self._question_base, self._question_offsets, row)
+
+    def answer(self, row: int) -> str:
+        return self._text(self._answer_base, self._answer_offsets, row)
+
+    def close(self):
+        # Drop the array views first; mmap.close() fails while buffers are exported
+        self.ids = self.id_to_row = self._question_offsets = self._answer_offsets = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass # Views still held by a caller; the mapping is released when they go away
+
+def load_faq_metadata(path: str) -> FAQMetadata:
+    """Opens `path` with mmap if it is a columnar metadata file, else parses it as JSON."""
+    with open(path, "rb") as f:
+        is_columnar = f.read(len(MAGIC)) == MAGIC
+    if is_columnar:
+        return MmapFAQMetadata(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return InMemoryFAQMetadata(json.load(f))
@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import config
+from telemetry import get_logger, span, Counter
+
+logger = get_logger(__name__)
+
+IMAGE_BACKEND_RESULTS = Counter("image_backend_results_total", "Image analysis backend calls by backend and outcome (success/error/timeout).")
+
+# Long-lived pool shared by all sessions; a backend that overruns its timeout keeps
+# its worker until the remote call returns, but never blocks the caller.
+_executor = ThreadPoolExecutor(max_workers=config.IMAGE_ANALYSIS_MAX_WORKERS, thread_name_prefix="image-analysis")
+
+def _run_backend(name: str, backend, image):
+    with span(f"image.{name}"):
+        return backend(image)
+
+class ImageAnalysisRun:
+    """
+    Image analysis backends running on the shared pool.
+
+    Results are reported as (name, result, error) tuples, where `error` is
+    the raised exception, or a TimeoutError for a backend that did not finish
+    in time; `result` is None whenever `error` is set.
+    """
+    def __init__(self, image, backends: dict, timeout: float | dict, executor: ThreadPoolExecutor | None = None):
+        self.started_at = time.monotonic()
+        self._deadlines = {
+            name: self.started_at + (timeout.get(name, config.IMAGE_ANALYSIS_TIMEOUT_SECONDS) if isinstance(timeout, dict) else timeout)
+            for name in backends
+        }
+        self._pending = {(executor or _executor).submit(_run_backend, name, backend, image): name for name, backend in backends.items()}
+
+    @property
+    def done(self) -> bool:
+        return not self._pending
+
+    def poll(self) -> list[tuple]:
+        """Returns the results that are ready (or timed out) right now, without blocking."""
+        finished = []
+        now = time.monotonic()
+        for future, name in list(self._pending.items()):
+            if future.done():
+                del self._pending[future]
+                try:
+                    finished.append((name, future.result(), None))
+                    IMAGE_BACKEND_RESULTS.inc(backend=name, outcome="success")
+                except Exception as e:
+                    IMAGE_BACKEND_RESULTS.inc(backend=name, outcome="error")
+                    logger.warning(f"Image analysis backend '{name}' failed: {e}")
+                    finished.append((name, None, e))
+            elif now >= self._deadlines[name]:
+                del self._pending[future]
+                future.cancel()
+                elapsed = self._deadlines[name] - self.started_at
+                IMAGE_BACKEND_RESULTS.inc(backend=name, outcome="timeout")
+                logger.warning(f"Image analysis backend '{name}' timed out after {elapsed:.1f}s.")
+                finished.append((name, None, TimeoutError(f"{name} did not respond within {elapsed:.1f}s")))
+        return finished
+
+    def results(self):
+        """Yields every remaining result in completion order, blocking until each arrives."""
+        while self._pending:
+            yield from self.poll()
+            if not self._pending:
+                break
+            next_deadline = min(self._deadlines[name] for name in self._pending.values())
+            wait(self._pending, timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+
+def start_image_analysis(image, backends: dict, timeout: float | dict = config.IMAGE_ANALYSIS_TIMEOUT_SECONDS,
+                         executor: ThreadPoolExecutor | None = None) -> ImageAnalysisRun:
+    """
+    Submits every backend and returns immediately; see ImageAnalysisRun for
+    collecting results. Backends run on the shared pool unless an `executor`
+    is given, e.g. by a bulk job that needs more workers than the app does.
+    """
+    return ImageAnalysisRun(image, backends, timeout, executor)
+
+def analyze_image_concurrently(image, backends: dict, timeout: float | dict = config.IMAGE_ANALYSIS_TIMEOUT_SECONDS):
+    """
+    Runs every image analysis backend on its own worker thread.
+
+    Args:
+        image: The image passed to each backend (raw bytes or a PreparedImage).
+        backends: Mapping of backend name to a callable taking the image.
+        timeout: Seconds each backend may take, either one value for all or a
+            mapping of backend name to seconds.
+
+    Yields:
+        (name, result, error) tuples in completion order, so callers can render
+        each result as soon as it arrives. `error` is the raised exception, or a
+        TimeoutError for backends that did not finish in time; `result` is None
+        whenever `error` is set.
+    """
+    yield from start_image_analysis(image, backends, timeout).results()
+
+def iter_with_deadline(items, timeout: float, on_wait=None, poll_interval: float = 0.1):
+    """
+    Yields from `items` (e.g. a token stream), which is read on its own thread,
+    and raises TimeoutError if it has not ended within `timeout` seconds.
+    Errors from `items` are re-raised here. `on_wait` is called at least every
+    `poll_interval` seconds, whether or not anything arrived, so the caller can
+    render other backends' results while a slow stream stalls.
+    """
+    pending = queue.Queue()
+    finished = object()
+    abandoned = threading.Event()
+
+    def read():
+        try:
+            for item in items:
+                if abandoned.is_set():
+                    break
+                pending.put((item, None))
+            pending.put((finished, None))
+        except Exception as e:
+            pending.put((finished, e))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=read, daemon=True, name="stream-reader").start()
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            if on_wait is not None:
+                on_wait()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"The stream did not finish within {timeout:.1f}s")
+            try:
+                item, error = pending.get(timeout=min(poll_interval, remaining))
+            except queue.Empty:
+                continue
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # A reader stuck waiting on a stalled stream stops at its next item
+        abandoned.set()
@@ -0,0 +1,156 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from PIL import Image
+from telemetry import get_logger, record_cache_lookup
+
+logger = get_logger(__name__)
+
+def image_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def perceptual_hash(image_bytes: bytes) -> int | None:
+    """
+    64-bit difference hash (dHash): robust to re-encoding and resizing, so
+    re-saved copies of the same photo land within a few bits of each other.
+    """
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.draft("L", (64, 64))
+        pixels = np.asarray(image.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    except Exception as e:
+        logger.warning(f"Could not compute perceptual hash: {e}")
+        return None
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = int("".join("1" if bit else "0" for bit in bits), 2)
+    # Store as a signed 64-bit integer, which is what SQLite holds
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def params_hash(backend: str, params: dict) -> str:
+    return hashlib.sha256(json.dumps([backend, params], sort_keys=True).encode("utf-8")).hexdigest()
+
+class ImageResultCache:
+    """
+    Disk-backed cache of image analysis results.
+
+    Entries are keyed on the SHA-256 of the original image bytes plus a hash
+    of the backend name and every parameter that affects its output (prompt,
+    model, detail, label thresholds, ...). On an exact miss, a perceptual
+    hash within `perceptual_max_distance` bits under the same parameters
+    also counts as a hit (set it to a negative value to disable). Total
+    stored size is capped at `max_bytes`, evicting least recently used
+    entries first. Safe to share between threads.
+    """
+    def __init__(self, path: str, max_bytes: int, perceptual_max_distance: int = -1):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.perceptual_max_distance = perceptual_max_distance
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._phash_memo = {} # image hash -> perceptual hash, for the put that follows a miss
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                       key TEXT PRIMARY KEY,
+                       params_hash TEXT NOT NULL,
+                       phash INTEGER,
+                       value TEXT NOT NULL,
+                       size INTEGER NOT NULL,
+                       last_access REAL NOT NULL
+                   )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_params ON results (params_hash)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+            self._conn.commit()
+        self.hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+
+    def _phash(self, digest: str, image_bytes: bytes) -> int | None:
+        with self._lock:
+            if digest in self._phash_memo:
+                return self._phash_memo[digest]
+        # Hashed outside the lock; two threads missing on one image both compute the same value
+        phash = perceptual_hash(image_bytes)
+        with self._lock:
+            if len(self._phash_memo) > 64:
+                self._phash_memo.clear()
+            self._phash_memo[digest] = phash
+        return phash
+
+    def get(self, image_bytes: bytes, backend: str, params: dict):
+        """Returns the cached result for this image and parameters, or None."""
+        digest = image_hash(image_bytes)
+        p_hash = params_hash(backend, params)
+        with self._lock:
+            row = self._conn.execute("SELECT key, value FROM results WHERE key = ?", (f"{digest}:{p_hash}",)).fetchone()
+        perceptual = False
+        if row is None and self.perceptual_max_distance >= 0:
+            row = self._get_perceptual(self._phash(digest, image_bytes), p_hash)
+            perceptual = row is not None
+        record_cache_lookup("image", row is not None)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.perceptual_hits += perceptual
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), row[0]))
+            self._conn.commit()
+        return json.loads(row[1])
+
+    def _get_perceptual(self, phash: int | None, p_hash: str):
+        if phash is None:
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, phash FROM results WHERE params_hash = ? AND phash IS NOT NULL", (p_hash,)
+            ).fetchall()
+        if not rows:
+            return None
+        candidates = np.array([row[1] for row in rows], dtype=np.int64)
+        differing = np.unpackbits((candidates ^ np.int64(phash)).view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(differing))
+        if differing[best] > self.perceptual_max_distance:
+            return None
+        # Only the best match's value is read, rather than every candidate's
+        with self._lock:
+            return self._conn.execute("SELECT key, value FROM results WHERE key = ?", (rows[best][0],)).fetchone()
+
+    def put(self, image_bytes: bytes, backend: str, params: dict, value):
+        digest = image_hash(image_bytes)
+        p_hash = params_hash(backend, params)
+        phash = self._phash(digest, image_bytes) if self.perceptual_max_distance >= 0 else None
+        payload = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, params_hash, phash, value, size, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (f"{digest}:{p_hash}", p_hash, phash, payload, len(payload), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY last_access"):
+            doomed.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM results WHERE key = ?", doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {'entries': entries, 'bytes': size, 'hits': self.hits, 'perceptual_hits': self.perceptual_hits, 'misses': self.misses}
\ No newline at end of file
@@ -0,0 +1,108 @@
+import io
+import math
+from PIL import Image, ImageOps
+
+# Import constants from config.py
+import config
+from telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# Rekognition rejects inline image bytes above 5 MB
+REKOGNITION_MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+class PreparedImage:
+    """Per-backend encodings of one uploaded image."""
+    def __init__(self, original_bytes: bytes, vision_bytes: bytes, vision_mime_type: str, rekognition_bytes: bytes):
+        self.original_bytes = original_bytes
+        self.vision_bytes = vision_bytes
+        self.vision_mime_type = vision_mime_type
+        self.rekognition_bytes = rekognition_bytes
+
+    @property
+    def bytes_saved(self) -> int:
+        """Upload bytes saved across both backends compared to sending the original twice."""
+        return 2 * len(self.original_bytes) - len(self.vision_bytes) - len(self.rekognition_bytes)
+
+def vision_target_size(width: int, height: int, detail: str) -> tuple[int, int]:
+    """
+    Largest size the vision model actually looks at for `detail`: "low" uses a
+    512px view; "high"/"auto" fit within 2048x2048 with the shortest side at
+    most 768px. Images are never upscaled.
+    """
+    if detail == "low":
+        scale = 512 / max(width, height)
+    else:
+        scale = min(2048 / max(width, height), 768 / min(width, height))
+    scale = min(1.0, scale)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def vision_image_tokens(width: int, height: int, detail: str) -> int:
+    """Approximate input tokens billed for an image of this size: 85 base plus 170 per 512px tile above "low"."""
+    if detail == "low":
+        return 85
+    width, height = vision_target_size(width, height, detail)
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+def _fit(image: Image.Image, size: tuple[int, int]) -> Image.Image:
+    return image if image.size == size else image.resize(size, Image.LANCZOS)
+
+def _encode(image: Image.Image, image_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality)
+    return buffer.getvalue()
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # Flatten transparency onto white instead of letting it turn black
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+def prepare_image(image_bytes: bytes, detail: str = config.DEFAULT_VISION_DETAIL) -> PreparedImage:
+    """
+    Decodes an upload once, applies its EXIF orientation and re-encodes it for
+    each backend: a downscaled JPEG/WebP sized to the vision detail level, and
+    a JPEG within Rekognition's byte limit. If the image cannot be decoded,
+    or a re-encode would be larger than the original, the original is used.
+    """
+    original_mime_type = None
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        original_mime_type = _MIME_TYPES.get(image.format)
+        # Let the JPEG decoder downscale by a power of two while decoding when possible
+        image.draft("RGB", (config.IMAGE_REKOGNITION_MAX_SIDE, config.IMAGE_REKOGNITION_MAX_SIDE))
+        image = _to_rgb(ImageOps.exif_transpose(image))
+    except Exception as e:
+        logger.warning(f"Image preprocessing failed, sending original bytes: {e}")
+        return PreparedImage(image_bytes, image_bytes, original_mime_type or "image/jpeg", image_bytes)
+
+    vision_format = config.IMAGE_VISION_FORMAT.upper()
+    vision_image = _fit(image, vision_target_size(*image.size, detail))
+    vision_bytes = _encode(vision_image, vision_format, config.IMAGE_VISION_QUALITY)
+    vision_mime_type = _MIME_TYPES[vision_format]
+    if len(vision_bytes) >= len(image_bytes) and original_mime_type:
+        vision_bytes, vision_mime_type = image_bytes, original_mime_type
+
+    scale = min(1.0, config.IMAGE_REKOGNITION_MAX_SIDE / max(image.size))
+    rekognition_image = _fit(image, (max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+    quality = config.IMAGE_REKOGNITION_QUALITY
+    rekognition_bytes = _encode(rekognition_image, "JPEG", quality)
+    while len(rekognition_bytes) > REKOGNITION_MAX_IMAGE_BYTES and quality > 40:
+        quality -= 15
+        rekognition_bytes = _encode(rekognition_image, "JPEG", quality)
+    if len(rekognition_bytes) >= len(image_bytes) and original_mime_type in ("image/jpeg", "image/png"):
+        rekognition_bytes = image_bytes
+
+    prepared = PreparedImage(image_bytes, vision_bytes, vision_mime_type, rekognition_bytes)
+    logger.debug("Image preprocessed", extra={
+        'original_bytes': len(image_bytes),
+        'vision_bytes': len(vision_bytes),
+        'vision_size': f"{vision_image.width}x{vision_image.height}",
+        'rekognition_bytes': len(rekognition_bytes),
+        'bytes_saved': prepared.bytes_saved
+    })
+    return prepared
\ No newline at end of file
@@ -1,14 +1,20 @@
+import argparse
 import json
 import os
 import time
 import numpy as np
 import faiss
-from dotenv import load_dotenv
 # Removed OpenSearch import
-from openai_service import get_openai_embedding # Keep OpenAI embedding service
+from openai_service import iter_openai_embedding_batches, get_openai_embeddings, OPENAI_EMBEDDING_MODEL # Batched OpenAI embedding service
+from embedding_cache import EmbeddingCache, text_hash
+from faiss_service import INDEX_TYPES, create_faiss_index, train_faiss_index, get_index_type
+from faq_metadata import write_faq_metadata
+from lexical_index import write_lexical_index
+from index_manifest import (generation_paths, is_valid_tenant, manifest_path, next_generation, prune_generations,
+                            resolve_build_paths, tenant_dir, write_atomically, write_manifest)
+from topic_classifier import CentroidTopicClassifier, load_topic_examples, RETAIL_LABEL
 
-# Load environment variables from .env file (for OpenAI key)
-load_dotenv()
+import config
 
 # Configuration from Environment Variables (with defaults)
 FAQ_SOURCE_FILE_REL_PATH = os.getenv("FAQ_SOURCE_JSON_FILE", "data/dummy_faq.json")
@@ -20,128 +26,402 @@ VECTOR_DIMENSION = int(os.getenv("OPENAI_EMBEDDING_MODEL_DIMENSION", "1536"))
 SCRIPT_DIR = os.path.dirname(__file__)
 FAQ_FILE_PATH = os.path.join(SCRIPT_DIR, FAQ_SOURCE_FILE_REL_PATH)
 OUTPUT_DIR = os.path.join(SCRIPT_DIR, FAISS_DIR_NAME)
-FAISS_INDEX_PATH = os.path.join(OUTPUT_DIR, f'{FAISS_BASE_NAME}.faiss')
-FAQ_DATA_PATH = os.path.join(OUTPUT_DIR, f'{FAISS_BASE_NAME}_data.json')
+KEEP_GENERATIONS = int(os.getenv("INDEX_KEEP_GENERATIONS", config.INDEX_KEEP_GENERATIONS))
+TOPIC_EXAMPLES_PATH = os.path.join(SCRIPT_DIR, os.getenv("TOPIC_EXAMPLES_JSON_FILE", config.TOPIC_EXAMPLES_JSON_FILE))
+# Shared by every tenant shard, so a question several tenants carry is embedded once
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(OUTPUT_DIR, "embedding_cache.sqlite3"))
+TENANT_FIELD = os.getenv("TENANT_FIELD", config.TENANT_FIELD)
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", config.DEFAULT_TENANT)
 
-def main():
+def load_faq_entries(path: str) -> list[dict] | None:
     """
-    Main function to load FAQs, generate embeddings, build a FAISS index,
-    and save the index and corresponding text data.
-    """
-    print(f"Starting FAISS FAQ indexing process from file: {FAQ_FILE_PATH}")
-
-    # Ensure output directory exists
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    print(f"Using output directory: {OUTPUT_DIR}")
+    Loads and validates the FAQ source file.
 
-    # --- 1. Load FAQ Data ---
+    Each entry gets a stable `source_key` (the source `id` field when present,
+    otherwise the question hash) used to diff against the previous build,
+    a `question_hash` that decides whether it needs a new embedding, and its
+    `tenant` (the TENANT_FIELD of the source entry, DEFAULT_TENANT without
+    one). Keys only need to be unique within a tenant.
+    """
     try:
-        with open(FAQ_FILE_PATH, 'r', encoding='utf-8') as f:
+        with open(path, 'r', encoding='utf-8') as f:
             faqs = json.load(f)
         print(f"Loaded {len(faqs)} FAQ entries from JSON file.")
     except FileNotFoundError:
-        print(f"Error: FAQ file not found at {FAQ_FILE_PATH}")
-        return
+        print(f"Error: FAQ file not found at {path}")
+        return None
     except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from {FAQ_FILE_PATH}: {e}")
-        return
+        print(f"Error decoding JSON from {path}: {e}")
+        return None
     except Exception as e:
         print(f"An unexpected error occurred while loading the FAQ file: {e}")
-        return
+        return None
 
-    if not faqs:
-        print("No FAQs loaded, exiting.")
-        return
-
-    # --- 2. Generate Embeddings and Prepare Data ---
-    print("\nStarting embedding generation...")
-    embeddings_list = []
-    faq_data_for_lookup = [] # Store corresponding text data
-    failed_count = 0
-    
+    entries = []
+    seen_keys = set()
     for i, faq in enumerate(faqs):
         question = faq.get('question')
         answer = faq.get('answer')
 
         if not question or not answer:
             print(f"Skipping FAQ entry {i+1} due to missing question or answer.")
-            failed_count += 1
             continue
 
-        print(f"Processing FAQ {i+1}/{len(faqs)}: '{question[:50]}...'")
+        question_hash = text_hash(question)
+        source_key = str(faq['id']) if faq.get('id') is not None else question_hash
+        tenant = str(faq.get(TENANT_FIELD) or DEFAULT_TENANT)
+        if (tenant, source_key) in seen_keys:
+            print(f"Skipping FAQ entry {i+1}: duplicate key '{source_key[:16]}'.")
+            continue
+        seen_keys.add((tenant, source_key))
+        entries.append({
+            'source_key': source_key,
+            'question_hash': question_hash,
+            'question': question,
+            'answer': answer,
+            'tenant': tenant
+        })
+    return entries
+
+def load_previous_build(output_dir: str):
+    """Returns (index, metadata) from the last build in `output_dir`, or (None, None) if it cannot be diffed against."""
+    paths, _ = resolve_build_paths(output_dir, FAISS_BASE_NAME)
+    if not (paths['index'] and paths['data'] and os.path.exists(paths['index']) and os.path.exists(paths['data'])):
+        print("No previous build found.")
+        return None, None
+    try:
+        index = faiss.read_index(paths['index'])
+        with open(paths['data'], 'r', encoding='utf-8') as f:
+            faq_data = json.load(f)
+    except Exception as e:
+        print(f"Error loading previous build: {e}")
+        return None, None
+
+    if not isinstance(index, faiss.IndexIDMap):
+        print("Previous index is not ID-mapped.")
+        return None, None
+    if any('source_key' not in entry or 'question_hash' not in entry for entry in faq_data):
+        print("Previous metadata predates incremental builds.")
+        return None, None
+    return index, faq_data
+
+def embed_and_add(index, entries: list[dict], ids: list[int], positions: list[int], cache: EmbeddingCache) -> set[int]:
+    """
+    Adds the embeddings for `entries[p]` (p in positions) to the index under `ids[p]`.
+
+    Vectors already in the cache are added directly; the rest are embedded in
+    concurrent batches and streamed into the index as each batch finishes.
+    Returns the set of positions that were added successfully.
+    """
+    added = set()
+    # Untrained (IVF) indexes need the full set of vectors before anything can be added
+    pending_positions, pending_vectors = [], []
+
+    def add_vectors(batch_positions, vectors):
+        batch_np = np.array(vectors).astype('float32')
+        if batch_np.shape[1] != VECTOR_DIMENSION:
+            print(f"  Error: Embedding dimension mismatch. Expected {VECTOR_DIMENSION}, got {batch_np.shape[1]}. Skipping {len(batch_positions)} FAQs.")
+            return
+        # Normalize vectors (important for cosine similarity / inner product search)
+        # OpenAI embeddings are typically pre-normalized, but good practice to ensure
+        faiss.normalize_L2(batch_np)
+        if not index.is_trained:
+            pending_positions.extend(batch_positions)
+            pending_vectors.append(batch_np)
+            return
+        index.add_with_ids(batch_np, np.array([ids[p] for p in batch_positions], dtype='int64'))
+        added.update(batch_positions)
 
-        # Get embedding for the question
-        embedding = get_openai_embedding(question)
+    def flush_pending():
+        if not pending_vectors:
+            return
+        all_vectors = np.concatenate(pending_vectors)
+        train_faiss_index(index, all_vectors)
+        pending_vectors.clear()
+        index.add_with_ids(all_vectors, np.array([ids[p] for p in pending_positions], dtype='int64'))
+        added.update(pending_positions)
 
-        if embedding is None:
-            print(f"  Failed to generate embedding for FAQ {i+1}. Skipping.")
-            failed_count += 1
-            time.sleep(1) # Small delay after a failure
+    # Group positions by question hash so duplicate questions are embedded once
+    positions_by_hash = {}
+    for p in positions:
+        positions_by_hash.setdefault(entries[p]['question_hash'], []).append(p)
+
+    cached = cache.get_many(OPENAI_EMBEDDING_MODEL, list(positions_by_hash))
+    if cached:
+        hit_positions = [p for key in cached for p in positions_by_hash[key]]
+        add_vectors(hit_positions, [cached[entries[p]['question_hash']] for p in hit_positions])
+        print(f"Reused {len(hit_positions)} embeddings from cache ({EMBEDDING_CACHE_PATH}).")
+
+    missing_hashes = [key for key in positions_by_hash if key not in cached]
+    if not missing_hashes:
+        flush_pending()
+        return added
+
+    missing_texts = [entries[positions_by_hash[key][0]]['question'] for key in missing_hashes]
+    print(f"\nStarting batched embedding generation for {len(missing_texts)} FAQs...")
+    started_at = time.perf_counter()
+    embedded_count = 0
+    total_tokens = 0
+
+    for indices, embeddings, tokens in iter_openai_embedding_batches(missing_texts):
+        if embeddings is None:
+            print(f"  Failed to generate embeddings for a batch of {len(indices)} FAQs. Skipping.")
             continue
-            
-        # Check dimension
-        if len(embedding) != VECTOR_DIMENSION:
-            print(f"  Error: Embedding dimension mismatch for FAQ {i+1}. Expected {VECTOR_DIMENSION}, got {len(embedding)}. Skipping.")
-            failed_count += 1
+
+        cache.put_many(OPENAI_EMBEDDING_MODEL, [(missing_hashes[i], embedding) for i, embedding in zip(indices, embeddings)])
+        batch_positions, vectors = [], []
+        for i, embedding in zip(indices, embeddings):
+            for p in positions_by_hash[missing_hashes[i]]:
+                batch_positions.append(p)
+                vectors.append(embedding)
+        add_vectors(batch_positions, vectors)
+
+        embedded_count += len(indices)
+        total_tokens += tokens
+        elapsed = max(time.perf_counter() - started_at, 1e-9)
+        print(f"Embedded {embedded_count}/{len(missing_texts)} FAQs "
+              f"({embedded_count / elapsed:.1f} texts/sec, {total_tokens / elapsed:.0f} tokens/sec)")
+
+    elapsed = max(time.perf_counter() - started_at, 1e-9)
+    print(f"\nSuccessfully generated embeddings for {embedded_count} FAQs in {elapsed:.1f}s.")
+    print(f"Throughput: {embedded_count / elapsed:.1f} texts/sec, {total_tokens / elapsed:.0f} tokens/sec ({total_tokens} tokens).")
+    flush_pending()
+    return added
+
+def plan_incremental_build(index, previous_data: list[dict], entries: list[dict]):
+    """
+    Diffs `entries` against the previous build's metadata and removes stale
+    vectors from `index`. Returns (ids, to_embed, kept), or None if the
+    previous index cannot be updated in place.
+    """
+    # Keys are only unique within a tenant; metadata written before tenants existed has no tenant field
+    previous_by_key = {(entry.get('tenant', DEFAULT_TENANT), entry['source_key']): entry for entry in previous_data}
+    next_id = max((entry['id'] for entry in previous_data), default=-1) + 1
+    ids, to_embed, kept, stale_ids = [], [], set(), []
+    for p, entry in enumerate(entries):
+        previous = previous_by_key.pop((entry['tenant'], entry['source_key']), None)
+        if previous is not None and previous['question_hash'] == entry['question_hash']:
+            ids.append(previous['id']) # Unchanged question: keep the vector, refresh the answer
+            kept.add(p)
             continue
+        if previous is not None:
+            stale_ids.append(previous['id'])
+        ids.append(next_id)
+        next_id += 1
+        to_embed.append(p)
+    # Whatever is left in previous_by_key was deleted from the source
+    stale_ids.extend(entry['id'] for entry in previous_by_key.values())
+    if stale_ids:
+        try:
+            index.remove_ids(np.array(stale_ids, dtype='int64'))
+        except RuntimeError as e:
+            print(f"Previous index ({get_index_type(index)}) does not support removing entries: {e}")
+            return None
+    print(f"Incremental build on {get_index_type(index)} index: {len(kept)} unchanged, {len(to_embed)} new or changed, "
+          f"{len(previous_by_key)} deleted, {len(stale_ids) - len(previous_by_key)} replaced.")
+    return ids, to_embed, kept
 
-        embeddings_list.append(embedding)
-        # Store the original data with an ID corresponding to its position
-        faq_data_for_lookup.append({
-            'id': len(faq_data_for_lookup), # Simple sequential ID
-            'question': question,
-            'answer': answer
-        })
-        
-        # Optional: Rate limiting for OpenAI API
-        # time.sleep(0.1)
+def build_topic_classifier(entries: list[dict], cache: EmbeddingCache) -> CentroidTopicClassifier | None:
+    """
+    Fits the local topic classifier from the labelled examples file, with every
+    indexed FAQ question as an additional retail example. FAQ vectors come from
+    the embedding cache, so only the examples themselves may need embedding.
+    """
+    examples = load_topic_examples(TOPIC_EXAMPLES_PATH)
+    if not examples:
+        return None
+    example_hashes = [text_hash(text) for text, _ in examples]
+    vectors = cache.get_many(OPENAI_EMBEDDING_MODEL, example_hashes + [entry['question_hash'] for entry in entries])
+
+    missing = [i for i, key in enumerate(example_hashes) if key not in vectors]
+    if missing:
+        embeddings = get_openai_embeddings([examples[i][0] for i in missing])
+        new_items = [(example_hashes[i], embedding) for i, embedding in zip(missing, embeddings) if embedding is not None]
+        cache.put_many(OPENAI_EMBEDDING_MODEL, new_items)
+        vectors.update((key, np.asarray(embedding, dtype='float32')) for key, embedding in new_items)
 
-    print(f"\nSuccessfully generated embeddings for {len(embeddings_list)} FAQs.")
+    retail, other = [], []
+    for (_, label), key in zip(examples, example_hashes):
+        if key in vectors:
+            (retail if label == RETAIL_LABEL else other).append(vectors[key])
+    retail.extend(vectors[entry['question_hash']] for entry in entries if entry['question_hash'] in vectors)
+    if not retail or not other:
+        print("Topic classifier needs embedded examples of both classes; skipping it.")
+        return None
+    print(f"Built topic classifier from {len(retail)} retail and {len(other)} non-retail examples.")
+    return CentroidTopicClassifier.build(
+        np.vstack(retail), np.vstack(other),
+        config.TOPIC_CLASSIFIER_UNCERTAINTY_LOW, config.TOPIC_CLASSIFIER_UNCERTAINTY_HIGH
+    )
+
+def group_by_tenant(entries: list[dict]) -> dict[str, list[dict]]:
+    """FAQ entries per tenant, in first-seen order; entries whose tenant is not a valid name are skipped."""
+    shards = {}
+    for entry in entries:
+        shards.setdefault(entry['tenant'], []).append(entry)
+    for tenant in [tenant for tenant in shards if not is_valid_tenant(tenant)]:
+        print(f"Skipping {len(shards.pop(tenant))} FAQ entries of tenant '{tenant}': not a valid tenant name "
+              "(letters, digits, '.', '_' and '-', up to 64 characters).")
+    return shards
+
+def build_index(entries: list[dict], output_dir: str, args) -> bool:
+    """Embeds `entries` and publishes them as a new index generation in `output_dir`; returns whether it was published."""
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Using output directory: {output_dir}")
+
+    # --- 2. Plan the Build (full, or diff against the previous one) ---
+    plan = None
+    if args.incremental:
+        index, previous_data = load_previous_build(output_dir)
+        if index is not None:
+            plan = plan_incremental_build(index, previous_data, entries)
+        if plan is None:
+            print("Falling back to a full rebuild.")
+
+    if plan is None:
+        # Inner product on normalized vectors (cosine similarity), wrapped in an
+        # ID map so later incremental builds can remove entries by id
+        index = create_faiss_index(args.index_type, VECTOR_DIMENSION, len(entries))
+        ids = list(range(len(entries))) # Simple sequential IDs
+        to_embed = list(range(len(entries)))
+        kept = set()
+    else:
+        ids, to_embed, kept = plan
+
+    # --- 3. Generate Embeddings and Stream Them into the FAISS Index ---
+    cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+    try:
+        added = embed_and_add(index, entries, ids, to_embed, cache)
+        topic_classifier = build_topic_classifier(entries, cache)
+    except Exception as e:
+        print(f"Error building FAISS index: {e}")
+        return False
+    finally:
+        cache.close()
+
+    failed_count = len(to_embed) - len(added)
     if failed_count > 0:
         print(f"Failed to generate embeddings for {failed_count} FAQs.")
 
-    if not embeddings_list:
+    if index.ntotal == 0:
         print("No embeddings were generated. Cannot build FAISS index.")
-        return
+        return False
+    print(f"FAISS index built successfully. Index contains {index.ntotal} vectors.")
+
+    faq_data_for_lookup = [
+        {
+            'id': ids[p],
+            'question': entry['question'],
+            'answer': entry['answer'],
+            'source_key': entry['source_key'],
+            'question_hash': entry['question_hash'],
+            'tenant': entry['tenant']
+        }
+        for p, entry in enumerate(entries)
+        if p in kept or p in added
+    ]
+
+    # --- 4. Save Data and Index as a New Generation ---
+    # The files get generation-suffixed names, so nothing a running app has open is
+    # touched; the manifest swap at the end publishes them all at once.
+    generation = next_generation(output_dir, FAISS_BASE_NAME)
+    paths = generation_paths(output_dir, FAISS_BASE_NAME, generation)
+
+    def write_data(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(faq_data_for_lookup, f, ensure_ascii=False, indent=2)
 
-    # --- 3. Build FAISS Index ---
-    print("\nBuilding FAISS index...")
     try:
-        embeddings_np = np.array(embeddings_list).astype('float32')
-        
-        # Normalize vectors (important for cosine similarity / IndexFlatIP)
-        # OpenAI embeddings are typically pre-normalized, but good practice to ensure
-        faiss.normalize_L2(embeddings_np)
-        
-        # Use IndexFlatIP for cosine similarity (Inner Product on normalized vectors)
-        index = faiss.IndexFlatIP(VECTOR_DIMENSION)
-        
-        # Add vectors to the index
-        index.add(embeddings_np)
-        
-        print(f"FAISS index built successfully. Index contains {index.ntotal} vectors.")
+        print(f"Saving FAQ text data to: {paths['data']}")
+        write_atomically(paths['data'], write_data)
+        # Columnar copy the app memory-maps; the JSON stays the source for incremental diffs
+        print(f"Saving memory-mappable FAQ metadata to: {paths['metadata']}")
+        write_atomically(paths['metadata'], lambda path: write_faq_metadata(path, faq_data_for_lookup))
+        print("FAQ text data saved successfully.")
     except Exception as e:
-        print(f"Error building FAISS index: {e}")
-        return
+        print(f"Error saving FAQ text data: {e}")
+        return False
 
-    # --- 4. Save Index and Data ---
     try:
-        print(f"Saving FAISS index to: {FAISS_INDEX_PATH}")
-        faiss.write_index(index, FAISS_INDEX_PATH)
+        print(f"Saving FAISS index to: {paths['index']}")
+        write_atomically(paths['index'], lambda path: faiss.write_index(index, path))
         print("FAISS index saved successfully.")
     except Exception as e:
         print(f"Error saving FAISS index: {e}")
-        # Continue to try saving text data even if index saving fails
+        return False
+
+    if topic_classifier is not None:
+        try:
+            topic_classifier.save(paths['topic_classifier'])
+            print(f"Topic classifier saved to: {paths['topic_classifier']}")
+        except Exception as e:
+            print(f"Error saving topic classifier: {e}")
+            topic_classifier = None
+    if topic_classifier is None:
+        paths['topic_classifier'] = None
 
+    # BM25 index for hybrid retrieval and the exact-match fast path; without it the app searches FAISS only
     try:
-        print(f"Saving FAQ text data to: {FAQ_DATA_PATH}")
-        with open(FAQ_DATA_PATH, 'w', encoding='utf-8') as f:
-            json.dump(faq_data_for_lookup, f, ensure_ascii=False, indent=2)
-        print("FAQ text data saved successfully.")
+        write_atomically(paths['lexical'], lambda path: write_lexical_index(path, faq_data_for_lookup))
+        print(f"Lexical index saved to: {paths['lexical']}")
     except Exception as e:
-        print(f"Error saving FAQ text data: {e}")
+        print(f"Error saving lexical index: {e}")
+        paths['lexical'] = None
+
+    # Each build writes generation-suffixed files and then publishes them through the manifest (see index_manifest.py)
+    manifest_file = manifest_path(output_dir, FAISS_BASE_NAME)
+    try:
+        write_manifest(manifest_file, generation, paths, index_type=get_index_type(index), vectors=index.ntotal)
+        print(f"Published index generation {generation} via {manifest_file}.")
+    except Exception as e:
+        print(f"Error writing index manifest: {e}")
+        return False
+
+    for path in prune_generations(output_dir, FAISS_BASE_NAME, generation, KEEP_GENERATIONS):
+        print(f"Removed old index file: {path}")
+    return True
+
+def main(argv=None):
+    """
+    Main function to load FAQs, generate embeddings, build a FAISS index,
+    and save the index and corresponding text data.
+    """
+    parser = argparse.ArgumentParser(description="Build the FAQ FAISS index.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Diff against the previous build and only embed new or changed FAQs.")
+    parser.add_argument("--index-type", default=os.getenv("FAISS_INDEX_TYPE", config.FAISS_INDEX_TYPE),
+                        choices=("auto",) + INDEX_TYPES,
+                        help="FAISS backend for full builds; incremental builds keep the previous backend.")
+    parser.add_argument("--by-tenant", action="store_true",
+                        help=f"Build one index shard per tenant (the FAQ's '{TENANT_FIELD}' field) under {os.path.join(FAISS_DIR_NAME, 'tenants')}/.")
+    parser.add_argument("--tenant", action="append", dest="tenants", metavar="TENANT",
+                        help="With --by-tenant, only rebuild this tenant's shard (repeatable).")
+    args = parser.parse_args(argv)
+
+    print(f"Starting FAISS FAQ indexing process from file: {FAQ_FILE_PATH}")
+
+    # --- 1. Load FAQ Data ---
+    entries = load_faq_entries(FAQ_FILE_PATH)
+    if not entries:
+        print("No valid FAQ entries to index, exiting.")
+        return
+
+    if not args.by_tenant:
+        build_index(entries, OUTPUT_DIR, args)
+        print("\nFAQ indexing process finished.")
+        return
 
-    print("\nFAQ indexing process finished.")
+    shards = group_by_tenant(entries)
+    if args.tenants:
+        for tenant in args.tenants:
+            if tenant not in shards:
+                print(f"No FAQ entries for tenant '{tenant}'; its shard is left as it is.")
+        shards = {tenant: shard for tenant, shard in shards.items() if tenant in args.tenants}
+    published = 0
+    for tenant, shard in shards.items():
+        print(f"\n=== Tenant '{tenant}': {len(shard)} FAQ entries ===")
+        published += build_index(shard, tenant_dir(OUTPUT_DIR, tenant), args)
+    print(f"\nFAQ indexing process finished: {published} of {len(shards)} tenant shards published.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
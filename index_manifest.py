@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import time
+
+from telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# Every build of index_faq.py writes a new *generation* of files with a `.gNNNNNN`
+# suffix, then publishes it by atomically replacing the manifest:
+#
+#   faq-index_manifest.json            {"generation": 3, "files": {"index": "faq-index.g000003.faiss", ...}}
+#   faq-index.g000003.faiss
+#   faq-index_data.g000003.json / .bin
+#   faq-index_topic_classifier.g000003.npz
+#   faq-index_lexical.g000003.bin
+#
+# Readers only ever follow the manifest, so they see either the old or the new
+# generation, never a mix. Builds that predate the manifest use the unsuffixed names.
+#
+# Multi-tenant builds (index_faq.py --by-tenant) write one such build per tenant,
+# each with its own manifest and generations, under <output dir>/tenants/<tenant>/.
+MANIFEST_FORMAT = 1
+TENANTS_DIR_NAME = "tenants"
+# Tenant names become directory names, so they are restricted to a safe character set
+_TENANT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+# File key in the manifest -> (name suffix, extension), matching the FAISSVectorStore path arguments
+GENERATION_FILES = {
+    'index': ("", "faiss"),
+    'data': ("_data", "json"),
+    'metadata': ("_data", "bin"),
+    'topic_classifier': ("_topic_classifier", "npz"),
+    'lexical': ("_lexical", "bin")
+}
+
+def manifest_path(output_dir: str, base_name: str) -> str:
+    return os.path.join(output_dir, f"{base_name}_manifest.json")
+
+def generation_file_name(base_name: str, generation: int, suffix: str, extension: str) -> str:
+    return f"{base_name}{suffix}.g{generation:06d}.{extension}"
+
+def generation_paths(output_dir: str, base_name: str, generation: int) -> dict:
+    """Paths of every file of one generation, keyed like the manifest's "files"."""
+    return {
+        key: os.path.join(output_dir, generation_file_name(base_name, generation, suffix, extension))
+        for key, (suffix, extension) in GENERATION_FILES.items()
+    }
+
+def legacy_paths(output_dir: str, base_name: str) -> dict:
+    """The fixed file names used before generations were introduced."""
+    return {key: os.path.join(output_dir, f"{base_name}{suffix}.{extension}") for key, (suffix, extension) in GENERATION_FILES.items()}
+
+def is_valid_tenant(tenant) -> bool:
+    return isinstance(tenant, str) and bool(_TENANT_NAME.match(tenant)) and ".." not in tenant
+
+def tenant_dir(output_dir: str, tenant: str) -> str:
+    """Directory of a tenant's build; raises ValueError for names that are not safe as a directory."""
+    if not is_valid_tenant(tenant):
+        raise ValueError(f"Invalid tenant name: {tenant!r}")
+    return os.path.join(output_dir, TENANTS_DIR_NAME, tenant)
+
+def list_tenants(output_dir: str, base_name: str) -> list[str]:
+    """Tenants with a published build under `output_dir`, sorted."""
+    root = os.path.join(output_dir, TENANTS_DIR_NAME)
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names
+                  if is_valid_tenant(name) and os.path.exists(manifest_path(os.path.join(root, name), base_name)))
+
+def build_size_bytes(output_dir: str, base_name: str) -> int:
+    """
+    Size of the files a store loads for the current build in `output_dir`: the
+    JSON data file only counts when there is no memory-mappable metadata file.
+    """
+    paths, _ = resolve_build_paths(output_dir, base_name)
+    if paths['metadata'] and os.path.exists(paths['metadata']):
+        paths['data'] = None
+    return sum(os.path.getsize(path) for path in paths.values() if path and os.path.exists(path))
+
+def write_atomically(path: str, write_fn):
+    """Writes via a temporary file in the same directory, then renames it over `path`."""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def read_manifest(path: str) -> dict | None:
+    """Returns the manifest, or None if there is none (or it cannot be read)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"Could not read index manifest {path}: {e}")
+        return None
+    if manifest.get('format') != MANIFEST_FORMAT or 'generation' not in manifest:
+        logger.error(f"Ignoring index manifest {path} with unsupported format {manifest.get('format')}.")
+        return None
+    return manifest
+
+def write_manifest(path: str, generation: int, files: dict, **details):
+    """
+    Publishes a generation. `files` maps manifest keys to paths (None for
+    optional files that were not written); they are stored relative to the
+    manifest's directory.
+    """
+    directory = os.path.dirname(path)
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'generation': generation,
+        'created_at': time.time(),
+        'files': {key: os.path.relpath(file_path, directory) if file_path else None for key, file_path in files.items()},
+        **details
+    }
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+
+    write_atomically(path, write)
+    return manifest
+
+def manifest_version(manifest: dict) -> str:
+    """Identifies a published generation; changes on every build even if generation numbers restart."""
+    return f"g{manifest['generation']}-{int(manifest.get('created_at', 0) * 1000)}"
+
+def resolve_manifest_paths(manifest: dict, manifest_file: str) -> dict:
+    """Absolute paths of the generation a manifest points at (None for files it does not have)."""
+    directory = os.path.dirname(manifest_file)
+    files = manifest.get('files', {})
+    return {key: os.path.join(directory, files[key]) if files.get(key) else None for key in GENERATION_FILES}
+
+def resolve_build_paths(output_dir: str, base_name: str) -> tuple[dict, dict | None]:
+    """The current build's file paths and its manifest; the legacy fixed names (and None) without one."""
+    path = manifest_path(output_dir, base_name)
+    manifest = read_manifest(path)
+    if manifest is None:
+        return legacy_paths(output_dir, base_name), None
+    return resolve_manifest_paths(manifest, path), manifest
+
+def next_generation(output_dir: str, base_name: str) -> int:
+    manifest = read_manifest(manifest_path(output_dir, base_name))
+    return manifest['generation'] + 1 if manifest else 1
+
+def prune_generations(output_dir: str, base_name: str, current_generation: int, keep: int) -> list[str]:
+    """
+    Deletes the files of generations older than the newest `keep` (the current one
+    included) and the legacy unsuffixed files the manifest supersedes. Newer
+    generations are left alone, since another build may still be writing them.
+
+    Processes still serving a deleted generation are unaffected on POSIX: open and
+    memory-mapped files stay readable until they are closed.
+    """
+    pattern = re.compile(rf"^{re.escape(base_name)}(?:_[A-Za-z0-9_]+)?\.g(\d+)\.[A-Za-z0-9]+$")
+    removed = []
+    candidates = []
+    for name in os.listdir(output_dir):
+        match = pattern.match(name)
+        if match and int(match.group(1)) <= current_generation - max(1, keep):
+            candidates.append(name)
+    candidates.extend(os.path.basename(path) for path in legacy_paths(output_dir, base_name).values())
+    for name in candidates:
+        path = os.path.join(output_dir, name)
+        if not os.path.exists(path):
+            continue
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError as e:
+            logger.warning(f"Could not remove old index file {path}: {e}")
+    return removed
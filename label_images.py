@@ -0,0 +1,398 @@
+"""
+Bulk image labeling: describes every image with OpenAI Vision and tags it with
+Amazon Rekognition, using the same prompts, preprocessing and settings as the app.
+Both services are called concurrently for each image, with the app's timeouts.
+
+    python label_images.py catalog/ --output labels.jsonl
+    python label_images.py images.jsonl --output labels.parquet --workers 16 --vision-rps 10
+    python label_images.py catalog/ --output labels.jsonl --stand-ins    # local fake services, no API costs
+
+The source is a directory (searched recursively for images) or a JSONL manifest
+of {"path": ..., "id": ...} lines, with paths relative to the manifest. Each
+image is keyed by its manifest id, or else its path relative to the source.
+
+Results stream to JSONL, or with a .parquet output (needs pyarrow) to a
+directory of Parquet part files. The output doubles as the checkpoint: a rerun
+with the same output skips every image already recorded there, so a crashed
+job resumes where it stopped (--retry-errors also redoes images that failed).
+With --retry-errors an image can appear more than once; the last record wins.
+"""
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import config
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+BACKENDS = ("vision", "rekognition")
+
+# Output columns; also the Parquet schema
+RESULT_FIELDS = (
+    ("key", "string"),
+    ("path", "string"),
+    ("sha256", "string"),
+    ("width", "int64"),
+    ("height", "int64"),
+    ("description", "string"),
+    ("tags", "list<string>"),
+    ("tag_confidences", "list<double>"),
+    ("vision_error", "string"),
+    ("rekognition_error", "string"),
+    ("vision_input_tokens", "int64"),
+    ("vision_output_tokens", "int64"),
+    ("seconds", "double"),
+    ("processed_at", "double")
+)
+
+class TokenBucket:
+    """
+    Blocking rate limiter shared by all workers: `rate` acquisitions per second
+    on average, with bursts of up to `burst`. A rate of 0 disables limiting.
+    """
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = max(1.0, burst if burst is not None else rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # Take the token even if it is not there yet; the debt is slept off outside the lock
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+def iter_source_items(source: str):
+    """Yields {'key', 'path'} for each image of a directory or JSONL manifest, in a stable order."""
+    if os.path.isdir(source):
+        for directory, subdirectories, files in os.walk(source):
+            subdirectories.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(directory, name)
+                    yield {'key': os.path.relpath(path, source).replace(os.sep, "/"), 'path': path}
+        return
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                path = entry['path']
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                print(f"Skipping manifest line {line_number}: {e}")
+                continue
+            key = entry['id'] if entry.get('id') is not None else path
+            yield {'key': str(key), 'path': os.path.join(base_dir, path)}
+
+class JsonlResultWriter:
+    """Appends one JSON line per result; flushed per line and fsynced every `checkpoint_every` lines."""
+    def __init__(self, path: str, checkpoint_every: int):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self._file = open(path, 'a', encoding='utf-8')
+        self._unsynced = 0
+
+    @staticmethod
+    def read_existing(path: str) -> list[dict]:
+        """Records already in the output. A torn last line from a crash is cut off so appends stay valid."""
+        if not os.path.exists(path):
+            return []
+        records = []
+        valid_size = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                valid_size += len(line)
+        if valid_size < os.path.getsize(path):
+            print(f"Truncating an incomplete record at the end of {path}.")
+            with open(path, 'r+b') as f:
+                f.truncate(valid_size)
+        return records
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.checkpoint_every:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+class ParquetResultWriter:
+    """
+    Writes results as a directory of Parquet part files (readable with
+    pandas.read_parquet or pyarrow.dataset), one complete part per
+    `checkpoint_every` results. Parts are renamed into place once written,
+    so a crash loses at most the results since the last part.
+    """
+    def __init__(self, path: str, checkpoint_every: int):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa, self._pq = pa, pq
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        types = {"string": pa.string(), "int64": pa.int64(), "double": pa.float64(),
+                 "list<string>": pa.list_(pa.string()), "list<double>": pa.list_(pa.float64())}
+        self.schema = pa.schema([(name, types[type_name]) for name, type_name in RESULT_FIELDS])
+        os.makedirs(path, exist_ok=True)
+        existing = [name for name in os.listdir(path) if name.startswith("part-") and name.endswith(".parquet")]
+        self._next_part = max((int(name[5:10]) for name in existing), default=-1) + 1
+        self._buffer = []
+
+    @staticmethod
+    def read_existing(path: str) -> list[dict]:
+        if not os.path.isdir(path):
+            return []
+        import pyarrow.parquet as pq
+
+        records = []
+        for name in sorted(os.listdir(path)):
+            if name.startswith("part-") and name.endswith(".parquet"):
+                records.extend(pq.read_table(os.path.join(path, name), columns=["key", "vision_error", "rekognition_error"]).to_pylist())
+        return records
+
+    def write(self, record: dict):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.checkpoint_every:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        part_path = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        tmp_path = f"{part_path}.tmp-{os.getpid()}"
+        self._pq.write_table(self._pa.Table.from_pylist(self._buffer, schema=self.schema), tmp_path)
+        os.replace(tmp_path, part_path)
+        self._next_part += 1
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+
+def open_result_writer(path: str, checkpoint_every: int):
+    """The writer class for the output path; exits with a hint if pyarrow is missing."""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow); use a .jsonl output instead.")
+        return ParquetResultWriter
+    return JsonlResultWriter
+
+def start_stand_ins(latency: float) -> dict:
+    """
+    Starts the local fake OpenAI and Rekognition services from benchmarks/ and points
+    the clients at them. Must run before the service modules are imported.
+    """
+    from benchmarks.fake_openai_server import create_server as create_openai_server
+    from benchmarks.fake_rekognition_server import create_server as create_rekognition_server
+
+    servers = {'openai': create_openai_server(port=0, latency=latency), 'rekognition': create_rekognition_server(port=0, latency=latency)}
+    for server in servers.values():
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update({
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{servers['openai'].server_port}/v1",
+        'OPENAI_API_KEY': "fake",
+        'REKOGNITION_ENDPOINT_URL': f"http://127.0.0.1:{servers['rekognition'].server_port}",
+        'AWS_ACCESS_KEY_ID': "fake",
+        'AWS_SECRET_ACCESS_KEY': "fake"
+    })
+    print(f"Using local stand-in services (OpenAI on port {servers['openai'].server_port}, "
+          f"Rekognition on port {servers['rekognition'].server_port}).")
+    return servers
+
+def estimate_cost(totals: dict) -> dict:
+    vision = (totals['vision_input_tokens'] * config.VISION_INPUT_COST_PER_1M_TOKENS
+              + totals['vision_output_tokens'] * config.VISION_OUTPUT_COST_PER_1M_TOKENS) / 1_000_000
+    rekognition = totals['rekognition_ok'] * config.REKOGNITION_COST_PER_1K_IMAGES / 1000
+    return {'vision_usd': vision, 'rekognition_usd': rekognition, 'total_usd': vision + rekognition}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Describe and tag a directory or manifest of images in bulk.")
+    parser.add_argument("source", help="Directory of images, or a JSONL manifest of {\"path\", \"id\"} lines.")
+    parser.add_argument("--output", required=True, help="Results file (.jsonl) or Parquet dataset directory (.parquet).")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--workers", type=int, default=config.BULK_LABEL_WORKERS, help="Images processed concurrently.")
+    parser.add_argument("--vision-rps", type=float, default=config.BULK_VISION_REQUESTS_PER_SECOND,
+                        help="Max OpenAI Vision requests per second (0 = unlimited).")
+    parser.add_argument("--rekognition-rps", type=float, default=config.BULK_REKOGNITION_REQUESTS_PER_SECOND,
+                        help="Max Rekognition requests per second (0 = unlimited).")
+    parser.add_argument("--timeout", type=float, default=config.IMAGE_ANALYSIS_TIMEOUT_SECONDS,
+                        help="Seconds each service may take per image before it counts as an error.")
+    parser.add_argument("--checkpoint-every", type=int, default=config.BULK_CHECKPOINT_EVERY,
+                        help="Make results durable every this many images.")
+    parser.add_argument("--retry-errors", action="store_true", help="Also reprocess images whose earlier record has an error.")
+    parser.add_argument("--limit", type=int, default=0, help="Process at most this many new images.")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines.")
+    parser.add_argument("--summary-json", help="Also write the run summary to this file.")
+    parser.add_argument("--stand-ins", action="store_true", help="Run against local fake OpenAI and Rekognition services.")
+    parser.add_argument("--stand-in-latency", type=float, default=0.05, help="Per-request latency of the stand-ins, in seconds.")
+    args = parser.parse_args(argv)
+
+    if args.stand_ins:
+        start_stand_ins(args.stand_in_latency)
+    # Imported here so --stand-ins can point the service clients at the fakes first
+    from PIL import Image
+    from image_analysis import start_image_analysis
+    from image_cache import image_hash
+    from image_preprocessing import prepare_image, vision_image_tokens
+    from openai_service import estimate_token_count, get_openai_vision_description_with_usage
+    from rekognition_service import get_image_labels
+
+    writer_class = open_result_writer(args.output, args.checkpoint_every)
+    done = {}
+    for record in writer_class.read_existing(args.output):
+        done[record['key']] = not (record.get('vision_error') or record.get('rekognition_error'))
+    skip = {key for key, ok in done.items() if ok or not args.retry_errors}
+    skipped = len(skip)
+    if done:
+        print(f"Resuming: {len(done)} images already in {args.output}, skipping {skipped}.")
+
+    limiters = {'vision': TokenBucket(args.vision_rps), 'rekognition': TokenBucket(args.rekognition_rps)}
+    detail = config.DEFAULT_VISION_DETAIL
+    prompt_tokens = estimate_token_count(config.APP_VISION_PROMPT)
+    # Every worker can have both of its image's service calls running at once
+    backend_pool = ThreadPoolExecutor(max_workers=args.workers * len(args.backends), thread_name_prefix="label-backends")
+
+    def describe_image(image):
+        description, usage = get_openai_vision_description_with_usage(image.vision_bytes, prompt=config.APP_VISION_PROMPT,
+                                                                      detail=detail, mime_type=image.vision_mime_type)
+        if not description:
+            raise RuntimeError("OpenAI Vision could not generate a description.")
+        return description, usage
+
+    backends = {
+        'vision': describe_image,
+        'rekognition': lambda image: get_image_labels(image.rekognition_bytes).get('Labels', [])
+    }
+
+    def label_image(item: dict) -> dict:
+        started = time.perf_counter()
+        record = {name: None for name, _ in RESULT_FIELDS}
+        record.update(key=item['key'], path=item['path'])
+        try:
+            with open(item['path'], 'rb') as f:
+                image_bytes = f.read()
+        except OSError as e:
+            record['vision_error'] = record['rekognition_error'] = f"Could not read image: {e}"
+            record.update(seconds=time.perf_counter() - started, processed_at=time.time())
+            return record
+        record['sha256'] = image_hash(image_bytes)
+        try:
+            record['width'], record['height'] = Image.open(io.BytesIO(image_bytes)).size
+        except Exception:
+            pass # prepare_image falls back to the original bytes; the services decide
+        prepared = prepare_image(image_bytes, detail=detail)
+
+        # Rate limits are waited out before the run starts, so the timeout only covers the service call
+        for name in args.backends:
+            limiters[name].acquire()
+        run = start_image_analysis(prepared, {name: backends[name] for name in args.backends}, args.timeout, executor=backend_pool)
+        for name, result, error in run.results():
+            if error is not None:
+                record[f"{name}_error"] = str(error)
+            elif name == "vision":
+                record['description'], usage = result
+                # Token counts from the response; estimated only when it reports no usage
+                if usage is not None:
+                    record['vision_input_tokens'] = usage.prompt_tokens
+                    record['vision_output_tokens'] = usage.completion_tokens
+                else:
+                    if record['width']:
+                        record['vision_input_tokens'] = vision_image_tokens(record['width'], record['height'], detail) + prompt_tokens
+                    record['vision_output_tokens'] = estimate_token_count(record['description'])
+            else:
+                record['tags'] = [label['Name'] for label in result]
+                record['tag_confidences'] = [float(label['Confidence']) for label in result]
+        record.update(seconds=time.perf_counter() - started, processed_at=time.time())
+        return record
+
+    totals = {'images': 0, 'vision_ok': 0, 'vision_errors': 0, 'rekognition_ok': 0, 'rekognition_errors': 0,
+              'vision_input_tokens': 0, 'vision_output_tokens': 0}
+    writer = writer_class(args.output, args.checkpoint_every)
+    started = time.perf_counter()
+    last_progress = started
+
+    def record_result(record: dict):
+        writer.write(record)
+        totals['images'] += 1
+        for backend in args.backends:
+            totals[f"{backend}_errors" if record[f"{backend}_error"] else f"{backend}_ok"] += 1
+        totals['vision_input_tokens'] += record['vision_input_tokens'] or 0
+        totals['vision_output_tokens'] += record['vision_output_tokens'] or 0
+
+    def print_progress():
+        elapsed = time.perf_counter() - started
+        print(f"Processed {totals['images']} images in {elapsed:.1f}s ({totals['images'] / elapsed:.2f} images/sec), "
+              f"errors: vision {totals['vision_errors']}, rekognition {totals['rekognition_errors']}, "
+              f"estimated cost ${estimate_cost(totals)['total_usd']:.4f}")
+
+    # At most two images per worker are queued at a time, so memory stays flat however large the source is
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="label-images") as pool:
+            pending = set()
+            submitted = 0
+            for item in iter_source_items(args.source):
+                if item['key'] in skip:
+                    continue
+                if args.limit and submitted >= args.limit:
+                    break
+                skip.add(item['key']) # Duplicate keys in a manifest are processed once
+                pending.add(pool.submit(label_image, item))
+                submitted += 1
+                while len(pending) >= 2 * args.workers:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record_result(future.result())
+                if time.perf_counter() - last_progress >= args.progress_interval:
+                    print_progress()
+                    last_progress = time.perf_counter()
+            for future in pending:
+                record_result(future.result())
+    finally:
+        writer.close()
+        backend_pool.shutdown(wait=False)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        **totals,
+        'skipped': skipped,
+        'seconds': elapsed,
+        'images_per_second': totals['images'] / elapsed if elapsed > 0 else 0.0,
+        'estimated_cost': estimate_cost(totals)
+    }
+    print_progress()
+    cost = summary['estimated_cost']
+    print(f"Estimated cost: vision ${cost['vision_usd']:.4f} ({totals['vision_input_tokens']} input / "
+          f"{totals['vision_output_tokens']} output tokens), rekognition ${cost['rekognition_usd']:.4f} "
+          f"({totals['rekognition_ok']} images), total ${cost['total_usd']:.4f}.")
+    print(f"Results written to {args.output}.")
+    if args.summary_json:
+        with open(args.summary_json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import hashlib
+import mmap
+import re
+import struct
+import unicodedata
+import numpy as np
+
+from embedding_cache import normalize_query
+
+# BM25 inverted index over FAQ questions and answers, in one memory-mappable file.
+# Terms are stored as 64-bit hashes (looked up by binary search), so the file holds
+# no vocabulary strings. Layout (little endian), every section aligned to 8 bytes:
+#   header:           MAGIC, doc_count (u64), term_count (u64), posting_count (u64), avg_doc_length (f64), k1 (f64), b (f64)
+#   doc_ids:          int64[doc_count]          vector id of each document row
+#   doc_lengths:      float32[doc_count]        weighted token count of each row
+#   question_keys:    uint64[doc_count]         hashes of the normalized questions, sorted
+#   question_rows:    int64[doc_count]          row of each question_keys entry
+#   term_hashes:      uint64[term_count]        sorted
+#   term_idf:         float32[term_count]
+#   posting_offsets:  uint64[term_count + 1]    term i's postings are [off[i], off[i + 1])
+#   posting_rows:     uint32[posting_count]     document rows, ascending within a term
+#   posting_tfs:      float32[posting_count]    weighted term frequency in that row
+MAGIC = b"FAQBM25A"
+HEADER = struct.Struct("<8sQQQddd")
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+# Question tokens count this many times: they are what a query usually paraphrases
+QUESTION_WEIGHT = 2.0
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can could do does did for from had has have how i if in is it its me my of on or our
+please should so that the their them there these this those to was we were what when where which who why will with
+would you your
+""".split())
+
+# Words, numbers and joined codes such as "ab-1234", "v2.1" or "10/2024"
+_TOKEN = re.compile(r"[^\W_]+(?:[-./][^\W_]+)*")
+
+def _pad(size: int) -> int:
+    return (size + 7) & ~7
+
+def tokenize(text: str) -> list[str]:
+    """
+    Case- and accent-insensitive tokens with stopwords removed. A joined code
+    such as an SKU is kept whole and also split into its parts, so "AB-1234"
+    matches both "ab-1234" and "1234".
+    """
+    tokens = []
+    for match in _TOKEN.finditer(unicodedata.normalize("NFKC", text).casefold()):
+        token = match.group()
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in re.split(r"[-./]", token) if part and part not in STOPWORDS)
+    return tokens
+
+def term_hash(term: str) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+def question_key(question: str) -> int:
+    """Hash of a question in the same normalized form the query caches use."""
+    return term_hash(normalize_query(question))
+
+def _idf(doc_count: int, doc_frequency: np.ndarray | int) -> np.ndarray:
+    return np.log1p((doc_count - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+def write_lexical_index(path: str, records: list[dict], k1: float = DEFAULT_K1, b: float = DEFAULT_B):
+    """Builds the BM25 index for FAQ records ({'id', 'question', 'answer', ...}) and writes it to `path`."""
+    postings = {} # term hash -> ([rows], [weighted tf])
+    doc_lengths = np.zeros(len(records), dtype="<f4")
+    for row, record in enumerate(records):
+        frequencies = {}
+        for token in tokenize(record.get('question', '')):
+            frequencies[token] = frequencies.get(token, 0.0) + QUESTION_WEIGHT
+        for token in tokenize(record.get('answer', '')):
+            frequencies[token] = frequencies.get(token, 0.0) + 1.0
+        doc_lengths[row] = sum(frequencies.values())
+        for token, frequency in frequencies.items():
+            rows, tfs = postings.setdefault(term_hash(token), ([], []))
+            rows.append(row)
+            tfs.append(frequency)
+
+    term_hashes = np.array(sorted(postings), dtype="<u8")
+    counts = np.array([len(postings[h][0]) for h in term_hashes.tolist()], dtype="<u8")
+    posting_offsets = np.zeros(len(term_hashes) + 1, dtype="<u8")
+    np.cumsum(counts, out=posting_offsets[1:])
+    posting_rows = np.fromiter((row for h in term_hashes.tolist() for row in postings[h][0]), dtype="<u4", count=int(posting_offsets[-1]))
+    posting_tfs = np.fromiter((tf for h in term_hashes.tolist() for tf in postings[h][1]), dtype="<f4", count=int(posting_offsets[-1]))
+    term_idf = _idf(len(records), counts.astype(np.float64)).astype("<f4")
+
+    doc_ids = np.array([record['id'] for record in records], dtype="<i8")
+    keys = np.array([question_key(record.get('question', '')) for record in records], dtype="<u8")
+    order = np.argsort(keys, kind="stable")
+    question_keys, question_rows = keys[order], order.astype("<i8")
+    avg_doc_length = float(doc_lengths.mean()) if len(records) else 0.0
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records), len(term_hashes), len(posting_rows), avg_doc_length, k1, b))
+        for section in (doc_ids, doc_lengths, question_keys, question_rows, term_hashes, term_idf,
+                        posting_offsets, posting_rows, posting_tfs):
+            f.write(section.tobytes())
+            f.write(b"\0" * (_pad(section.nbytes) - section.nbytes))
+
+class LexicalIndex:
+    """
+    BM25 index opened with mmap: postings are zero-copy array views, so opening
+    it is cheap at any corpus size and only the postings of query terms are read.
+    """
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, doc_count, term_count, posting_count, self.avg_doc_length, self.k1, self.b = HEADER.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a lexical index file")
+            position = HEADER.size
+            self.doc_ids, position = self._view(position, "<i8", doc_count)
+            self.doc_lengths, position = self._view(position, "<f4", doc_count)
+            self.question_keys, position = self._view(position, "<u8", doc_count)
+            self.question_rows, position = self._view(position, "<i8", doc_count)
+            self.term_hashes, position = self._view(position, "<u8", term_count)
+            self.term_idf, position = self._view(position, "<f4", term_count)
+            self.posting_offsets, position = self._view(position, "<u8", term_count + 1)
+            self.posting_rows, position = self._view(position, "<u4", posting_count)
+            self.posting_tfs, position = self._view(position, "<f4", posting_count)
+        except Exception:
+            self.close()
+            raise
+
+    def _view(self, position: int, dtype: str, count: int) -> tuple[np.ndarray, int]:
+        array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=position)
+        return array, position + _pad(array.nbytes)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def exact_question(self, query: str) -> int | None:
+        """Id of the FAQ whose question is the query (up to case and punctuation), if any."""
+        key = question_key(query)
+        position = int(np.searchsorted(self.question_keys, np.uint64(key)))
+        if position < len(self.question_keys) and int(self.question_keys[position]) == key:
+            return int(self.doc_ids[self.question_rows[position]])
+        return None
+
+    def search(self, query: str, k: int) -> list[dict]:
+        """
+        Top-k documents by BM25, best first, as {'id', 'bm25_score', 'coverage'}.
+        `coverage` is the share of the query's idf weight the document contains
+        (1.0: every query term); terms absent from the corpus count against it.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not len(self):
+            return []
+        hashes = np.array([term_hash(term) for term in terms], dtype=np.uint64)
+        positions = np.searchsorted(self.term_hashes, hashes)
+        found = positions < len(self.term_hashes)
+        found[found] = self.term_hashes[positions[found]] == hashes[found]
+        unknown_idf = float(_idf(len(self), 0))
+        total_idf = float(self.term_idf[positions[found]].sum()) + unknown_idf * int((~found).sum())
+        if not found.any():
+            return []
+
+        rows, contributions, weights = [], [], []
+        for position in positions[found]:
+            start, end = int(self.posting_offsets[position]), int(self.posting_offsets[position + 1])
+            term_rows = self.posting_rows[start:end]
+            tfs = self.posting_tfs[start:end]
+            idf = float(self.term_idf[position])
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[term_rows] / max(self.avg_doc_length, 1e-9))
+            rows.append(term_rows)
+            contributions.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+            weights.append(np.full(len(term_rows), idf, dtype=np.float32))
+        # Dense accumulators over all rows: linear in the postings read, with no sort
+        all_rows = np.concatenate(rows)
+        scores = np.bincount(all_rows, weights=np.concatenate(contributions), minlength=len(self))
+        matched = np.flatnonzero(np.bincount(all_rows, minlength=len(self)))
+
+        k = min(k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        coverage = np.bincount(all_rows, weights=np.concatenate(weights), minlength=len(self))[top] / total_idf if total_idf > 0 else np.zeros(k)
+        return [
+            {'id': int(self.doc_ids[row]), 'bm25_score': float(scores[row]), 'coverage': float(min(1.0, share))}
+            for row, share in zip(top, coverage)
+        ]
+
+    def close(self):
+        # Drop the array views first; mmap.close() fails while buffers are exported
+        self.doc_ids = self.doc_lengths = self.question_keys = self.question_rows = None
+        self.term_hashes = self.term_idf = self.posting_offsets = self.posting_rows = self.posting_tfs = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass # Views still held by a caller; the mapping is released when they go away
+
+def reciprocal_rank_fusion(rankings: list[list[int]], rrf_k: int = 60) -> dict[int, float]:
+    """Fused score per id: the sum over rankings of 1 / (rrf_k + rank), with ranks from 1."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, 1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (rrf_k + rank)
+    return scores
@@ -1,51 +1,409 @@
 import os
+import atexit
 import base64
-from openai import OpenAI
-from dotenv import load_dotenv
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
 
 # Import constants from config.py
 import config
+from embedding_cache import QueryEmbeddingCache, normalize_query
+from telemetry import get_logger, Counter, Histogram, record_cache_lookup
 
-load_dotenv()
+logger = get_logger(__name__)
+
+OPENAI_REQUESTS = Counter("openai_requests_total", "OpenAI API calls by operation and outcome.")
+OPENAI_TOKENS = Counter("openai_tokens_total", "Tokens reported by the OpenAI API by operation and kind.")
+OPENAI_RETRIES = Counter("openai_retries_total", "Embedding batch retries after transient OpenAI errors.")
+OPENAI_LATENCY = Histogram("openai_request_duration_seconds", "OpenAI API call latency by operation.")
+OPENAI_TIME_TO_FIRST_TOKEN = Histogram("openai_time_to_first_token_seconds", "Time to the first streamed token by operation.")
+EMBEDDING_COALESCED_BATCH = Histogram("openai_embedding_coalesced_batch_size", "Texts per coalesced query embedding request.",
+                                      buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+EMBEDDING_COALESCED_DUPLICATES = Counter("openai_embedding_coalesced_duplicates_total", "Query embeddings served by joining an identical in-flight text.")
+EMBEDDING_COALESCE_FALLBACKS = Counter("openai_embedding_coalesce_fallbacks_total", "Query embeddings requested directly after the dispatcher timed out.")
 
 # Use constants from config.py, allowing .env to override if needed
 OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL_NAME", config.OPENAI_EMBEDDING_MODEL)
 OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL_NAME", config.OPENAI_CHAT_MODEL)
 OPENAI_VISION_MODEL = os.getenv("OPENAI_VISION_MODEL_NAME", config.OPENAI_VISION_MODEL)
+EMBEDDING_COALESCE = os.getenv("EMBEDDING_COALESCE", str(config.EMBEDDING_COALESCE)).lower() in ("1", "true")
+EMBEDDING_COALESCE_WINDOW_MS = float(os.getenv("EMBEDDING_COALESCE_WINDOW_MS", config.EMBEDDING_COALESCE_WINDOW_MS))
+EMBEDDING_COALESCE_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_COALESCE_TIMEOUT_SECONDS", config.EMBEDDING_COALESCE_TIMEOUT_SECONDS))
 
-try:
-    openai_client = OpenAI()
-    print("OpenAI client initialized.")
-except Exception as e:
-    print(f"Fatal Error: Failed to initialize OpenAI client. Check OPENAI_API_KEY. Error: {e}")
-    openai_client = None
+_openai_client = None
+_openai_client_failed = False
+_openai_client_lock = threading.Lock()
 
-def get_openai_embedding(text: str, model=OPENAI_EMBEDDING_MODEL) -> list[float] | None:
-    if not openai_client:
-        print("OpenAI client not available for embedding.")
-        return None
+def get_openai_client():
+    """
+    Returns the process-wide OpenAI client, creating it on first use, or None if
+    it cannot be created (e.g. no OPENAI_API_KEY). The `openai` package takes
+    most of a second to import, so it is only loaded once a request needs it.
+    """
+    global _openai_client, _openai_client_failed
+    if _openai_client is None and not _openai_client_failed:
+        with _openai_client_lock:
+            if _openai_client is None and not _openai_client_failed:
+                try:
+                    from openai import OpenAI
+                    _openai_client = OpenAI()
+                    logger.info("OpenAI client initialized.")
+                except Exception as e:
+                    logger.critical(f"Failed to initialize OpenAI client. Check OPENAI_API_KEY. Error: {e}")
+                    _openai_client_failed = True
+    return _openai_client
+
+def set_openai_client(client):
+    """Replaces the shared client, e.g. with a stub. Pass None to rebuild lazily."""
+    global _openai_client, _openai_client_failed
+    with _openai_client_lock:
+        _openai_client = client
+        _openai_client_failed = False
+
+def _record_call(operation: str, model: str, started_at: float, outcome: str, usage=None):
+    """Counts one API call and its latency, plus token usage when the response reports it."""
+    OPENAI_REQUESTS.inc(operation=operation, model=model, outcome=outcome)
+    OPENAI_LATENCY.observe(time.perf_counter() - started_at, operation=operation, model=model)
+    if usage is not None:
+        OPENAI_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, operation=operation, model=model, kind="prompt")
+        OPENAI_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, operation=operation, model=model, kind="completion")
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=config.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    max_bytes=config.QUERY_EMBEDDING_CACHE_MAX_BYTES,
+    ttl_seconds=config.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    persist_path=os.getenv("QUERY_EMBEDDING_CACHE_PATH", config.QUERY_EMBEDDING_CACHE_PATH) or None
+)
+if query_embedding_cache.persist_path:
+    atexit.register(query_embedding_cache.save)
+
+def get_openai_embedding(text: str, model=OPENAI_EMBEDDING_MODEL, use_cache: bool = True,
+                         coalesce: bool = EMBEDDING_COALESCE) -> list[float] | None:
+    """
+    Embedding of one query text, or None on failure. Cache misses go through the
+    shared EmbeddingDispatcher when `coalesce` is set, so concurrent callers
+    share batched requests.
+    """
     if not text or not isinstance(text, str):
-        print("Embedding Error: Input text must be a non-empty string.")
+        logger.error("Embedding Error: Input text must be a non-empty string.")
+        return None
+    cache_key = f"{model}\n{normalize_query(text)}"
+    if use_cache:
+        cached = query_embedding_cache.get(cache_key)
+        record_cache_lookup("query_embedding", cached is not None)
+        if cached is not None:
+            return cached.tolist()
+    if coalesce:
+        embedding = get_embedding_dispatcher(model).embed(text)
+        if embedding is not None and use_cache:
+            query_embedding_cache.put(cache_key, embedding)
+        return embedding
+    openai_client = get_openai_client()
+    if not openai_client:
+        logger.error("OpenAI client not available for embedding.")
         return None
+    started_at = time.perf_counter()
     try:
         text = text.replace("\n", " ")
         response = openai_client.embeddings.create(input=[text], model=model)
-        return response.data[0].embedding
+        embedding = response.data[0].embedding
+        _record_call("embedding", model, started_at, "success", getattr(response, "usage", None))
+        if use_cache:
+            query_embedding_cache.put(cache_key, embedding)
+        return embedding
     except Exception as e:
-        print(f"Error calling OpenAI embedding API (model: {model}): {e}")
+        _record_call("embedding", model, started_at, "error")
+        logger.error(f"Error calling OpenAI embedding API (model: {model}): {e}")
         return None
 
+def retryable_openai_errors() -> tuple:
+    """Errors worth retrying with backoff; anything else fails the batch immediately."""
+    from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+    return (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def estimate_token_count(text: str) -> int:
+    """Rough token estimate (~4 characters per token) used for request packing."""
+    return max(1, len(text) // 4 + 1)
+
+def pack_embedding_batches(
+    texts: list[str],
+    max_batch_size: int = config.EMBEDDING_BATCH_MAX_TEXTS,
+    max_batch_tokens: int = config.EMBEDDING_BATCH_MAX_TOKENS
+) -> list[list[int]]:
+    """
+    Groups text positions into batches that respect both the per-request
+    input count and the (estimated) per-request token limit.
+    Empty or non-string texts are left out of every batch.
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for i, text in enumerate(texts):
+        if not text or not isinstance(text, str):
+            continue
+        tokens = estimate_token_count(text)
+        if current and (len(current) >= max_batch_size or current_tokens + tokens > max_batch_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _retry_delay(error: Exception, attempt: int, base_delay: float) -> float:
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+
+def _create_embeddings_with_retry(
+    batch_texts: list[str],
+    model: str,
+    max_retries: int,
+    base_delay: float
+) -> tuple[list[list[float]], int]:
+    """Calls the embeddings endpoint for one batch, retrying transient failures with exponential backoff."""
+    # The SDK's own retries are disabled here so this loop owns the backoff policy.
+    client = get_openai_client().with_options(max_retries=0)
+    retryable_errors = retryable_openai_errors()
+    for attempt in range(max_retries + 1):
+        started_at = time.perf_counter()
+        try:
+            response = client.embeddings.create(input=batch_texts, model=model)
+            # Results carry an index field; sort on it rather than trusting response order.
+            embeddings = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            usage = getattr(response, "usage", None)
+            _record_call("embedding_batch", model, started_at, "success", usage)
+            tokens = usage.total_tokens if usage else sum(estimate_token_count(t) for t in batch_texts)
+            return embeddings, tokens
+        except retryable_errors as e:
+            _record_call("embedding_batch", model, started_at, type(e).__name__)
+            if attempt == max_retries:
+                raise
+            delay = _retry_delay(e, attempt, base_delay)
+            OPENAI_RETRIES.inc(model=model, error=type(e).__name__)
+            logger.warning(f"Embedding batch of {len(batch_texts)} failed ({type(e).__name__}), retrying in {delay:.1f}s ({attempt + 1}/{max_retries})...")
+            time.sleep(delay)
+        except Exception:
+            _record_call("embedding_batch", model, started_at, "error")
+            raise
+
+def iter_openai_embedding_batches(
+    texts: list[str],
+    model: str = OPENAI_EMBEDDING_MODEL,
+    max_batch_size: int = config.EMBEDDING_BATCH_MAX_TEXTS,
+    max_batch_tokens: int = config.EMBEDDING_BATCH_MAX_TOKENS,
+    max_workers: int = config.EMBEDDING_MAX_WORKERS,
+    max_retries: int = config.EMBEDDING_MAX_RETRIES,
+    retry_base_delay: float = config.EMBEDDING_RETRY_BASE_DELAY
+):
+    """
+    Embeds many texts with batched requests running on a bounded worker pool.
+
+    Batches are yielded as soon as they finish (not in input order) as
+    (indices, embeddings, token_count) tuples, where indices are positions in
+    `texts`. A batch that still fails after all retries is yielded with
+    embeddings set to None and a token_count of 0.
+    """
+    if not get_openai_client():
+        logger.error("OpenAI client not available for embedding.")
+        return
+    batches = pack_embedding_batches(texts, max_batch_size, max_batch_tokens)
+    if not batches:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(
+                _create_embeddings_with_retry,
+                [texts[i].replace("\n", " ") for i in indices],
+                model,
+                max_retries,
+                retry_base_delay
+            ): indices
+            for indices in batches
+        }
+        for future in as_completed(futures):
+            indices = futures[future]
+            try:
+                embeddings, tokens = future.result()
+                yield indices, embeddings, tokens
+            except Exception as e:
+                logger.error(f"Error calling OpenAI embedding API for batch of {len(indices)} texts (model: {model}): {e}")
+                yield indices, None, 0
+
+def get_openai_embeddings(texts: list[str], model=OPENAI_EMBEDDING_MODEL, **batch_options) -> list[list[float] | None]:
+    """Batched counterpart of get_openai_embedding; returns one embedding (or None) per input text, in order."""
+    results = [None] * len(texts)
+    for indices, embeddings, _ in iter_openai_embedding_batches(texts, model=model, **batch_options):
+        if embeddings is None:
+            continue
+        for i, embedding in zip(indices, embeddings):
+            results[i] = embedding
+    return results
+
+class EmbeddingDispatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batched API calls.
+
+    The first text submitted opens a window of `window_seconds`; every text
+    submitted before it closes (up to `max_batch_size` texts, or
+    `max_batch_tokens` estimated tokens) goes out in the same request, and each
+    caller gets its own result back. A text identical to one already waiting or
+    in flight joins that request instead of adding an input. At most
+    `max_in_flight` requests run at once; while they are all busy, new texts
+    keep collecting into the next batch.
+
+    `embed` waits up to `timeout_seconds` for its batch and then makes a direct
+    request instead, so a stalled dispatcher slows callers down rather than
+    hanging them. If the dispatch thread itself fails, the texts it was holding
+    resolve to None and the next submitted text starts a new thread.
+    """
+    def __init__(
+        self,
+        model: str = OPENAI_EMBEDDING_MODEL,
+        window_seconds: float = EMBEDDING_COALESCE_WINDOW_MS / 1000,
+        max_batch_size: int = config.EMBEDDING_COALESCE_MAX_BATCH,
+        max_batch_tokens: int = config.EMBEDDING_BATCH_MAX_TOKENS,
+        max_in_flight: int = config.EMBEDDING_COALESCE_MAX_IN_FLIGHT,
+        timeout_seconds: float = EMBEDDING_COALESCE_TIMEOUT_SECONDS
+    ):
+        self.model = model
+        self.timeout_seconds = timeout_seconds
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self._condition = threading.Condition()
+        self._waiting = {} # text -> Future, in arrival order, for the next batch
+        self._in_flight = {} # text -> Future, sent and not yet answered
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="embedding-dispatch")
+        self._thread = None
+
+    def submit(self, text: str) -> Future:
+        """Queues `text` and returns a Future of its embedding (None if the request fails)."""
+        text = text.replace("\n", " ")
+        with self._condition:
+            future = self._waiting.get(text) or self._in_flight.get(text)
+            if future is not None:
+                EMBEDDING_COALESCED_DUPLICATES.inc(model=self.model)
+                return future
+            future = self._waiting[text] = Future()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-dispatcher", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def embed(self, text: str) -> list[float] | None:
+        try:
+            return self.submit(text).result(timeout=self.timeout_seconds)
+        except FuturesTimeoutError:
+            EMBEDDING_COALESCE_FALLBACKS.inc(model=self.model)
+            logger.warning(f"Coalesced embedding did not arrive within {self.timeout_seconds:g}s (model: {self.model}); requesting it directly.")
+            return get_openai_embedding(text, model=self.model, use_cache=False, coalesce=False)
+
+    def _run(self):
+        batch, holds_slot = [], False
+        try:
+            while True:
+                with self._condition:
+                    while not self._waiting:
+                        self._condition.wait()
+                    deadline = time.monotonic() + self.window_seconds
+                    while len(self._waiting) < self.max_batch_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                # Waiting for a free slot outside the lock lets the next batch keep growing
+                self._slots.acquire()
+                holds_slot = True
+                with self._condition:
+                    batch = self._take_batch()
+                    self._in_flight.update(batch)
+                self._executor.submit(self._send, batch)
+                batch, holds_slot = [], False
+        except Exception as e:
+            logger.error(f"Embedding dispatcher failed (model: {self.model}); failing its pending texts: {e}")
+            with self._condition:
+                for text, _ in batch:
+                    self._in_flight.pop(text, None)
+                batch.extend(self._waiting.items())
+                self._waiting.clear()
+                self._thread = None # The next submit starts a new dispatch thread
+            if holds_slot:
+                self._slots.release()
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _take_batch(self) -> list[tuple[str, Future]]:
+        batch, tokens = [], 0
+        for text in list(self._waiting):
+            text_tokens = estimate_token_count(text)
+            if batch and (len(batch) >= self.max_batch_size or tokens + text_tokens > self.max_batch_tokens):
+                break
+            batch.append((text, self._waiting.pop(text)))
+            tokens += text_tokens
+        return batch
+
+    def _send(self, batch: list[tuple[str, Future]]):
+        texts = [text for text, _ in batch]
+        embeddings = [None] * len(batch)
+        started_at = time.perf_counter()
+        try:
+            openai_client = get_openai_client()
+            if not openai_client:
+                logger.error("OpenAI client not available for embedding.")
+            else:
+                EMBEDDING_COALESCED_BATCH.observe(len(batch), model=self.model)
+                response = openai_client.embeddings.create(input=texts, model=self.model)
+                embeddings = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+                if len(embeddings) != len(batch):
+                    raise ValueError(f"expected {len(batch)} embeddings, got {len(embeddings)}")
+                _record_call("embedding", self.model, started_at, "success", getattr(response, "usage", None))
+        except Exception as e:
+            embeddings = [None] * len(batch)
+            _record_call("embedding", self.model, started_at, "error")
+            logger.error(f"Error calling OpenAI embedding API for {len(batch)} coalesced texts (model: {self.model}): {e}")
+        finally:
+            with self._condition:
+                for text, _ in batch:
+                    self._in_flight.pop(text, None)
+            self._slots.release()
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+_embedding_dispatchers = {}
+_embedding_dispatchers_lock = threading.Lock()
+
+def get_embedding_dispatcher(model: str = OPENAI_EMBEDDING_MODEL) -> EmbeddingDispatcher:
+    """The process-wide dispatcher for `model`, created on first use."""
+    with _embedding_dispatchers_lock:
+        dispatcher = _embedding_dispatchers.get(model)
+        if dispatcher is None:
+            dispatcher = _embedding_dispatchers[model] = EmbeddingDispatcher(model)
+        return dispatcher
+
 def get_openai_chat_completion(
     prompt: str,
     system_prompt: str = config.DEFAULT_SYSTEM_PROMPT,
     model=OPENAI_CHAT_MODEL
 ) -> str | None:
+    openai_client = get_openai_client()
     if not openai_client:
-        print("OpenAI client not available for chat completion.")
+        logger.error("OpenAI client not available for chat completion.")
         return None
     if not prompt or not isinstance(prompt, str):
-        print("Chat Completion Error: Input prompt must be a non-empty string.")
+        logger.error("Chat Completion Error: Input prompt must be a non-empty string.")
         return None
+    started_at = time.perf_counter()
     try:
         messages = [
             {"role": "system", "content": system_prompt},
@@ -57,45 +415,191 @@ def get_openai_chat_completion(
             temperature=config.DEFAULT_CHAT_TEMPERATURE,
             max_tokens=config.DEFAULT_CHAT_MAX_TOKENS
         )
+        _record_call("chat_completion", model, started_at, "success", getattr(response, "usage", None))
         content = response.choices[0].message.content
         return content.strip() if content else None
     except Exception as e:
-        print(f"Error calling OpenAI chat completion API (model: {model}): {e}")
+        _record_call("chat_completion", model, started_at, "error")
+        logger.error(f"Error calling OpenAI chat completion API (model: {model}): {e}")
         return None
 
+def detect_image_mime_type(image_bytes: bytes) -> str:
+    """Sniffs the image format from its magic bytes, defaulting to JPEG."""
+    if image_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return "image/webp"
+    if image_bytes[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/jpeg"
+
+def _build_vision_messages(image_bytes: bytes, prompt: str, detail: str, mime_type: str | None) -> list[dict]:
+    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+    image_url = f"data:{mime_type or detect_image_mime_type(image_bytes)};base64,{base64_image}"
+    return [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": image_url, "detail": detail}}
+            ]
+        }
+    ]
+
 def get_openai_vision_description(
     image_bytes: bytes,
     prompt: str = config.DEFAULT_VISION_PROMPT,
     detail: str = config.DEFAULT_VISION_DETAIL,
     max_tokens: int = config.DEFAULT_VISION_MAX_TOKENS,
-    model: str = OPENAI_VISION_MODEL
+    model: str = OPENAI_VISION_MODEL,
+    mime_type: str | None = None
 ) -> str | None:
+    description, _ = get_openai_vision_description_with_usage(image_bytes, prompt, detail, max_tokens, model, mime_type)
+    return description
+
+def get_openai_vision_description_with_usage(
+    image_bytes: bytes,
+    prompt: str = config.DEFAULT_VISION_PROMPT,
+    detail: str = config.DEFAULT_VISION_DETAIL,
+    max_tokens: int = config.DEFAULT_VISION_MAX_TOKENS,
+    model: str = OPENAI_VISION_MODEL,
+    mime_type: str | None = None
+) -> tuple[str | None, object | None]:
+    """get_openai_vision_description plus the response's token usage: (description, usage), either of which may be None."""
+    openai_client = get_openai_client()
     if not openai_client:
-        print("OpenAI client not available for vision description.")
-        return None
+        logger.error("OpenAI client not available for vision description.")
+        return None, None
     if not image_bytes:
-        print("Vision Description Error: Image bytes are required.")
-        return None
+        logger.error("Vision Description Error: Image bytes are required.")
+        return None, None
+    started_at = time.perf_counter()
     try:
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
-        image_url = f"data:image/jpeg;base64,{base64_image}"
-        
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": image_url, "detail": detail}}
-                ]
-            }
-        ]
+        messages = _build_vision_messages(image_bytes, prompt, detail, mime_type)
         response = openai_client.chat.completions.create(
             model=model,
             messages=messages,
             max_tokens=max_tokens
         )
+        usage = getattr(response, "usage", None)
+        _record_call("vision_description", model, started_at, "success", usage)
         content = response.choices[0].message.content
-        return content.strip() if content else None
+        return (content.strip() if content else None), usage
+    except Exception as e:
+        _record_call("vision_description", model, started_at, "error")
+        logger.error(f"Error calling OpenAI vision API (model: {model}): {e}")
+        return None, None
+
+# Recent streaming requests, newest last: time-to-first-token, total time and tokens/sec
+stream_metrics = deque(maxlen=config.STREAM_METRICS_HISTORY)
+
+def _stream_completion(kind: str, model: str, **create_kwargs):
+    """
+    Yields text deltas from a streaming chat completion and records per-request
+    metrics when the stream ends. Errors are logged, recorded and re-raised, so
+    consumers can tell a stream that was cut off from one that finished; a
+    stream the consumer abandons is recorded as "cancelled".
+    """
+    operation = f"{kind.replace(' ', '_')}_stream"
+    started_at = time.perf_counter()
+    first_token_at = None
+    usage = None
+    chunk_count = 0
+    outcome = "success"
+    try:
+        stream = get_openai_client().chat.completions.create(
+            model=model,
+            stream=True,
+            stream_options={"include_usage": True},
+            **create_kwargs
+        )
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if first_token_at is None:
+                # Leading whitespace is dropped, and with it any chunk that held nothing else
+                delta = delta.lstrip()
+                if not delta:
+                    continue
+                first_token_at = time.perf_counter()
+                OPENAI_TIME_TO_FIRST_TOKEN.observe(first_token_at - started_at, operation=operation, model=model)
+            chunk_count += 1
+            yield delta
+    except GeneratorExit:
+        # The consumer stopped reading; close the response so its connection is released
+        outcome = "cancelled"
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+        raise
     except Exception as e:
-        print(f"Error calling OpenAI vision API (model: {model}): {e}")
-        return None
\ No newline at end of file
+        outcome = "error"
+        logger.error(f"Error streaming OpenAI {kind} (model: {model}): {e}")
+        raise
+    finally:
+        finished_at = time.perf_counter()
+        _record_call(operation, model, started_at, outcome, usage)
+        tokens = usage.completion_tokens if usage is not None else chunk_count
+        generation_time = finished_at - (first_token_at or finished_at)
+        metrics = {
+            'kind': kind,
+            'model': model,
+            'outcome': outcome,
+            'time_to_first_token_s': first_token_at - started_at if first_token_at else None,
+            'total_time_s': finished_at - started_at,
+            'completion_tokens': tokens,
+            'tokens_per_sec': tokens / generation_time if generation_time > 0 else None
+        }
+        stream_metrics.append(metrics)
+        logger.info(f"Streamed {kind}", extra=metrics)
+
+def stream_openai_chat_completion(
+    prompt: str,
+    system_prompt: str = config.DEFAULT_SYSTEM_PROMPT,
+    model=OPENAI_CHAT_MODEL
+):
+    """Streaming variant of get_openai_chat_completion: returns a generator of text deltas, or None."""
+    if not get_openai_client():
+        logger.error("OpenAI client not available for chat completion.")
+        return None
+    if not prompt or not isinstance(prompt, str):
+        logger.error("Chat Completion Error: Input prompt must be a non-empty string.")
+        return None
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+    return _stream_completion(
+        "chat completion",
+        model,
+        messages=messages,
+        temperature=config.DEFAULT_CHAT_TEMPERATURE,
+        max_tokens=config.DEFAULT_CHAT_MAX_TOKENS
+    )
+
+def stream_openai_vision_description(
+    image_bytes: bytes,
+    prompt: str = config.DEFAULT_VISION_PROMPT,
+    detail: str = config.DEFAULT_VISION_DETAIL,
+    max_tokens: int = config.DEFAULT_VISION_MAX_TOKENS,
+    model: str = OPENAI_VISION_MODEL,
+    mime_type: str | None = None
+):
+    """Streaming variant of get_openai_vision_description: returns a generator of text deltas, or None."""
+    if not get_openai_client():
+        logger.error("OpenAI client not available for vision description.")
+        return None
+    if not image_bytes:
+        logger.error("Vision Description Error: Image bytes are required.")
+        return None
+    return _stream_completion(
+        "vision description",
+        model,
+        messages=_build_vision_messages(image_bytes, prompt, detail, mime_type),
+        max_tokens=max_tokens
+    )
@@ -1,10 +1,62 @@
-import boto3
-import json
-from dotenv import load_dotenv
+import os
+import threading
+import time
 
-load_dotenv()
+# Import constants from config.py
+import config
+from telemetry import get_logger, Counter, Histogram
 
-def get_image_labels(image_bytes: bytes, max_labels: int = 10, min_confidence: float = 75.0) -> dict:
+logger = get_logger(__name__)
+
+REKOGNITION_REQUESTS = Counter("rekognition_requests_total", "Rekognition DetectLabels calls by outcome.")
+REKOGNITION_LATENCY = Histogram("rekognition_request_duration_seconds", "Rekognition DetectLabels latency, including botocore retries.")
+
+_rekognition_client = None
+_rekognition_client_lock = threading.Lock()
+
+def get_rekognition_client():
+    """
+    Returns the process-wide Rekognition client, creating it on first use.
+
+    boto3 clients are thread-safe, so one client (and its HTTP connection
+    pool) is shared by every caller instead of re-resolving credentials and
+    endpoints per image. Pool size, retries and timeouts come from config.py;
+    REKOGNITION_ENDPOINT_URL points the client at a local stand-in service.
+    boto3 is imported here rather than at module load, since it is slow to import.
+    """
+    global _rekognition_client
+    if _rekognition_client is None:
+        with _rekognition_client_lock:
+            if _rekognition_client is None:
+                import boto3
+                from botocore.config import Config
+
+                client_config = Config(
+                    max_pool_connections=config.REKOGNITION_MAX_POOL_CONNECTIONS,
+                    retries={'max_attempts': config.REKOGNITION_MAX_ATTEMPTS, 'mode': 'adaptive'},
+                    connect_timeout=config.REKOGNITION_CONNECT_TIMEOUT_SECONDS,
+                    read_timeout=config.REKOGNITION_READ_TIMEOUT_SECONDS
+                )
+                _rekognition_client = boto3.session.Session().client(
+                    'rekognition',
+                    region_name=os.getenv("AWS_DEFAULT_REGION", config.AWS_DEFAULT_REGION),
+                    endpoint_url=os.getenv("REKOGNITION_ENDPOINT_URL") or None,
+                    config=client_config
+                )
+                logger.info("Rekognition client initialized.")
+    return _rekognition_client
+
+def set_rekognition_client(client):
+    """Replaces the shared client, e.g. with one wrapped in a botocore Stubber. Pass None to rebuild lazily."""
+    global _rekognition_client
+    with _rekognition_client_lock:
+        _rekognition_client = client
+
+def get_image_labels(
+    image_bytes: bytes,
+    max_labels: int = config.REKOGNITION_MAX_LABELS,
+    min_confidence: float = config.REKOGNITION_MIN_CONFIDENCE
+) -> dict:
     """
     Detects labels in an image using Amazon Rekognition.
 
@@ -20,14 +72,18 @@ def get_image_labels(image_bytes: bytes, max_labels: int = 10, min_confidence: f
     Raises:
         Exception: If the API call to Rekognition fails.
     """
+    started_at = time.perf_counter()
     try:
-        rekognition_client = boto3.client('rekognition')
-        response = rekognition_client.detect_labels(
+        response = get_rekognition_client().detect_labels(
             Image={'Bytes': image_bytes},
             MaxLabels=max_labels,
             MinConfidence=min_confidence
         )
+        REKOGNITION_REQUESTS.inc(outcome="success")
         return response
     except Exception as e:
-        print(f"Error calling Rekognition DetectLabels: {e}")
-        raise
\ No newline at end of file
+        REKOGNITION_REQUESTS.inc(outcome=type(e).__name__)
+        logger.error(f"Error calling Rekognition DetectLabels: {e}")
+        raise
+    finally:
+        REKOGNITION_LATENCY.observe(time.perf_counter() - started_at)
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+from embedding_cache import normalize_query
+from openai_service import estimate_token_count
+
+import config
+
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", config.RETRIEVAL_TOP_K))
+RETRIEVAL_MIN_SIMILARITY = float(os.getenv("RETRIEVAL_MIN_SIMILARITY", config.RETRIEVAL_MIN_SIMILARITY))
+RETRIEVAL_DEDUPE_JACCARD = float(os.getenv("RETRIEVAL_DEDUPE_JACCARD", config.RETRIEVAL_DEDUPE_JACCARD))
+RETRIEVAL_CONTEXT_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_CONTEXT_TOKEN_BUDGET", config.RETRIEVAL_CONTEXT_TOKEN_BUDGET))
+RETRIEVAL_HYBRID = os.getenv("RETRIEVAL_HYBRID", str(config.RETRIEVAL_HYBRID)).lower() in ("1", "true")
+RETRIEVAL_HYBRID_CANDIDATES = int(os.getenv("RETRIEVAL_HYBRID_CANDIDATES", config.RETRIEVAL_HYBRID_CANDIDATES))
+RETRIEVAL_RRF_K = int(os.getenv("RETRIEVAL_RRF_K", config.RETRIEVAL_RRF_K))
+RETRIEVAL_MIN_LEXICAL_COVERAGE = float(os.getenv("RETRIEVAL_MIN_LEXICAL_COVERAGE", config.RETRIEVAL_MIN_LEXICAL_COVERAGE))
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", str(config.LEXICAL_FAST_PATH)).lower() in ("1", "true")
+LEXICAL_FAST_PATH_MIN_TERMS = int(os.getenv("LEXICAL_FAST_PATH_MIN_TERMS", config.LEXICAL_FAST_PATH_MIN_TERMS))
+LEXICAL_FAST_PATH_MARGIN = float(os.getenv("LEXICAL_FAST_PATH_MARGIN", config.LEXICAL_FAST_PATH_MARGIN))
+
+def question_tokens(question: str) -> frozenset[str]:
+    return frozenset(normalize_query(question).split())
+
+def jaccard_similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def format_context(result: dict) -> str:
+    return config.APP_RAG_CONTEXT_TEMPLATE.format(context_question=result['question'], context_answer=result['answer'])
+
+def is_relevant(result: dict, min_similarity: float, min_lexical_coverage: float) -> bool:
+    """A hit is relevant if its dense score clears the floor, or (hybrid hits) it covers enough of the query's terms."""
+    similarity = result.get('similarity_score')
+    if similarity is not None and similarity >= min_similarity:
+        return True
+    coverage = result.get('lexical_coverage')
+    return coverage is not None and coverage >= min_lexical_coverage
+
+def select_contexts(
+    results: list[dict],
+    min_similarity: float = RETRIEVAL_MIN_SIMILARITY,
+    dedupe_jaccard: float = RETRIEVAL_DEDUPE_JACCARD,
+    token_budget: int = RETRIEVAL_CONTEXT_TOKEN_BUDGET,
+    min_lexical_coverage: float = RETRIEVAL_MIN_LEXICAL_COVERAGE
+) -> list[dict]:
+    """
+    Turns raw top-k search results into the contexts for the RAG prompt.
+
+    Hits that are not relevant (see is_relevant) are dropped, a hit whose
+    question shares at least `dedupe_jaccard` of its words with a better-ranked
+    one is treated as a near-duplicate and skipped, and the rest are packed
+    best-first (by fused rank for hybrid results, else by similarity) while
+    their formatted size fits `token_budget`. The best relevant hit is always
+    kept, even if it alone exceeds the budget. An empty list means nothing is
+    relevant enough to answer from.
+    """
+    def rank_key(result):
+        if result.get('fusion_score') is not None:
+            return result['fusion_score']
+        return result['similarity_score'] if result.get('similarity_score') is not None else float("-inf")
+
+    selected, selected_tokens, used_tokens = [], [], 0
+    for result in sorted(results, key=rank_key, reverse=True):
+        if not is_relevant(result, min_similarity, min_lexical_coverage):
+            continue
+        tokens = question_tokens(result['question'])
+        if any(jaccard_similarity(tokens, other) >= dedupe_jaccard for other in selected_tokens):
+            continue
+        cost = estimate_token_count(format_context(result))
+        if selected and used_tokens + cost > token_budget:
+            continue
+        selected.append(result)
+        selected_tokens.append(tokens)
+        used_tokens += cost
+    return selected
+
+def build_context_block(contexts: list[dict]) -> str:
+    return "\n\n".join(format_context(result) for result in contexts)
\ No newline at end of file
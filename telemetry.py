@@ -0,0 +1,309 @@
+"""
+Logging, timed spans and metrics for the request path.
+
+Logging goes through the standard `logging` module, configured once from
+LOG_LEVEL / LOG_FORMAT ("text" key=value lines, or "json" objects); fields
+passed via `extra=` are kept as structured fields.
+
+Metrics and spans go to one backend selected by TELEMETRY_BACKEND:
+
+    none        (default) counters, histograms and spans are no-ops
+    prometheus  in-process registry, rendered by render_prometheus() (the API
+                server's /metrics) or served on TELEMETRY_PROMETHEUS_PORT
+    otel        the OpenTelemetry API; the deployment supplies the SDK and
+                exporters (e.g. via opentelemetry-instrument)
+
+Every span also records its duration in the `stage_duration_seconds`
+histogram and counts failures in `stage_errors_total`.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+METRIC_PREFIX = "aperture_"
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# --- Logging ---
+
+# Attributes every LogRecord has; anything else came from `extra=` and is a structured field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+def _record_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+class TextFormatter(logging.Formatter):
+    """`time level logger message key=value ...`"""
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"{self.formatTime(record)} {record.levelname} {record.name} {record.getMessage()}"
+        fields = _record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+                                   for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra=` fields at the top level."""
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **_record_fields(record)
+        }
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+# Third-party loggers that are far too chatty at DEBUG; they stay at WARNING unless LOG_LEVEL is higher
+QUIET_LOGGERS = ("botocore", "boto3", "s3transfer", "urllib3", "httpx", "httpcore", "openai", "PIL", "multipart", "asyncio")
+
+_logging_configured = False
+_logging_lock = threading.Lock()
+
+def configure_logging(level: str | None = None, log_format: str | None = None):
+    """Installs the app's handler on the root logger; later calls are no-ops."""
+    global _logging_configured
+    with _logging_lock:
+        if _logging_configured:
+            return
+        handler = logging.StreamHandler()
+        log_format = (log_format or os.getenv("LOG_FORMAT", config.LOG_FORMAT)).lower()
+        handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel((level or os.getenv("LOG_LEVEL", config.LOG_LEVEL)).upper())
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(max(root.level, logging.WARNING))
+        _logging_configured = True
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(name)
+
+logger = get_logger(__name__)
+
+# --- Backends ---
+
+class NoopBackend:
+    def inc(self, metric, amount: float, labels: dict):
+        pass
+
+    def observe(self, metric, value: float, labels: dict):
+        pass
+
+    @contextmanager
+    def span(self, name: str, attributes: dict):
+        yield
+
+class PrometheusBackend(NoopBackend):
+    """Thread-safe in-process registry rendered in the Prometheus text exposition format."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {} # name -> metric definition
+        self._counters = {} # (name, label items) -> value
+        self._histograms = {} # (name, label items) -> [bucket counts..., sum, count]
+
+    def inc(self, metric, amount: float, labels: dict):
+        key = (metric.name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._metrics[metric.name] = metric
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def observe(self, metric, value: float, labels: dict):
+        key = (metric.name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._metrics[metric.name] = metric
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [0] * len(metric.buckets) + [0.0, 0]
+            for i, bound in enumerate(metric.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> str:
+        def label_text(items, extra=()):
+            items = list(items) + list(extra)
+            if not items:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in items)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + "}"
+
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(state) for key, state in self._histograms.items()}
+            metrics = dict(self._metrics)
+        lines = []
+        for name in sorted(metrics):
+            metric = metrics[name]
+            full_name = METRIC_PREFIX + name
+            lines.append(f"# HELP {full_name} {metric.description}")
+            lines.append(f"# TYPE {full_name} {metric.kind}")
+            if metric.kind == "counter":
+                for (metric_name, items), value in sorted(counters.items()):
+                    if metric_name == name:
+                        lines.append(f"{full_name}{label_text(items)} {value:g}")
+            else:
+                for (metric_name, items), state in sorted(histograms.items()):
+                    if metric_name != name:
+                        continue
+                    for bound, count in zip(metric.buckets, state):
+                        lines.append(f"{full_name}_bucket{label_text(items, [('le', f'{bound:g}')])} {count}")
+                    lines.append(f"{full_name}_bucket{label_text(items, [('le', '+Inf')])} {state[-1]}")
+                    lines.append(f"{full_name}_sum{label_text(items)} {state[-2]:g}")
+                    lines.append(f"{full_name}_count{label_text(items)} {state[-1]}")
+        return "\n".join(lines) + "\n"
+
+class OpenTelemetryBackend(NoopBackend):
+    """Forwards to the OpenTelemetry API; without a configured SDK these calls are no-ops too."""
+    def __init__(self):
+        from opentelemetry import metrics, trace
+        self._tracer = trace.get_tracer("apertureai")
+        self._meter = metrics.get_meter("apertureai")
+        self._instruments = {}
+        self._lock = threading.Lock()
+
+    def _instrument(self, metric):
+        with self._lock:
+            instrument = self._instruments.get(metric.name)
+            if instrument is None:
+                create = self._meter.create_counter if metric.kind == "counter" else self._meter.create_histogram
+                instrument = self._instruments[metric.name] = create(METRIC_PREFIX + metric.name, description=metric.description)
+            return instrument
+
+    def inc(self, metric, amount: float, labels: dict):
+        self._instrument(metric).add(amount, labels)
+
+    def observe(self, metric, value: float, labels: dict):
+        self._instrument(metric).record(value, labels)
+
+    @contextmanager
+    def span(self, name: str, attributes: dict):
+        with self._tracer.start_as_current_span(name, attributes=attributes):
+            yield
+
+def _create_backend(name: str) -> NoopBackend:
+    name = name.lower()
+    if name == "prometheus":
+        return PrometheusBackend()
+    if name in ("otel", "opentelemetry"):
+        try:
+            return OpenTelemetryBackend()
+        except ImportError:
+            logger.warning("TELEMETRY_BACKEND=otel but opentelemetry-api is not installed; telemetry disabled.")
+            return NoopBackend()
+    if name not in ("", "none"):
+        logger.warning(f"Unknown TELEMETRY_BACKEND '{name}'; telemetry disabled.")
+    return NoopBackend()
+
+_backend = _create_backend(os.getenv("TELEMETRY_BACKEND", config.TELEMETRY_BACKEND))
+
+def set_backend(name: str):
+    """Switches the telemetry backend at runtime (e.g. from a benchmark or a test)."""
+    global _backend
+    _backend = _create_backend(name)
+
+def render_prometheus() -> str | None:
+    """The current metrics in Prometheus text format, or None when the backend is not "prometheus"."""
+    return _backend.render() if isinstance(_backend, PrometheusBackend) else None
+
+# --- Instruments ---
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+
+    def inc(self, amount: float = 1, **labels):
+        _backend.inc(self, amount, labels)
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        _backend.observe(self, value, labels)
+
+STAGE_DURATION = Histogram("stage_duration_seconds", "Duration of each request stage.")
+STAGE_ERRORS = Counter("stage_errors_total", "Request stages that raised an exception.")
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result (hit/miss).")
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Times a request stage: records it in `stage_duration_seconds{stage=...}`,
+    opens a trace span on the OpenTelemetry backend, and counts exceptions in
+    `stage_errors_total` before re-raising them. Yields a dict that callers
+    can add attributes to (e.g. the outcome); they are logged at DEBUG level.
+    """
+    fields = dict(attributes)
+    started = time.perf_counter()
+    try:
+        with _backend.span(stage, attributes):
+            yield fields
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{stage} finished", extra={'stage': stage, 'duration_s': elapsed, **fields})
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+# --- Standalone /metrics endpoint ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = (render_prometheus() or "").encode("utf-8")
+        self.send_response(200 if self.path.rstrip("/") == "/metrics" else 404)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+def start_metrics_server(port: int | None = None) -> int | None:
+    """
+    Serves /metrics on a background thread (once per process) for processes
+    without their own HTTP server, like the Streamlit app. Returns the port,
+    or None when no port is configured.
+    """
+    global _metrics_server
+    port = int(os.getenv("TELEMETRY_PROMETHEUS_PORT", config.TELEMETRY_PROMETHEUS_PORT)) if port is None else port
+    if not port:
+        return None
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            except OSError as e:
+                logger.warning(f"Could not start the metrics endpoint on port {port}: {e}")
+                return None
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True, name="metrics-server").start()
+            logger.info(f"Serving Prometheus metrics on port {port} at /metrics.")
+    return _metrics_server.server_port
@@ -0,0 +1,201 @@
+"""
+Per-tenant FAQ index shards behind one router.
+
+`index_faq.py --by-tenant` writes one complete build per tenant under
+<FAISS_OUTPUT_DIR_NAME>/tenants/<tenant>/. TenantStoreManager opens a tenant's
+shard as a FAISSVectorStore on the tenant's first query, keeps it (with hot
+reload) while it is in use, and evicts the least recently used shards once
+their files together exceed the memory budget, so memory follows the number
+of active tenants rather than the number of tenants.
+"""
+import heapq
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from faiss_service import FAISSVectorStore, FAISS_BASE_NAME, OUTPUT_DIR_FULL_PATH
+from index_manifest import build_size_bytes, is_valid_tenant, list_tenants, manifest_path, tenant_dir
+from telemetry import get_logger, Counter
+
+import config
+
+logger = get_logger(__name__)
+
+TENANT_SHARD_LOADS = Counter("tenant_shard_loads_total", "Tenant shard loads by outcome (loaded/failed).")
+TENANT_SHARD_EVICTIONS = Counter("tenant_shard_evictions_total", "Tenant shards evicted to stay within the memory budget.")
+
+TENANT_SHARD_MEMORY_BUDGET_MB = float(os.getenv("TENANT_SHARD_MEMORY_BUDGET_MB", config.TENANT_SHARD_MEMORY_BUDGET_MB))
+TENANT_SEARCH_MAX_WORKERS = int(os.getenv("TENANT_SEARCH_MAX_WORKERS", config.TENANT_SEARCH_MAX_WORKERS))
+INDEX_WATCH_INTERVAL_SECONDS = float(os.getenv("INDEX_WATCH_INTERVAL_SECONDS", config.INDEX_WATCH_INTERVAL_SECONDS))
+
+class _Shard:
+    """A loaded shard and the bytes it is charged against the budget, re-measured when its generation changes."""
+    def __init__(self, store: FAISSVectorStore, directory: str, size_bytes: int, answer_cache=None):
+        self.store = store
+        self.directory = directory
+        self.size_bytes = size_bytes
+        self.version = store.version
+        self.answer_cache = answer_cache
+
+class TenantStoreManager:
+    """
+    Routes FAQ queries to per-tenant FAISSVectorStore shards.
+
+    `get_store` loads a shard on first use and keeps loaded shards in LRU
+    order. Whenever a shard is loaded or grows, the least recently used ones
+    are evicted until the rest fit `memory_budget_bytes` (the shard being
+    accessed always stays). A shard is charged the size of its index files,
+    which for memory-mapped files is an upper bound on what it keeps resident.
+    Searches already running on an evicted shard finish normally; its files
+    are released after them.
+
+    With an `answer_cache_factory`, every loaded shard also gets its own answer
+    cache (see `answer_cache`), since FAQ ids and index versions are per shard.
+    """
+    def __init__(
+        self,
+        output_dir: str = OUTPUT_DIR_FULL_PATH,
+        base_name: str = FAISS_BASE_NAME,
+        memory_budget_bytes: int = int(TENANT_SHARD_MEMORY_BUDGET_MB * 1024 * 1024),
+        watch_interval: float = INDEX_WATCH_INTERVAL_SECONDS,
+        search_workers: int = TENANT_SEARCH_MAX_WORKERS,
+        answer_cache_factory=None
+    ):
+        self.output_dir = output_dir
+        self.base_name = base_name
+        self.memory_budget_bytes = memory_budget_bytes
+        self.watch_interval = watch_interval
+        self.answer_cache_factory = answer_cache_factory
+        self._lock = threading.Lock()
+        self._shards = OrderedDict() # tenant -> _Shard, least recently used first
+        self._load_locks = {} # tenant -> Lock, so concurrent first queries load a shard once
+        self._executor = ThreadPoolExecutor(max_workers=max(1, search_workers), thread_name_prefix="tenant-search")
+        self.loads = 0
+        self.evictions = 0
+
+    def tenants(self) -> list[str]:
+        """Tenants with a published shard."""
+        return list_tenants(self.output_dir, self.base_name)
+
+    def has_tenant(self, tenant: str) -> bool:
+        return is_valid_tenant(tenant) and os.path.exists(manifest_path(tenant_dir(self.output_dir, tenant), self.base_name))
+
+    def get_store(self, tenant: str) -> FAISSVectorStore | None:
+        """The tenant's store, loading its shard if needed; None for unknown tenants and shards that fail to load."""
+        store = self._lookup(tenant)
+        if store is not None or not self.has_tenant(tenant):
+            return store
+        with self._lock:
+            load_lock = self._load_locks.setdefault(tenant, threading.Lock())
+        with load_lock:
+            # A concurrent first query may have loaded it while this one waited
+            store = self._lookup(tenant)
+            if store is not None:
+                return store
+            shard = self._load(tenant)
+            if shard is None:
+                return None
+            with self._lock:
+                self._shards[tenant] = shard
+                self.loads += 1
+                evicted = self._evict(keep=tenant)
+        self._release(evicted)
+        return shard.store
+
+    def answer_cache(self, tenant: str):
+        """The answer cache of the tenant's loaded shard; None if it is not loaded or there is no factory."""
+        with self._lock:
+            shard = self._shards.get(tenant)
+            return shard.answer_cache if shard is not None else None
+
+    def _lookup(self, tenant: str) -> FAISSVectorStore | None:
+        evicted = []
+        with self._lock:
+            shard = self._shards.get(tenant)
+            if shard is None:
+                return None
+            self._shards.move_to_end(tenant)
+            if shard.version != shard.store.version:
+                # A hot reload swapped in a new generation, which may be larger
+                shard.version = shard.store.version
+                shard.size_bytes = build_size_bytes(shard.directory, self.base_name)
+                evicted = self._evict(keep=tenant)
+        self._release(evicted)
+        return shard.store
+
+    def _load(self, tenant: str) -> _Shard | None:
+        directory = tenant_dir(self.output_dir, tenant)
+        store = FAISSVectorStore.from_directory(directory, self.base_name)
+        if not store.is_ready():
+            TENANT_SHARD_LOADS.inc(outcome="failed")
+            logger.error(f"Could not load the FAQ index shard of tenant '{tenant}' from {directory}.")
+            return None
+        store.start_watching(self.watch_interval)
+        size_bytes = build_size_bytes(directory, self.base_name)
+        TENANT_SHARD_LOADS.inc(outcome="loaded")
+        logger.info(f"Loaded the FAQ index shard of tenant '{tenant}' ({store.index.ntotal} vectors, {size_bytes / 2 ** 20:.1f} MB).")
+        return _Shard(store, directory, size_bytes, self.answer_cache_factory() if self.answer_cache_factory else None)
+
+    def _evict(self, keep: str) -> list[tuple[str, _Shard]]:
+        # Called with the lock held; the evicted shards are released by the caller after unlocking
+        evicted = []
+        total = sum(shard.size_bytes for shard in self._shards.values())
+        for tenant in list(self._shards):
+            if total <= self.memory_budget_bytes:
+                break
+            if tenant == keep:
+                continue
+            shard = self._shards.pop(tenant)
+            total -= shard.size_bytes
+            evicted.append((tenant, shard))
+        self.evictions += len(evicted)
+        if total > self.memory_budget_bytes:
+            logger.warning(f"The FAQ index shard of tenant '{keep}' alone exceeds the {self.memory_budget_bytes / 2 ** 20:.0f} MB shard memory budget.")
+        return evicted
+
+    def _release(self, evicted: list[tuple[str, _Shard]]):
+        for tenant, shard in evicted:
+            # Runs on the request thread, so it does not wait for a reload the watcher may be in the middle of
+            shard.store.stop_watching(wait=False)
+            TENANT_SHARD_EVICTIONS.inc()
+            logger.info(f"Evicted the FAQ index shard of tenant '{tenant}' ({shard.size_bytes / 2 ** 20:.1f} MB).")
+
+    def search(self, query_embedding: list[float], k: int = 3, tenants: list[str] | None = None) -> list[dict]:
+        """
+        Top-k FAQ hits across several tenants' shards (every published shard by
+        default), searched in parallel and merged by similarity. Each hit carries
+        its 'tenant'. Shards load and evict through get_store as usual, so
+        memory stays within the budget plus the shards being searched.
+        """
+        if query_embedding is None:
+            return []
+        tenants = self.tenants() if tenants is None else tenants
+
+        def search_shard(tenant):
+            store = self.get_store(tenant)
+            if store is None:
+                return []
+            return [{**result, 'tenant': tenant} for result in store.search_faq_by_embedding(query_embedding, k=k)]
+
+        results = [result for shard_results in self._executor.map(search_shard, tenants) for result in shard_results]
+        return heapq.nlargest(k, results, key=lambda result: result['similarity_score'])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'loaded_tenants': list(self._shards),
+                'loaded_bytes': sum(shard.size_bytes for shard in self._shards.values()),
+                'memory_budget_bytes': self.memory_budget_bytes,
+                'loads': self.loads,
+                'evictions': self.evictions
+            }
+
+    def close(self):
+        """Stops every shard's manifest watcher and the search threads."""
+        with self._lock:
+            shards = list(self._shards.values())
+            self._shards.clear()
+        for shard in shards:
+            shard.store.stop_watching()
+        self._executor.shutdown(wait=False)
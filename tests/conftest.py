@@ -0,0 +1,101 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import openai_service
+
+def fake_embedding(text: str) -> list[float]:
+    """A small deterministic vector per text, so tests can tell whose result they got."""
+    return [float(len(text)), float(sum(map(ord, text)) % 997), 1.0]
+
+class FakeEmbeddings:
+    """
+    Stands in for `client.embeddings`. Records every request's inputs, raises
+    the queued `failures` one per request first, and can hold requests at
+    `gate` or delay them by `latency` to simulate a slow endpoint.
+    """
+    def __init__(self):
+        self.calls = []
+        self.failures = []
+        self.latency = 0.0
+        self.gate = None
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def create(self, input, model):
+        with self._lock:
+            self.calls.append(list(input))
+            failure = self.failures.pop(0) if self.failures else None
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.gate is not None:
+                self.gate.wait()
+            if self.latency:
+                time.sleep(self.latency)
+            if failure is not None:
+                raise failure
+            # Out of order on purpose: callers must sort on the index field
+            data = [SimpleNamespace(index=i, embedding=fake_embedding(text)) for i, text in reversed(list(enumerate(input)))]
+            tokens = sum(openai_service.estimate_token_count(text) for text in input)
+            return SimpleNamespace(data=data, usage=SimpleNamespace(prompt_tokens=tokens, completion_tokens=0, total_tokens=tokens))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    @property
+    def inputs(self) -> list[str]:
+        return [text for call in self.calls for text in call]
+
+class FakeChatStream:
+    """A streaming chat response: one chunk per delta, then a usage chunk; raises `failure` after `fail_after` deltas."""
+    def __init__(self, deltas: list[str], fail_after: int | None = None, failure: Exception | None = None):
+        self.deltas = deltas
+        self.fail_after = fail_after
+        self.failure = failure
+        self.closed = False
+
+    def __iter__(self):
+        for i, delta in enumerate(self.deltas):
+            if i == self.fail_after:
+                raise self.failure
+            yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+        yield SimpleNamespace(usage=SimpleNamespace(prompt_tokens=10, completion_tokens=len(self.deltas)), choices=[])
+
+    def close(self):
+        self.closed = True
+
+class FakeChatCompletions:
+    """Stands in for `client.chat.completions`; streaming requests get the queued `streams` in order."""
+    def __init__(self):
+        self.streams = []
+        self.calls = []
+
+    def create(self, stream=False, **request):
+        self.calls.append(request)
+        assert stream, "only streaming chat completions are faked"
+        return self.streams.pop(0)
+
+class FakeOpenAIClient:
+    def __init__(self):
+        self.embeddings = FakeEmbeddings()
+        self.chat = SimpleNamespace(completions=FakeChatCompletions())
+
+    def with_options(self, **options):
+        return self
+
+def rate_limit_error(retry_after: str | None = None):
+    from openai import RateLimitError
+
+    headers = {'retry-after': retry_after} if retry_after is not None else {}
+    return RateLimitError("rate limited", response=SimpleNamespace(request=None, status_code=429, headers=headers), body=None)
+
+@pytest.fixture
+def fake_openai():
+    client = FakeOpenAIClient()
+    openai_service.set_openai_client(client)
+    yield client
+    openai_service.set_openai_client(None)
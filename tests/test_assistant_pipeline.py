@@ -0,0 +1,83 @@
+import pytest
+
+import assistant_pipeline
+from assistant_pipeline import ANSWER_CUT_OFF_NOTICE, normalize_topic_label, retrieve_faq_contexts_batch, stream_and_cache_answer
+from conftest import fake_embedding
+
+@pytest.mark.parametrize("completion, label", [
+    ("RETAIL_RELATED", "RETAIL_RELATED"),
+    (" not_retail_related.\n", "NOT_RETAIL_RELATED"),
+    ("'RETAIL_RELATED'", "RETAIL_RELATED"),
+    ("Sure! This is RETAIL_RELATED", "other"),
+    ("", "other"),
+    (None, "other")
+])
+def test_normalize_topic_label_bounds_llm_output(completion, label):
+    assert normalize_topic_label(completion) == label
+
+def answer_stream(tokens, fail_after=None):
+    for i, token in enumerate(tokens):
+        if i == fail_after:
+            raise RuntimeError("connection reset")
+        yield token
+
+def test_stream_and_cache_answer_caches_complete_answers():
+    cached = []
+
+    streamed = list(stream_and_cache_answer(answer_stream(["Returns ", "are free."]), "fallback", cached.append))
+
+    assert streamed == ["Returns ", "are free."]
+    assert cached == ["Returns are free."]
+
+def test_stream_and_cache_answer_flags_and_skips_caching_a_cut_off_answer():
+    cached = []
+
+    streamed = list(stream_and_cache_answer(answer_stream(["Returns ", "are free."], fail_after=1), "fallback", cached.append))
+
+    assert streamed == ["Returns ", ANSWER_CUT_OFF_NOTICE]
+    assert cached == []
+
+def test_stream_and_cache_answer_falls_back_when_nothing_was_streamed():
+    cached = []
+
+    streamed = list(stream_and_cache_answer(answer_stream(["Returns"], fail_after=0), "fallback", cached.append))
+
+    assert streamed == ["fallback"]
+    assert cached == []
+
+class FakeStore:
+    """Records the searches the batch retrieval makes; 'Returns?' is a lexical fast-path match."""
+    def __init__(self):
+        self.search_many_calls = []
+        self.hybrid_calls = []
+
+    def is_ready(self):
+        return True
+
+    def match_lexical(self, query):
+        return {'id': 7, 'question': query, 'answer': "Free", 'similarity_score': None} if query == "Returns?" else None
+
+    def search_many(self, queries, k=3, as_dicts=False, embeddings=None):
+        self.search_many_calls.append((list(queries), k, embeddings))
+        return [[{'id': i, 'question': query, 'answer': "A", 'similarity_score': 0.9}] for i, query in enumerate(queries)]
+
+    def search_hybrid(self, query, query_embedding, k=3, dense=None):
+        self.hybrid_calls.append(query)
+        return dense
+
+@pytest.mark.parametrize("hybrid", [True, False])
+def test_retrieve_faq_contexts_batch_embeds_and_searches_once(fake_openai, monkeypatch, hybrid):
+    monkeypatch.setattr(assistant_pipeline, "RETRIEVAL_HYBRID", hybrid)
+    store = FakeStore()
+
+    retrievals = retrieve_faq_contexts_batch(store, ["Where is my order?", "Returns?", "Do you ship abroad?"])
+
+    # The lexical match needs no embedding; the other two share one request and one search
+    assert fake_openai.embeddings.calls == [["Where is my order?", "Do you ship abroad?"]]
+    assert [(queries, embeddings) for queries, _, embeddings in store.search_many_calls] == [
+        (["Where is my order?", "Do you ship abroad?"], [fake_embedding("Where is my order?"), fake_embedding("Do you ship abroad?")])
+    ]
+    assert store.hybrid_calls == (["Where is my order?", "Do you ship abroad?"] if hybrid else [])
+    assert [retrieval['search_results'][0]['id'] for retrieval in retrievals] == [0, 7, 1]
+    assert retrievals[1]['lexical_match'] is not None and retrievals[1]['query_embedding'] is None
+    assert retrievals[2]['query_embedding'] == fake_embedding("Do you ship abroad?")
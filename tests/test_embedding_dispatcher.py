@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import fake_embedding
+from openai_service import EmbeddingDispatcher
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the dispatcher"
+        time.sleep(0.001)
+
+def embed_concurrently(dispatcher: EmbeddingDispatcher, texts: list[str]) -> list:
+    start = threading.Barrier(len(texts))
+
+    def embed(text):
+        start.wait()
+        return dispatcher.embed(text)
+
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        return list(pool.map(embed, texts))
+
+@pytest.fixture
+def gate(fake_openai):
+    """Holds every embedding request at the fake endpoint until set."""
+    fake_openai.embeddings.gate = threading.Event()
+    yield fake_openai.embeddings.gate
+    fake_openai.embeddings.gate.set()
+
+def test_concurrent_texts_share_batched_requests(fake_openai):
+    dispatcher = EmbeddingDispatcher(window_seconds=0.05, max_batch_size=64)
+    texts = [f"question {i}" for i in range(16)]
+
+    results = embed_concurrently(dispatcher, texts)
+
+    assert results == [fake_embedding(text) for text in texts]
+    assert len(fake_openai.embeddings.calls) < len(texts)
+    assert sorted(fake_openai.embeddings.inputs) == sorted(texts)
+
+def test_batches_respect_max_batch_size(fake_openai):
+    dispatcher = EmbeddingDispatcher(window_seconds=0.05, max_batch_size=3)
+    texts = [f"question {i}" for i in range(10)]
+
+    results = embed_concurrently(dispatcher, texts)
+
+    assert results == [fake_embedding(text) for text in texts]
+    assert max(map(len, fake_openai.embeddings.calls)) <= 3
+    assert sorted(fake_openai.embeddings.inputs) == sorted(texts)
+
+def test_identical_text_joins_the_request_in_flight(fake_openai, gate):
+    dispatcher = EmbeddingDispatcher(window_seconds=0.0)
+    first = dispatcher.submit("Where is my order?")
+    wait_until(lambda: fake_openai.embeddings.in_flight == 1)
+
+    second = dispatcher.submit("Where is my order?")
+    gate.set()
+
+    assert second is first
+    assert first.result(timeout=5) == fake_embedding("Where is my order?")
+    assert fake_openai.embeddings.calls == [["Where is my order?"]]
+
+def test_requests_in_flight_are_capped_and_later_texts_join_the_next_batch(fake_openai, gate):
+    dispatcher = EmbeddingDispatcher(window_seconds=0.0, max_batch_size=1, max_in_flight=2)
+    futures = [dispatcher.submit(f"question {i}") for i in range(2)]
+    wait_until(lambda: fake_openai.embeddings.in_flight == 2)
+    dispatcher.max_batch_size = 64
+    futures += [dispatcher.submit(f"question {i}") for i in range(2, 6)]
+    time.sleep(0.05)
+
+    assert len(fake_openai.embeddings.calls) == 2
+    gate.set()
+    assert [future.result(timeout=5) for future in futures] == [fake_embedding(f"question {i}") for i in range(6)]
+    assert fake_openai.embeddings.max_in_flight == 2
+    # The four texts that waited for a free slot went out together
+    assert sorted(map(len, fake_openai.embeddings.calls)) == [1, 1, 4]
+
+def test_failed_request_resolves_its_callers_to_none_and_frees_the_slot(fake_openai):
+    dispatcher = EmbeddingDispatcher(window_seconds=0.0, max_in_flight=1)
+    fake_openai.embeddings.failures.append(RuntimeError("server error"))
+
+    assert dispatcher.embed("first") is None
+    assert dispatcher.embed("second") == fake_embedding("second")
+
+def test_embed_falls_back_to_a_direct_request_after_the_timeout(fake_openai):
+    dispatcher = EmbeddingDispatcher(window_seconds=0.0, max_in_flight=1, timeout_seconds=0.05)
+    # With its only slot taken, the dispatcher cannot send anything
+    dispatcher._slots.acquire()
+    try:
+        assert dispatcher.embed("stuck") == fake_embedding("stuck")
+        assert fake_openai.embeddings.calls == [["stuck"]]
+    finally:
+        dispatcher._slots.release()
+
+def test_dispatch_thread_failure_fails_pending_texts_and_restarts(fake_openai, monkeypatch):
+    dispatcher = EmbeddingDispatcher(window_seconds=0.0, max_in_flight=1)
+    take_batch = dispatcher._take_batch
+
+    def fail_once():
+        monkeypatch.setattr(dispatcher, "_take_batch", take_batch)
+        raise RuntimeError("dispatch bug")
+
+    monkeypatch.setattr(dispatcher, "_take_batch", fail_once)
+
+    assert dispatcher.embed("lost") is None
+    wait_until(lambda: dispatcher._thread is None)
+    # A new thread picks up the next text, and the slot the failed thread held is free again
+    assert dispatcher.embed("recovered") == fake_embedding("recovered")
+    assert fake_openai.embeddings.calls == [["recovered"]]
@@ -0,0 +1,54 @@
+import json
+
+import faiss
+import numpy as np
+
+from faiss_service import FAISSVectorStore, create_faiss_index
+from index_manifest import generation_paths, manifest_path, write_manifest
+
+BASE_NAME = "faq-index"
+
+def write_generation(output_dir: str, generation: int, questions: list[str], write_data: bool = True):
+    """Writes a small flat index generation and publishes it in the manifest."""
+    paths = generation_paths(output_dir, BASE_NAME, generation)
+    vectors = np.eye(len(questions), 4, dtype="float32")
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(4))
+    index.add_with_ids(vectors, np.arange(len(questions), dtype="int64"))
+    faiss.write_index(index, paths['index'])
+    if write_data:
+        with open(paths['data'], 'w', encoding='utf-8') as f:
+            json.dump([{'id': i, 'question': question, 'answer': f"Answer to {question}"} for i, question in enumerate(questions)], f)
+    write_manifest(manifest_path(output_dir, BASE_NAME), generation,
+                   {'index': paths['index'], 'data': paths['data'], 'metadata': None, 'topic_classifier': None, 'lexical': None})
+    return paths
+
+def test_reload_swaps_in_a_new_generation(tmp_path):
+    write_generation(str(tmp_path), 1, ["Where is my order?"])
+    store = FAISSVectorStore.from_directory(str(tmp_path), BASE_NAME)
+    assert store.generation == 1
+
+    write_generation(str(tmp_path), 2, ["Where is my order?", "How do returns work?"])
+
+    assert store.reload() is True
+    assert store.generation == 2 and store.index.ntotal == 2
+    assert store.reload() is False
+
+def test_reload_retries_a_generation_that_failed_to_load(tmp_path):
+    write_generation(str(tmp_path), 1, ["Where is my order?"])
+    store = FAISSVectorStore.from_directory(str(tmp_path), BASE_NAME)
+
+    # Published before its data file exists, as a watcher can see mid-copy
+    paths = write_generation(str(tmp_path), 2, ["Where is my order?", "How do returns work?"], write_data=False)
+    assert store.reload() is False
+    assert store.generation == 1
+
+    with open(paths['data'], 'w', encoding='utf-8') as f:
+        json.dump([{'id': 0, 'question': "Where is my order?", 'answer': "A"}, {'id': 1, 'question': "How do returns work?", 'answer': "B"}], f)
+    # The manifest has not changed since the failed attempt
+    assert store.reload() is True
+    assert store.generation == 2
+
+def test_ivf_pq_keeps_at_least_four_dimensions_per_sub_vector():
+    for dimension, m in [(64, 16), (1536, 64), (6, 1)]:
+        index = create_faiss_index("ivf_pq", dimension, 20000)
+        assert faiss.downcast_index(index.index).pq.M == m
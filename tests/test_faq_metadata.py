@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from faq_metadata import InMemoryFAQMetadata, MmapFAQMetadata, write_faq_metadata
+
+RECORDS = [{'id': vector_id, 'question': f"Question {vector_id} ✓", 'answer': f"Answer {vector_id}"} for vector_id in (0, 3, 7, 12)]
+
+@pytest.fixture(params=["memory", "mmap"])
+def metadata(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryFAQMetadata(RECORDS)
+        return
+    path = tmp_path / "faq.bin"
+    write_faq_metadata(str(path), RECORDS)
+    metadata = MmapFAQMetadata(str(path))
+    yield metadata
+    metadata.close()
+
+def test_bulk_lookups_match_single_lookups(metadata):
+    ids = np.array([[7, -1, 0], [12, 5, 99]], dtype=np.int64)
+
+    rows = metadata.lookup_rows(ids)
+    questions, answers = metadata.questions(rows), metadata.answers(rows)
+
+    assert rows.tolist() == [[2, -1, 0], [3, -1, -1]]
+    assert questions.dtype == object and questions.shape == ids.shape
+    assert questions.tolist() == [["Question 7 ✓", None, "Question 0 ✓"], ["Question 12 ✓", None, None]]
+    assert answers.tolist() == [["Answer 7", None, "Answer 0"], ["Answer 12", None, None]]
+    assert metadata.question(1) == "Question 3 ✓"
+
+def test_empty_metadata_returns_no_hits():
+    metadata = InMemoryFAQMetadata([])
+    rows = metadata.lookup_rows(np.array([[0, -1]], dtype=np.int64))
+
+    assert metadata.questions(rows).tolist() == [[None, None]]
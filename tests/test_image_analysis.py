@@ -0,0 +1,57 @@
+import threading
+import time
+
+import pytest
+
+from image_analysis import iter_with_deadline, start_image_analysis
+
+def test_iter_with_deadline_passes_items_through():
+    assert list(iter_with_deadline(iter(["a", "b", "c"]), timeout=1.0)) == ["a", "b", "c"]
+
+def test_iter_with_deadline_reraises_stream_errors():
+    def failing():
+        yield "a"
+        raise RuntimeError("connection reset")
+
+    received = []
+    with pytest.raises(RuntimeError, match="connection reset"):
+        for item in iter_with_deadline(failing(), timeout=1.0):
+            received.append(item)
+    assert received == ["a"]
+
+def test_iter_with_deadline_times_out_a_stalled_stream_and_keeps_calling_on_wait():
+    release = threading.Event()
+    closed = threading.Event()
+
+    def stalled():
+        try:
+            yield "a"
+            release.wait(5)
+            yield "b"
+        finally:
+            closed.set()
+
+    waits = []
+    received = []
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        for item in iter_with_deadline(stalled(), timeout=0.2, on_wait=lambda: waits.append(time.monotonic()), poll_interval=0.02):
+            received.append(item)
+
+    assert received == ["a"]
+    assert 0.2 <= time.monotonic() - started < 1.0
+    # Called throughout the stall, not only when items arrive
+    assert len(waits) >= 5
+    release.set()
+    assert closed.wait(1.0)
+
+def test_on_wait_can_render_backends_that_finish_while_the_stream_stalls():
+    run = start_image_analysis(b"image", {'rekognition': lambda image: "tags"}, timeout=1.0)
+    rendered = []
+
+    def slow_stream():
+        time.sleep(0.2)
+        yield "description"
+
+    assert list(iter_with_deadline(slow_stream(), timeout=1.0, on_wait=lambda: rendered.extend(run.poll()), poll_interval=0.02)) == ["description"]
+    assert rendered == [('rekognition', "tags", None)]
@@ -0,0 +1,106 @@
+import uuid
+
+import pytest
+
+import openai_service
+from conftest import FakeChatStream, fake_embedding, rate_limit_error
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(openai_service.time, "sleep", delays.append)
+    return delays
+
+def test_get_openai_embedding_calls_the_client_directly(fake_openai):
+    embedding = openai_service.get_openai_embedding("Where is\nmy order?", use_cache=False, coalesce=False)
+
+    assert embedding == fake_embedding("Where is my order?")
+    assert fake_openai.embeddings.calls == [["Where is my order?"]]
+
+def test_get_openai_embedding_serves_repeats_from_the_query_cache(fake_openai):
+    question = f"What is your return policy? {uuid.uuid4()}"
+
+    first = openai_service.get_openai_embedding(question, coalesce=False)
+    second = openai_service.get_openai_embedding(f"  {question.upper()} ", coalesce=False)
+
+    assert first == second == fake_embedding(question)
+    assert len(fake_openai.embeddings.calls) == 1
+
+def test_get_openai_embedding_returns_none_on_errors(fake_openai):
+    fake_openai.embeddings.failures.append(RuntimeError("boom"))
+
+    assert openai_service.get_openai_embedding("Hello?", use_cache=False, coalesce=False) is None
+    assert openai_service.get_openai_embedding("", use_cache=False, coalesce=False) is None
+
+def test_get_openai_embeddings_batches_and_keeps_input_order(fake_openai):
+    texts = ["alpha", "beta", "", "gamma", "delta", "epsilon"]
+
+    embeddings = openai_service.get_openai_embeddings(texts, max_batch_size=2, max_workers=3)
+
+    assert embeddings == [fake_embedding(text) if text else None for text in texts]
+    assert sorted(map(len, fake_openai.embeddings.calls)) == [1, 2, 2]
+    assert sorted(fake_openai.embeddings.inputs) == sorted(text for text in texts if text)
+
+def test_get_openai_embeddings_retries_after_the_retry_after_delay(fake_openai, sleeps):
+    fake_openai.embeddings.failures.append(rate_limit_error(retry_after="1.5"))
+
+    embeddings = openai_service.get_openai_embeddings(["alpha", "beta"], max_batch_size=2, max_workers=1, max_retries=3)
+
+    assert embeddings == [fake_embedding("alpha"), fake_embedding("beta")]
+    assert len(fake_openai.embeddings.calls) == 2
+    assert sleeps == [1.5]
+
+def test_get_openai_embeddings_backs_off_exponentially_without_retry_after(fake_openai, sleeps):
+    fake_openai.embeddings.failures.extend([rate_limit_error(), rate_limit_error()])
+
+    embeddings = openai_service.get_openai_embeddings(["alpha"], max_workers=1, max_retries=3, retry_base_delay=0.5)
+
+    assert embeddings == [fake_embedding("alpha")]
+    assert 0.5 <= sleeps[0] < 1.0 and 1.0 <= sleeps[1] < 1.5
+
+def test_get_openai_embeddings_gives_up_after_max_retries(fake_openai, sleeps):
+    fake_openai.embeddings.failures.extend([rate_limit_error("0")] * 3)
+
+    embeddings = openai_service.get_openai_embeddings(["alpha", "beta"], max_batch_size=1, max_workers=1, max_retries=1)
+
+    # One batch fails twice and is given up on; the other succeeds on its retry
+    assert embeddings.count(None) == 1
+    assert len(fake_openai.embeddings.calls) == 4
+    assert sleeps == [0.0, 0.0]
+
+def test_get_openai_embeddings_does_not_retry_other_errors(fake_openai, sleeps):
+    fake_openai.embeddings.failures.append(ValueError("bad request"))
+
+    assert openai_service.get_openai_embeddings(["alpha"], max_workers=1) == [None]
+    assert len(fake_openai.embeddings.calls) == 1
+    assert sleeps == []
+
+def test_streamed_completion_drops_leading_whitespace_and_empty_deltas(fake_openai):
+    fake_openai.chat.completions.streams.append(FakeChatStream(["", "  ", "\n Returns", " are", "", " free."]))
+
+    deltas = list(openai_service.stream_openai_chat_completion("Are returns free?"))
+
+    assert deltas == ["Returns", " are", " free."]
+    assert openai_service.stream_metrics[-1]['outcome'] == "success"
+
+def test_streamed_completion_reraises_errors_after_recording_them(fake_openai):
+    fake_openai.chat.completions.streams.append(FakeChatStream(["Returns", " are"], fail_after=1, failure=RuntimeError("connection reset")))
+
+    received = []
+    with pytest.raises(RuntimeError, match="connection reset"):
+        for delta in openai_service.stream_openai_chat_completion("Are returns free?"):
+            received.append(delta)
+
+    assert received == ["Returns"]
+    assert openai_service.stream_metrics[-1]['outcome'] == "error"
+
+def test_abandoned_streamed_completion_is_recorded_as_cancelled(fake_openai):
+    stream = FakeChatStream(["Returns", " are", " free."])
+    fake_openai.chat.completions.streams.append(stream)
+
+    deltas = openai_service.stream_openai_chat_completion("Are returns free?")
+    assert next(deltas) == "Returns"
+    deltas.close()
+
+    assert stream.closed
+    assert openai_service.stream_metrics[-1]['outcome'] == "cancelled"
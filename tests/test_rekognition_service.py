@@ -0,0 +1,52 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+import config
+import rekognition_service
+
+IMAGE_BYTES = b"\xff\xd8\xff\xe0 not really a jpeg"
+
+@pytest.fixture
+def stubbed_client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    client = boto3.session.Session().client("rekognition", region_name="eu-central-1")
+    rekognition_service.set_rekognition_client(client)
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+    rekognition_service.set_rekognition_client(None)
+
+def test_get_image_labels_reuses_shared_client_with_configured_limits(stubbed_client):
+    client, stubber = stubbed_client
+    expected_params = {
+        'Image': {'Bytes': IMAGE_BYTES},
+        'MaxLabels': config.REKOGNITION_MAX_LABELS,
+        'MinConfidence': config.REKOGNITION_MIN_CONFIDENCE
+    }
+    for name in ("Shoe", "Bag"):
+        stubber.add_response("detect_labels", {'Labels': [{'Name': name, 'Confidence': 99.0}]}, expected_params)
+
+    first = rekognition_service.get_image_labels(IMAGE_BYTES)
+    second = rekognition_service.get_image_labels(IMAGE_BYTES)
+
+    assert [label['Name'] for label in first['Labels']] == ["Shoe"]
+    assert [label['Name'] for label in second['Labels']] == ["Bag"]
+    assert rekognition_service.get_rekognition_client() is client
+
+def test_get_image_labels_reraises_client_errors(stubbed_client):
+    _, stubber = stubbed_client
+    stubber.add_client_error("detect_labels", service_error_code="InvalidImageFormatException")
+
+    with pytest.raises(Exception, match="InvalidImageFormatException"):
+        rekognition_service.get_image_labels(IMAGE_BYTES)
+
+def test_get_rekognition_client_is_created_once(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    rekognition_service.set_rekognition_client(None)
+    try:
+        assert rekognition_service.get_rekognition_client() is rekognition_service.get_rekognition_client()
+    finally:
+        rekognition_service.set_rekognition_client(None)
@@ -0,0 +1,91 @@
+import json
+import os
+import threading
+import numpy as np
+from telemetry import get_logger
+
+logger = get_logger(__name__)
+
+RETAIL_LABEL = "RETAIL_RELATED"
+NON_RETAIL_LABEL = "NOT_RETAIL_RELATED"
+
+def load_topic_examples(path: str) -> list[tuple[str, str]] | None:
+    """Loads labelled [{"text": ..., "label": ...}] examples, skipping entries with an unknown label."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            examples = json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not load topic examples from {path}: {e}")
+        return None
+    return [
+        (example['text'], example['label']) for example in examples
+        if example.get('text') and example.get('label') in (RETAIL_LABEL, NON_RETAIL_LABEL)
+    ]
+
+def _normalized_mean(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    centroid = vectors.mean(axis=0)
+    return centroid / max(np.linalg.norm(centroid), 1e-12)
+
+class CentroidTopicClassifier:
+    """
+    Retail / non-retail classifier over query embeddings.
+
+    Scores a query by the margin between its cosine similarity to the retail
+    centroid and to the non-retail centroid. Margins inside
+    [uncertainty_low, uncertainty_high] are reported as undecided so the
+    caller can fall back to the LLM classifier.
+    """
+    def __init__(self, retail_centroid: np.ndarray, other_centroid: np.ndarray, uncertainty_low: float, uncertainty_high: float):
+        self.retail_centroid = np.asarray(retail_centroid, dtype=np.float32)
+        self.other_centroid = np.asarray(other_centroid, dtype=np.float32)
+        self.uncertainty_low = uncertainty_low
+        self.uncertainty_high = uncertainty_high
+        self._lock = threading.Lock()
+        self.local_decisions = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def build(cls, retail_vectors: np.ndarray, other_vectors: np.ndarray, uncertainty_low: float, uncertainty_high: float):
+        return cls(_normalized_mean(retail_vectors), _normalized_mean(other_vectors), uncertainty_low, uncertainty_high)
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(tmp_path, retail_centroid=self.retail_centroid, other_centroid=self.other_centroid)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, uncertainty_low: float, uncertainty_high: float):
+        with np.load(path) as data:
+            return cls(data['retail_centroid'], data['other_centroid'], uncertainty_low, uncertainty_high)
+
+    def margin(self, embedding) -> float:
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        return float(query @ self.retail_centroid - query @ self.other_centroid)
+
+    def classify(self, embedding) -> tuple[str | None, float]:
+        """Returns (label, margin); label is None when the margin falls inside the uncertainty band."""
+        margin = self.margin(embedding)
+        if margin > self.uncertainty_high:
+            label = RETAIL_LABEL
+        elif margin < self.uncertainty_low:
+            label = NON_RETAIL_LABEL
+        else:
+            label = None
+        with self._lock:
+            if label is None:
+                self.fallbacks += 1
+            else:
+                self.local_decisions += 1
+        return label, margin
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.local_decisions + self.fallbacks
+            return {
+                'local_decisions': self.local_decisions,
+                'llm_fallbacks': self.fallbacks,
+                'round_trips_saved_rate': self.local_decisions / total if total else 0.0
+            }
\ No newline at end of file